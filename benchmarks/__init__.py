@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for Black Stories AI.
+
+Run with `python -m benchmarks --help`. The suite drives the real orchestrator and
+storage code against a synthetic provider, so it needs no network or model server.
+"""
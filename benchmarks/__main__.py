@@ -0,0 +1,66 @@
+import sys
+import json
+import math
+import click
+from datetime import datetime
+from rich.console import Console
+from rich.table import Table
+from .suite import BENCHMARKS, DEFAULT_LATENCY, SuiteOptions, run_suite, compare, write_results
+from .synthetic import LatencyModel
+
+console = Console()
+
+
+@click.command()
+@click.option('--only', multiple=True, type=click.Choice(sorted(BENCHMARKS)), help='Run only these benchmarks (repeatable)')
+@click.option('--quick', is_flag=True, help='Fewer repetitions; for smoke runs, not for comparisons')
+@click.option('--seed', type=int, default=0, help='Seed of the synthetic providers')
+@click.option('--latency', default=DEFAULT_LATENCY, show_default=True, help='Latency model of the end-to-end runs (key=value,...)')
+@click.option('--output', default=None, help='Results file (default: benchmarks/results/<timestamp>.json)')
+@click.option('--compare', 'baseline_path', default=None, help='Baseline results file to compare against')
+@click.option('--threshold', type=float, default=0.2, show_default=True, help='Relative slowdown that counts as a regression')
+def main(only, quick, seed, latency, output, baseline_path, threshold):
+    """
+    Runs the benchmark suite and writes the results as JSON.
+    With --compare, exits with status 1 if any metric regressed beyond --threshold.
+    """
+    options = SuiteOptions(quick=quick, seed=seed, latency=LatencyModel.parse(latency))
+    results = run_suite(list(only) or None, options, progress=lambda name: console.print(f"[dim]running {name}...[/dim]"))
+
+    output = output or f"benchmarks/results/{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    write_results(results, output)
+
+    table = Table(title="Benchmarks")
+    for column in ("benchmark", "metric", "value", "unit"):
+        table.add_column(column)
+    for name, metrics in results["benchmarks"].items():
+        for key, entry in metrics.items():
+            if "value" in entry:
+                table.add_row(name, key, f"{entry['value']:.3f}", entry["unit"])
+            else:
+                table.add_row(name, key, "skipped", entry.get("reason", ""))
+    console.print(table)
+    console.print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, threshold)
+        regressions = [r for r in rows if r["regression"]]
+        table = Table(title=f"Comparison with {baseline_path}")
+        for column in ("benchmark", "metric", "baseline", "current", "change"):
+            table.add_column(column)
+        for r in rows:
+            style = "red" if r["regression"] else None
+            # From a 0 baseline there is no relative change: show the absolute one
+            change = f"{r['delta']:+.3f} {r['unit']}" if math.isinf(r["change"]) else f"{r['change']:+.1%}"
+            table.add_row(r["benchmark"], r["metric"], f"{r['baseline']:.3f}", f"{r['current']:.3f}", change, style=style)
+        console.print(table)
+        if regressions:
+            console.print(f"[red]{len(regressions)} regression(s) above {threshold:.0%}[/red]")
+            sys.exit(1)
+        console.print("[green]No regressions[/green]")
+
+
+if __name__ == "__main__":
+    main()
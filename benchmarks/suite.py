@@ -0,0 +1,419 @@
+import os
+import sys
+import time
+import copy
+import json
+import math
+import logging
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from src.game.orchestrator import GameOrchestrator
+from src.game.interfaces import GameObserver
+from src.game.events import GameEvent
+from src.game.enums import EventType, GameState
+from src.storage.models import Message
+from src.storage.saver import ConversationSaver
+from src.storage.database import ConversationStore
+from src.storage.archive import ArchiveReader, ArchiveWriter
+from src.storage.formats.json import JsonFormatter
+from .synthetic import SyntheticProvider, LatencyModel, INSTANT
+
+RESULTS_VERSION = 1
+
+# Default profile for the end-to-end runs: a fast local model with a long tail
+DEFAULT_LATENCY = "first_token=0.02,jitter=0.5,distribution=lognormal,tokens_per_second=2000"
+
+Metrics = Dict[str, Dict[str, Any]]
+BENCHMARKS: Dict[str, Callable[["SuiteOptions"], Metrics]] = {}
+
+
+class SuiteOptions:
+    """
+    Knobs shared by every benchmark.
+    """
+
+    def __init__(self, quick: bool = False, seed: int = 0, latency: Optional[LatencyModel] = None):
+        self.quick = quick
+        self.seed = seed
+        self.latency = latency or LatencyModel.parse(DEFAULT_LATENCY)
+
+    def repeat(self, full: int, quick: int) -> int:
+        return quick if self.quick else full
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark function under `name`.
+    """
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    """
+    A single measurement. `better` tells the comparison which direction is a regression.
+    """
+    return {"value": round(value, 6), "unit": unit, "better": better}
+
+
+def per_call(func: Callable[[], Any], number: int, repeat: int = 5) -> float:
+    """
+    Median seconds per call of `func` over `repeat` batches of `number` calls.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def new_game(output_dir: str, max_questions: int = 10, latency: LatencyModel = INSTANT, seed: int = 0, **options) -> GameOrchestrator:
+    """
+    An orchestrator wired to synthetic providers, ready to play without pauses.
+    """
+    return GameOrchestrator(
+        model1=SyntheticProvider("master", latency, seed=seed),
+        model2=SyntheticProvider("detective", latency, seed=seed + 1),
+        max_questions=max_questions,
+        no_pause=True,
+        output_dir=output_dir,
+        save_format=options.pop("save_format", "json"),
+        **options
+    )
+
+
+def filled_game(output_dir: str, pairs: int) -> GameOrchestrator:
+    """
+    An orchestrator whose conversation already holds `pairs` question/answer turns.
+    """
+    game = new_game(output_dir, max_questions=pairs)
+    conversation = game.conversation
+    game.journal.write_header(conversation, game.game_id)
+    conversation.full_solution = "El hombre saltó de un avión y su paracaídas no se abrió."
+    conversation.add_message(Message("model1", "synthetic-master", "Story Master", "🎭 HISTORIA:\n\nUn hombre muerto en un campo.", response_time=0.5))
+    for i in range(pairs):
+        conversation.add_message(Message("model2", "synthetic-detective", "Detective", f"¿Pregunta número {i}, murió por una caída?", response_time=0.3))
+        conversation.add_message(Message("model1", "synthetic-master", "Story Master", "NO", response_time=0.2))
+    conversation.questions_used = pairs
+    conversation.result = "Derrota"
+    game.journal.write_end(conversation)
+    return game
+
+
+GAME_VARIANTS = {
+    "default": {},
+    "no_stream": {"stream": False},
+    "session": {"session_mode": True},
+    "pipelined": {"pipelined": True},
+}
+
+
+@benchmark("turn_overhead")
+def bench_turn_overhead(options: SuiteOptions) -> Metrics:
+    """
+    Orchestration cost per model call with instant providers: everything a turn does
+    except waiting for the model (prompt building, events, history, saving).
+    """
+    metrics = {}
+    games = options.repeat(20, 3)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for variant, game_options in GAME_VARIANTS.items():
+            samples = []
+            for i in range(games):
+                game = new_game(output_dir, seed=options.seed + i, **game_options)
+                start = time.perf_counter()
+                game.play()
+                elapsed = time.perf_counter() - start
+                samples.append(elapsed / max(1, game.model1.calls + game.model2.calls))
+            metrics[f"{variant}.per_call_us"] = metric(statistics.median(samples) * 1e6, "us")
+    return metrics
+
+
+@benchmark("game_latency")
+def bench_game_latency(options: SuiteOptions) -> Metrics:
+    """
+    End-to-end game time against the latency model, per orchestrator mode.
+    """
+    metrics = {}
+    games = options.repeat(5, 2)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for variant, game_options in GAME_VARIANTS.items():
+            walls, ttfts, errors = [], [], 0
+            for i in range(games):
+                game = new_game(output_dir, latency=options.latency, seed=options.seed + i, **game_options)
+                start = time.perf_counter()
+                game.play()
+                walls.append(time.perf_counter() - start)
+                errors += game.state == GameState.ERROR
+                ttfts.extend(m.time_to_first_token for m in game.conversation.messages if m.time_to_first_token is not None)
+            metrics[f"{variant}.game_s"] = metric(statistics.median(walls), "s")
+            if ttfts:
+                metrics[f"{variant}.time_to_first_token_ms"] = metric(statistics.median(ttfts) * 1e3, "ms")
+            metrics[f"{variant}.error_rate"] = metric(errors / games, "ratio")
+    return metrics
+
+
+@benchmark("prompt_building")
+def bench_prompt_building(options: SuiteOptions) -> Metrics:
+    """
+    Cost of building the detective prompt as the history grows with max_questions.
+    """
+    metrics = {}
+    number = options.repeat(200, 20)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for pairs in (10, 50, 200, 1000):
+            game = filled_game(output_dir, pairs)
+            seconds = per_call(lambda: game._detective_prompt(pairs, "Sigue investigando."), number)
+            metrics[f"questions_{pairs}.per_prompt_us"] = metric(seconds * 1e6, "us")
+    return metrics
+
+
+@benchmark("saver")
+def bench_saver(options: SuiteOptions) -> Metrics:
+    """
+    ConversationSaver.save cost per format for a 50-question game, and the cost of
+    rendering the same game from its journal instead.
+    """
+    metrics = {}
+    number = options.repeat(50, 5)
+    with tempfile.TemporaryDirectory() as output_dir:
+        game = filled_game(output_dir, 50)
+        saver = ConversationSaver(output_dir)
+        for file_format in saver.formatters:
+            seconds = per_call(lambda: saver.save(game.conversation, file_format), number)
+            metrics[f"{file_format}.save_ms"] = metric(seconds * 1e3, "ms")
+            seconds = per_call(lambda: saver.render(game.journal.path, file_format), number)
+            metrics[f"{file_format}.render_ms"] = metric(seconds * 1e3, "ms")
+        game.journal.close()
+    return metrics
+
+
+
+@benchmark("store")
+def bench_store(options: SuiteOptions) -> Metrics:
+    """
+    ConversationStore: bulk insert cost per 10-question game (Elo update included), the
+    per-model stats query over the whole database (all games and the last day only) and
+    the leaderboard query.
+    """
+    games = options.repeat(10000, 1000)
+    with tempfile.TemporaryDirectory() as output_dir:
+        game = filled_game(output_dir, 10)
+        game.journal.close()
+        base = game.conversation
+
+        def conversations():
+            for i in range(games):
+                conversation = copy.copy(base)
+                conversation.game_id = f"bench_{i}"
+                conversation.model2_name = f"detective-{i % 8}"
+                conversation.result = "Victoria" if i % 3 else "Derrota"
+                yield conversation
+
+        store = ConversationStore(os.path.join(output_dir, "bench.db"))
+        start = time.perf_counter()
+        store.save_many(conversations())
+        insert = (time.perf_counter() - start) / games
+        number = options.repeat(20, 5)
+        since = datetime.now().replace(microsecond=0)
+        metrics = {
+            "insert_ms_per_game": metric(insert * 1e3, "ms"),
+            "stats_ms": metric(per_call(store.stats, number) * 1e3, "ms"),
+            "stats_since_ms": metric(per_call(lambda: store.stats(since=since), number) * 1e3, "ms"),
+            "leaderboard_ms": metric(per_call(lambda: (store.leaderboard(), store.pairings()), number) * 1e3, "ms"),
+        }
+        store.close()
+    return metrics
+
+
+@benchmark("archive")
+def bench_archive(options: SuiteOptions) -> Metrics:
+    """
+    Archive format against the JSON files: bytes per 20-question game, packing cost per
+    game, and the cost of loading one game from a full archive (seek + decompress).
+    """
+    games = options.repeat(2000, 200)
+    with tempfile.TemporaryDirectory() as output_dir:
+        game = filled_game(output_dir, 20)
+        game.journal.close()
+        base = game.conversation
+        json_bytes = len(JsonFormatter().format(base).encode("utf-8"))
+        path = os.path.join(output_dir, "bench.bsa")
+        start = time.perf_counter()
+        with ArchiveWriter(path) as writer:
+            for i in range(games):
+                conversation = copy.copy(base)
+                conversation.game_id = f"bench_{i}"
+                writer.add(conversation)
+        pack = (time.perf_counter() - start) / games
+        archive_bytes = os.path.getsize(path) / games
+        with ArchiveReader(path) as reader:
+            load = per_call(lambda: reader.load(f"bench_{games // 2}"), options.repeat(200, 20))
+    return {
+        "json_bytes_per_game": metric(json_bytes, "bytes"),
+        "archive_bytes_per_game": metric(archive_bytes, "bytes"),
+        "pack_ms_per_game": metric(pack * 1e3, "ms"),
+        "load_one_ms": metric(load * 1e3, "ms"),
+    }
+
+class _CountingObserver(GameObserver):
+    """
+    Observer that does the minimum: counts events.
+    """
+
+    def __init__(self):
+        self.events = 0
+
+    def on_event(self, event: GameEvent):
+        self.events += 1
+
+
+@benchmark("observer_fanout")
+def bench_observer_fanout(options: SuiteOptions) -> Metrics:
+    """
+    Cost of notifying one event as the number of subscribed observers grows.
+    """
+    metrics = {}
+    number = options.repeat(2000, 200)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for count in (1, 10, 100):
+            game = new_game(output_dir)
+            for _ in range(count):
+                game.subscribe(_CountingObserver())
+            payload = {"role": "Detective", "model_name": "synthetic-detective", "chunk": "palabra "}
+            seconds = per_call(lambda: game._notify(EventType.RESPUESTA_PARCIAL, payload=payload), number)
+            metrics[f"observers_{count}.per_event_us"] = metric(seconds * 1e6, "us")
+    return metrics
+
+
+@benchmark("gui_drain")
+def bench_gui_drain(options: SuiteOptions) -> Metrics:
+    """
+    Events per second the GUI game view absorbs when a producer thread floods it
+    with streaming chunks. Skipped when Tk or a display is not available.
+    """
+    try:
+        import customtkinter as ctk
+        from src.display.gui import GameFrame
+        root = ctk.CTk()
+    except Exception as e:  # ImportError, or TclError without a display
+        return {"skipped": {"reason": str(e)}}
+
+    total = options.repeat(5000, 500)
+    try:
+        root.withdraw()
+        with tempfile.TemporaryDirectory() as output_dir:
+            frame = GameFrame(root, new_game(output_dir), False, lambda: None)
+            frame.pack()
+            root.update()
+            payload = {"role": "Detective", "model_name": "synthetic-detective", "chunk": "palabra "}
+            handled = frame._handle_event
+            done = threading.Event()
+            count = [0]
+
+            def counting_handler(event):
+                handled(event)
+                count[0] += 1
+                if count[0] >= total:
+                    done.set()
+            frame._handle_event = counting_handler
+
+            def produce():
+                for _ in range(total):
+                    frame.on_event(GameEvent(EventType.RESPUESTA_PARCIAL, payload=payload))
+
+            start = time.perf_counter()
+            producer = threading.Thread(target=produce, daemon=True)
+            producer.start()
+            while not done.is_set():
+                root.update()
+            elapsed = time.perf_counter() - start
+            producer.join()
+            frame.destroy()
+    finally:
+        root.destroy()
+    return {"events_per_s": metric(total / elapsed, "events/s", better="higher")}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(names: Optional[List[str]] = None, options: Optional[SuiteOptions] = None,
+              progress: Callable[[str], None] = lambda _name: None) -> Dict[str, Any]:
+    """
+    Runs the selected benchmarks (all by default) and returns the results document.
+    """
+    options = options or SuiteOptions()
+    names = names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    # The orchestrator logs every turn; at DEBUG that would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    for name in names:
+        progress(name)
+        results[name] = BENCHMARKS[name](options)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "quick": options.quick,
+        "seed": options.seed,
+        "benchmarks": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compares two results documents metric by metric.
+
+    Returns one row per metric present in both, flagged as a regression when it got
+    worse by more than `threshold` (relative, e.g. 0.2 = 20%). A metric whose baseline
+    is 0 has no relative change: any move is infinite (e.g. error_rate 0 -> 1.0) and is a
+    regression if it went in the worse direction; "delta" holds the absolute change.
+    """
+    rows = []
+    for name, metrics in current["benchmarks"].items():
+        base_metrics = baseline.get("benchmarks", {}).get(name, {})
+        for key, entry in metrics.items():
+            base = base_metrics.get(key)
+            if "value" not in entry or not base or "value" not in base:
+                continue
+            old, new = base["value"], entry["value"]
+            delta = new - old
+            if old:
+                change = delta / old
+            else:
+                change = math.copysign(math.inf, delta) if delta else 0.0
+            worse = change > threshold if entry["better"] == "lower" else change < -threshold
+            rows.append({"benchmark": name, "metric": key, "baseline": old, "current": new,
+                         "unit": entry["unit"], "change": change, "delta": delta,
+                         "regression": worse})
+    return rows
+
+
+def write_results(results: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
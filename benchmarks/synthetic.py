@@ -0,0 +1,196 @@
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, List, Optional, Union
+from src.providers.base import BaseProvider, ProviderResponse, ResponseStream, Usage
+from src.game.rules import estimate_tokens
+from src.providers.errors import ProviderUnavailableError
+
+
+class SyntheticProviderError(ProviderUnavailableError):
+    """
+    Simulated backend failure, raised with probability `failure_rate`.
+    """
+
+
+@dataclass
+class LatencyModel:
+    """
+    Latency profile of a simulated model.
+
+    The time to first token is drawn from `distribution` around `first_token` seconds
+    (spread `jitter`); the rest of the response is produced at `tokens_per_second`.
+    """
+    first_token: float = 0.0
+    jitter: float = 0.0
+    distribution: str = "constant"  # constant | uniform | normal | lognormal
+    tokens_per_second: Optional[float] = None  # None: the whole text arrives at once
+    failure_rate: float = 0.0
+
+    def sample_first_token(self, rng: random.Random) -> float:
+        if self.first_token <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            value = rng.uniform(self.first_token - self.jitter, self.first_token + self.jitter)
+        elif self.distribution == "normal":
+            value = rng.gauss(self.first_token, self.jitter)
+        elif self.distribution == "lognormal":
+            # Long tail: the median stays at first_token, jitter is the sigma of the log
+            value = self.first_token * rng.lognormvariate(0.0, self.jitter)
+        else:
+            value = self.first_token
+        return max(0.0, value)
+
+    def token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """
+        Builds a model from 'key=value' pairs, e.g. 'first_token=0.4,jitter=0.5,distribution=lognormal,tokens_per_second=40'.
+        """
+        fields = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            key, _, value = part.partition("=")
+            if key == "distribution":
+                fields[key] = value
+            elif key in ("first_token", "jitter", "tokens_per_second", "failure_rate"):
+                fields[key] = float(value)
+            else:
+                raise ValueError(f"Unknown latency model field: {key}")
+        return cls(**fields)
+
+
+INSTANT = LatencyModel()
+
+STORY = (
+    "SITUACIÓN: Un hombre aparece muerto en mitad de un campo con una mochila a su lado. No hay huellas alrededor.\n\n"
+    "SOLUCIÓN: El hombre saltó de un avión y su paracaídas no se abrió. La mochila es el paracaídas que falló."
+)
+ANSWERS = ("SÍ", "NO", "NO ES RELEVANTE")
+QUESTIONS = (
+    "¿Murió por una caída?", "¿Había alguien más con él?", "¿La mochila es importante?",
+    "¿Venía de un avión?", "¿Fue un accidente?", "¿Llevaba algún equipo especial?",
+)
+REASONING = ("Análisis: las respuestas anteriores descartan varias hipótesis y la situación sugiere que la muerte "
+             "tiene una causa poco habitual relacionada con el lugar donde apareció el cuerpo.")
+
+
+class SyntheticProvider(BaseProvider):
+    """
+    Offline provider that plays a scripted game with configurable latency.
+
+    `role` selects the script: 'master' writes the story, answers and verdicts;
+    'detective' asks questions (followed by filler reasoning, so early stopping has
+    something to cut) and tries to solve with probability `solve_rate` per turn.
+    Responses are seeded, so two runs with the same seed play the same game.
+    """
+
+    supports_chat = True
+
+    def __init__(self, role: str, latency: LatencyModel = INSTANT, seed: int = 0,
+                 solve_rate: float = 0.0, reasoning_tokens: int = 60, model_name: Optional[str] = None):
+        if role not in ("master", "detective"):
+            raise ValueError(f"Unknown synthetic role: {role}")
+        super().__init__(model_name or f"synthetic-{role}")
+        self.role = role
+        self.latency = latency
+        self.solve_rate = solve_rate
+        self.reasoning_tokens = reasoning_tokens
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.simulated_seconds = 0.0  # Total time spent "inside the model"
+
+    def _plan(self, prompt: str) -> tuple:
+        """
+        Picks the response text and its timing for one call.
+        Returns (chunks, first_token_delay, per_token_delay, usage).
+        """
+        with self._lock:
+            self.calls += 1
+            if self._rng.random() < self.latency.failure_rate:
+                raise SyntheticProviderError("Synthetic failure")
+            text = self._reply(prompt)
+            first_token = self.latency.sample_first_token(self._rng)
+        chunks = self._tokenize(text)
+        delay = self.latency.token_delay()
+        eval_duration = delay * max(0, len(chunks) - 1)
+        with self._lock:
+            self.simulated_seconds += first_token + eval_duration
+        usage = Usage(prompt_tokens=estimate_tokens(prompt), completion_tokens=len(chunks),
+                      eval_duration=eval_duration or None, load_duration=0.0)
+        return chunks, first_token, delay, usage
+
+    def _reply(self, prompt: str) -> str:
+        rng = self._rng
+        if self.role == "master":
+            if "CREAR una historia" in prompt:
+                return STORY
+            if "ha propuesto la siguiente solución" in prompt:
+                return "🎉 ¡CORRECTO!\n" + STORY.split("SOLUCIÓN:")[1].strip()
+            if "PISTA" in prompt:
+                return "Fíjate en lo que lleva a la espalda."
+            return f"{rng.choice(ANSWERS)}\nPUNTUACIÓN: {rng.randint(1, 10)}/10"
+
+        if "Resume el siguiente" in prompt:
+            return "El detective ha descartado varias hipótesis; la muerte parece accidental."
+        filler = " ".join(REASONING.split()[: self.reasoning_tokens])
+        if rng.random() < self.solve_rate:
+            return "RESOLVER: Saltó de un avión y el paracaídas no se abrió."
+        return f"{rng.choice(QUESTIONS)}\n{filler}"
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + [words[-1]]
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        chunks, first_token, delay, usage = self._plan(prompt)
+        total = first_token + delay * max(0, len(chunks) - 1)
+        if total:
+            time.sleep(total)
+        return ProviderResponse("".join(chunks), usage)
+
+    def generate_response(self, prompt: str, **kwargs: Any) -> str:
+        return self.generate(prompt, **kwargs).text
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        chunks, first_token, delay, usage = self._plan(prompt)
+        total = first_token + delay * max(0, len(chunks) - 1)
+        if total:
+            await asyncio.sleep(total)
+        return ProviderResponse("".join(chunks), usage)
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        return (await self.agenerate(prompt, **kwargs)).text
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        chunks, first_token, delay, _usage = self._plan(prompt)
+        for i, chunk in enumerate(chunks):
+            wait = first_token if i == 0 else delay
+            if wait:
+                time.sleep(wait)
+            yield chunk
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        return ResponseStream(self._astream_events(prompt))
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        stream = self.astream(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_events(self, prompt: str) -> AsyncIterator[Union[str, Usage]]:
+        chunks, first_token, delay, usage = self._plan(prompt)
+        for i, chunk in enumerate(chunks):
+            wait = first_token if i == 0 else delay
+            if wait:
+                await asyncio.sleep(wait)
+            yield chunk
+        yield usage
@@ -1,10 +1,17 @@
+import os
 import logging
 import click
 import threading
 from src.providers.gemini import GeminiProvider
 from src.providers.ollama import OllamaProvider
-from src.game.orchestrator import GameOrchestrator
+from src.game.orchestrator import GameOrchestrator, resume_settings
+from src.game.providers_factory import get_shared_provider, get_registry, validate_provider_name
+from src.game.story_pool import get_story_pool, STORY_POOL_FILE
+from src.storage.answer_cache import get_answer_cache
+from src.storage.database import DEFAULT_DB_FILE, get_store
+from src.storage.archive import ARCHIVE_EXTENSION
 from src.display.terminal import TerminalObserver
+from src.metrics.export import MetricsServer, write_textfile
 
 # Configure logging
 logging.basicConfig(
@@ -16,22 +23,76 @@ logging.basicConfig(
     ]
 )
 
-@click.command()
+def _check_provider(ctx, param, value):
+    """
+    Valida el proveedor indicado en la línea de comandos (admite replay:/record:).
+    """
+    if value is None:
+        return value
+    try:
+        return validate_provider_name(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+@click.group(invoke_without_command=True)
 @click.option('-m1', '--model1', required=False, help='Name of the first model (Story Master)')
 @click.option('-m2', '--model2', required=False, help='Name of the second model (Detective)')
-@click.option('-p1', '--provider1', required=False, type=click.Choice(['gemini', 'ollama']), help='Provider of the model 1')
-@click.option('-p2', '--provider2', required=False, type=click.Choice(['gemini', 'ollama']), help='Provider of the model 2')
+@click.option('-p1', '--provider1', required=False, callback=_check_provider, help='Provider of the model 1: gemini, ollama, replay:<cassette> or record:<provider>:<cassette>')
+@click.option('-p2', '--provider2', required=False, callback=_check_provider, help='Provider of the model 2: gemini, ollama, replay:<cassette> or record:<provider>:<cassette>')
 @click.option('--save-format', type=click.Choice(['json', 'txt', 'md']), default='md', help='Format of the saved conversation')
 @click.option('--max-questions', type=int, default=10, help='Maximum number of questions allowed')
 @click.option('--no-pause', is_flag=True, help='Disables the pause between messages')
 @click.option('--output-dir', default='./conversations', help='Folder where conversations will be saved')
 @click.option('--ui', is_flag=True, help='Lanza la interfaz gráfica')
 @click.option('--human-moderator', is_flag=True, help='Activa el rol de Moderador Humano (solo en UI)')
-def main(model1, model2, provider1, provider2, save_format, max_questions, no_pause, output_dir, ui, human_moderator):
+@click.option('--session-mode', is_flag=True, help='Use stateful chat sessions so each turn only sends the new messages')
+@click.option('--history-budget', type=int, default=None, help='Approximate token budget of the Q&A history before older turns are summarized')
+@click.option('--pipelined', is_flag=True, help='Speculatively prepare the next question while the Story Master answers')
+@click.option('--story-pool', is_flag=True, help='Take the story from a pre-generated pool refilled in the background')
+@click.option('--token-budget', type=int, default=None, help='Stop the game once prompt + completion tokens reach this budget')
+@click.option('--pool-size', type=int, default=None, help='Maximum pooled HTTP connections per provider client (default: OLLAMA_POOL_SIZE or 10)')
+@click.option('--metrics-file', default=None, help='Write per-phase latency metrics in Prometheus text format to this file when the game ends')
+@click.option('--metrics-port', type=int, default=None, help='Serve per-phase latency metrics on http://127.0.0.1:<port>/metrics')
+@click.option('--keep-alive', default=None, help='How long Ollama keeps the models loaded after each call (e.g. 30m, or -1 for ever). Overrides OLLAMA_KEEP_ALIVE')
+@click.option('--no-warm-up', is_flag=True, help='Do not preload the models before the game starts')
+@click.option('--answer-cache', is_flag=True, help='Reuse the Story Master answers to questions already asked about the same story')
+@click.option('--answer-cache-db', default=None, help='SQLite file that persists the answer cache across runs (implies --answer-cache)')
+@click.option('--duplicate-questions', type=click.Choice(['reuse', 'nudge', 'off']), default='nudge', help='Repeated detective question: ask the detective for another question, repeat the previous answer without calling the Story Master, or do nothing')
+@click.option('--no-early-stop', is_flag=True, help='Let the detective finish its whole reply instead of cutting it at its first question line')
+@click.option('--resume', default=None, metavar='GAME_ID', help='Continue an unfinished game from its last completed turn (its journal must be in --output-dir)')
+@click.option('--db', 'db_path', default=None, help=f'Also store the finished game in this SQLite database (e.g. conversations/{DEFAULT_DB_FILE})')
+@click.pass_context
+def main(ctx, model1, model2, provider1, provider2, save_format, max_questions, no_pause, output_dir, ui, human_moderator, session_mode, history_budget, pipelined, story_pool, token_budget, pool_size, metrics_file, metrics_port, keep_alive, no_warm_up, answer_cache, answer_cache_db, duplicate_questions, no_early_stop, resume, db_path):
     """
     Black Stories game with AI models competing.
     """
+    if keep_alive is not None:
+        # Antes de crear cualquier proveedor; los workers de un torneo heredan el entorno
+        os.environ["OLLAMA_KEEP_ALIVE"] = keep_alive
+
+    if ctx.invoked_subcommand is not None:
+        # Un subcomando (ej. 'tournament') se encarga de la ejecución
+        return
+
     logging.info("Starting Black Stories AI game")
+
+    if resume:
+        # La partida sigue con sus modelos y opciones; los de la línea de comandos tienen prioridad
+        try:
+            settings = resume_settings(output_dir, resume)
+        except ValueError as e:
+            click.echo(f"❌ Error: {e}")
+            return
+        model1, model2 = model1 or settings["model1"], model2 or settings["model2"]
+        provider1, provider2 = provider1 or settings["provider1"], provider2 or settings["provider2"]
+        if not (provider1 and provider2):
+            click.echo("❌ Error: no se puede deducir el proveedor de la partida; indícalo con -p1/-p2")
+            return
+        max_questions = settings["max_questions"]
+        session_mode = session_mode or settings.get("session_mode", False)
+        history_budget = history_budget if history_budget is not None else settings.get("history_token_budget")
+        token_budget = token_budget if token_budget is not None else settings.get("token_budget")
+        story_pool = False
     
     # Check if CLI args are sufficient for headless mode
     cli_mode = model1 and model2 and provider1 and provider2
@@ -41,6 +102,13 @@ def main(model1, model2, provider1, provider2, save_format, max_questions, no_pa
     # 2. If explicit args provided -> Launch CLI (Headless)
     
     launch_gui = ui or not cli_mode
+
+    if metrics_port is not None:
+        MetricsServer(metrics_port).start()
+    if pool_size is not None:
+        get_registry().pool_size = pool_size
+    cache = get_answer_cache(answer_cache_db) if answer_cache or answer_cache_db else None
+    store = get_store(db_path) if db_path else None
     
     if not launch_gui and not cli_mode:
         # This case is tricky with click required=False. 
@@ -48,22 +116,34 @@ def main(model1, model2, provider1, provider2, save_format, max_questions, no_pa
         # But for simplicity, we treat partial args as "Try GUI with defaults" or just GUI.
         pass
 
+    game = None
     try:
         if launch_gui:
             from src.display.gui import BlackStoryGUI
             
             # If args were provided, we can pre-seed the Game (CLI --ui mode)
-            game = None
             if cli_mode:
-                 provider1_instance = get_provider(provider1, model1)
-                 provider2_instance = get_provider(provider2, model2)
+                 provider1_instance = get_shared_provider(provider1, model1)
+                 provider2_instance = get_shared_provider(provider2, model2)
+                 pool = get_story_pool(provider1_instance, max_questions, os.path.join(output_dir, STORY_POOL_FILE)) if story_pool else None
                  game = GameOrchestrator(
                     model1=provider1_instance,
                     model2=provider2_instance,
                     max_questions=max_questions,
                     no_pause=False,  # GUI mode needs pause for step control
                     output_dir=output_dir,
-                    save_format=save_format
+                    save_format=save_format,
+                    session_mode=session_mode,
+                    history_token_budget=history_budget,
+                    pipelined=pipelined,
+                    story_pool=pool,
+                    token_budget=token_budget,
+                    warm_up=not no_warm_up,
+                    answer_cache=cache,
+                    duplicate_questions=duplicate_questions,
+                    early_stop=not no_early_stop,
+                    resume=resume,
+                    store=store
                 )
                  # Add terminal observer too
                  obs = TerminalObserver()
@@ -74,10 +154,9 @@ def main(model1, model2, provider1, provider2, save_format, max_questions, no_pa
             
         else:
             # Headless CLI Mode
-            from src.game.providers_factory import get_provider
-            
-            provider1_instance = get_provider(provider1, model1)
-            provider2_instance = get_provider(provider2, model2)
+            provider1_instance = get_shared_provider(provider1, model1)
+            provider2_instance = get_shared_provider(provider2, model2)
+            pool = get_story_pool(provider1_instance, max_questions, os.path.join(output_dir, STORY_POOL_FILE)) if story_pool else None
 
             game = GameOrchestrator(
                 model1=provider1_instance,
@@ -85,7 +164,18 @@ def main(model1, model2, provider1, provider2, save_format, max_questions, no_pa
                 max_questions=max_questions,
                 no_pause=no_pause,
                 output_dir=output_dir,
-                save_format=save_format
+                save_format=save_format,
+                session_mode=session_mode,
+                history_token_budget=history_budget,
+                pipelined=pipelined,
+                story_pool=pool,
+                token_budget=token_budget,
+                warm_up=not no_warm_up,
+                answer_cache=cache,
+                duplicate_questions=duplicate_questions,
+                early_stop=not no_early_stop,
+                resume=resume,
+                store=store
             )
             
             # Modo Consola Clásico
@@ -99,9 +189,230 @@ def main(model1, model2, provider1, provider2, save_format, max_questions, no_pa
     except KeyboardInterrupt:
         logging.warning("Game interrupted by user.")
         click.echo("\n⚠️ Juego interrumpido por el usuario.")
+        if game is not None:
+            click.echo(f"Puedes continuarla desde el último turno con --resume {game.game_id}")
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}", exc_info=True)
         click.echo(f"❌ Ocurrió un error inesperado al iniciar: {e}")
+    finally:
+        if metrics_file:
+            write_textfile(metrics_file)
+
+@main.command()
+@click.option('--pair', 'pairs', nargs=2, multiple=True, required=True, metavar='MASTER DETECTIVE',
+              help="Pareja Story Master / Detective como 'proveedor:modelo' (ej. --pair gemini:gemini-2.5-pro ollama:gemma3:12b). Repetible.")
+@click.option('--games', type=int, default=1, help='Number of games per pair')
+@click.option('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+@click.option('--host-limit', type=int, default=2, help='Maximum concurrent games per provider host')
+@click.option('--host-limit-for', 'host_limit_for', nargs=2, multiple=True, metavar='HOST N',
+              help="Override the concurrency limit of one host (ej. --host-limit-for http://gpu1:11434 4). Repetible.")
+@click.option('--save-format', type=click.Choice(['json', 'txt', 'md']), default='json', help='Format of the saved conversations')
+@click.option('--max-questions', type=int, default=10, help='Maximum number of questions allowed')
+@click.option('--output-dir', default='./conversations', help='Folder where conversations will be saved')
+@click.option('--session-mode', is_flag=True, help='Use stateful chat sessions so each turn only sends the new messages')
+@click.option('--history-budget', type=int, default=None, help='Approximate token budget of the Q&A history before older turns are summarized')
+@click.option('--pipelined', is_flag=True, help='Speculatively prepare the next question while the Story Master answers')
+@click.option('--story-set', is_flag=True, help='Play the same fixed set of stories (one per game index) against every detective')
+@click.option('--token-budget', type=int, default=None, help='Stop each game once prompt + completion tokens reach this budget')
+@click.option('--answer-cache', is_flag=True, help='Reuse the Story Master answers to questions already asked about the same story')
+@click.option('--answer-cache-db', default=None, help='SQLite file shared by the workers to persist the answer cache (implies --answer-cache)')
+@click.option('--duplicate-questions', type=click.Choice(['reuse', 'nudge', 'off']), default='nudge', help='Repeated detective question: ask the detective for another question, repeat the previous answer without calling the Story Master, or do nothing')
+@click.option('--no-early-stop', is_flag=True, help='Let the detective finish its whole reply instead of cutting it at its first question line')
+@click.option('--db', 'db_path', default=None, help=f'SQLite database where every worker stores its finished games (e.g. conversations/{DEFAULT_DB_FILE})')
+def tournament(pairs, games, workers, host_limit, host_limit_for, save_format, max_questions, output_dir, session_mode, history_budget, pipelined, story_set, token_budget, answer_cache, answer_cache_db, duplicate_questions, no_early_stop, db_path):
+    """
+    Runs many headless games in parallel across a process pool.
+    """
+    from rich.console import Console
+    from rich.table import Table
+    from src.game.tournament import Participant, TournamentRunner, build_story_sets, summarize
+
+    try:
+        matrix = [(Participant.parse(m), Participant.parse(d)) for m, d in pairs]
+        limits = {host: int(limit) for host, limit in host_limit_for}
+
+        story_sets = None
+        if story_set:
+            masters = list(dict.fromkeys(master for master, _ in matrix))
+            click.echo(f"Preparando {games} historias por Story Master...")
+            story_sets = build_story_sets(masters, games, max_questions, os.path.join(output_dir, STORY_POOL_FILE))
+
+        total = len(matrix) * games
+        finished = []
+
+        def on_result(result):
+            finished.append(result)
+            status = result.result or f"Error ({result.error or result.state})"
+            click.echo(f"[{len(finished)}/{total}] {result.match.master} vs {result.match.detective} "
+                       f"#{result.match.game_index + 1}: {status} ({result.duration:.1f}s)")
+
+        runner = TournamentRunner(
+            pairs=matrix,
+            games_per_pair=games,
+            max_questions=max_questions,
+            output_dir=output_dir,
+            save_format=save_format,
+            workers=workers,
+            host_limit=host_limit,
+            host_limits=limits,
+            game_options={"session_mode": session_mode, "history_token_budget": history_budget, "pipelined": pipelined,
+                          "token_budget": token_budget, "answer_cache": answer_cache, "answer_cache_db": answer_cache_db,
+                          "duplicate_questions": duplicate_questions, "early_stop": not no_early_stop,
+                          "db_path": db_path},
+            story_sets=story_sets,
+            on_result=on_result
+        )
+        results = runner.run()
+
+        table = Table(title="🏆 Resultados del torneo")
+        for column in ("Story Master", "Detective", "Partidas", "Victorias", "Errores", "Preg. media", "Tiempo medio", "Tokens medios"):
+            table.add_column(column)
+        rows = summarize(results)
+        for row in rows:
+            table.add_row(row["master"], row["detective"], str(row["games"]), str(row["wins"]), str(row["errors"]),
+                          f"{row['questions'] / row['games']:.1f}", f"{row['duration'] / row['games']:.1f}s",
+                          f"{row['tokens'] / row['games']:.0f}")
+        Console().print(table)
+        lookups = sum(row["cache_lookups"] for row in rows)
+        if lookups:
+            hits = sum(row["cache_hits"] for row in rows)
+            click.echo(f"Caché de respuestas: {hits}/{lookups} aciertos ({hits / lookups:.0%})")
+        if db_path:
+            from src.display.ui import print_leaderboard
+            store = get_store(db_path)
+            print_leaderboard(store.leaderboard(), [])
+        click.echo(f"Resultados guardados en {runner.results_path}")
+
+    except ValueError as e:
+        logging.error(f"Configuration error: {e}")
+        click.echo(f"❌ Error: {e}")
+    except KeyboardInterrupt:
+        logging.warning("Tournament interrupted by user.")
+        click.echo("\n⚠️ Torneo interrumpido por el usuario.")
+
+def _parse_since(ctx, param, value):
+    """
+    Convierte --since en una fecha: una duración hacia atrás (30m, 12h, 7d) o una fecha ISO (2025-01-31).
+    """
+    if value is None:
+        return value
+    from datetime import datetime, timedelta
+    units = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+    try:
+        if value[-1:] in units and value[:-1].isdigit():
+            return datetime.now() - timedelta(**{units[value[-1]]: int(value[:-1])})
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter(f"'{value}' no es una duración (7d, 12h) ni una fecha ISO")
+
+@main.command()
+@click.option('--db', 'db_path', default=os.path.join('./conversations', DEFAULT_DB_FILE), help='SQLite database of games')
+@click.option('--role', type=click.Choice(['detective', 'master']), default=None, help='Only this role (default: both)')
+@click.option('--model', default=None, help='Only this model')
+@click.option('--since', default=None, callback=_parse_since, help='Only games started since a duration ago (7d, 12h) or a date (2025-01-31)')
+def stats(db_path, role, model, since):
+    """
+    Shows win rate, mean questions, tokens and duration per model and role from the games database.
+    """
+    import time
+    from rich.console import Console
+    from rich.table import Table
+
+    if not os.path.exists(db_path):
+        click.echo(f"❌ No existe la base de datos {db_path} (juega con --db o usa el comando import)")
+        return
+    store = get_store(db_path)
+    start = time.perf_counter()
+    rows = store.stats(role=role, model=model, since=since)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    table = Table(title="📊 Estadísticas por modelo")
+    for column in ("Modelo", "Rol", "Partidas", "Victorias", "% Victorias", "Preg. media", "Tokens medios", "Tiempo medio"):
+        table.add_column(column)
+    for row in rows:
+        duration = f"{row['duration']:.1f}s" if row["duration"] is not None else "-"
+        table.add_row(row["model"], "Detective" if row["role"] == "detective" else "Story Master", str(row["games"]),
+                      str(row["wins"]), f"{row['win_rate']:.0%}", f"{row['questions']:.1f}", f"{row['tokens']:.0f}", duration)
+    Console().print(table)
+    click.echo(f"{store.count()} partidas en {db_path} (consulta: {elapsed:.1f} ms)")
+
+@main.command()
+@click.option('--db', 'db_path', default=os.path.join('./conversations', DEFAULT_DB_FILE), help='SQLite database of games')
+@click.option('--role', type=click.Choice(['detective', 'master']), default=None, help='Only this role (default: both)')
+@click.option('--model', default=None, help='Only the pairings of this model')
+@click.option('--limit', type=int, default=None, help='Show only the top N models')
+def leaderboard(db_path, role, model, limit):
+    """
+    Shows the Elo ratings of detectives and Story Masters and the stats per pairing.
+    """
+    from src.display.ui import print_leaderboard
+
+    if not os.path.exists(db_path):
+        click.echo(f"❌ No existe la base de datos {db_path} (juega con --db o usa el comando import)")
+        return
+    store = get_store(db_path)
+    print_leaderboard(store.leaderboard(role, limit), store.pairings(model))
+
+@main.command('import')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--db', 'db_path', default=os.path.join('./conversations', DEFAULT_DB_FILE), help='SQLite database of games')
+def import_games(paths, db_path):
+    """
+    Imports saved games (JSON conversations and .jsonl journals, or folders containing them) into the games database.
+    """
+    import time
+    from src.storage.database import import_conversations
+
+    store = get_store(db_path)
+    start = time.perf_counter()
+    imported, skipped = import_conversations(store, paths)
+    elapsed = time.perf_counter() - start
+    click.echo(f"✅ {imported} partidas importadas en {db_path} ({elapsed:.1f}s); {skipped} ficheros ignorados")
+
+@main.command()
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('-o', '--output', 'archive_path', default=os.path.join('./conversations', f'archive.{ARCHIVE_EXTENSION}'), help='Archive file (appended to if it exists)')
+@click.option('--codec', type=click.Choice(['gzip', 'zstd']), default='gzip', help="Compression of new archives (zstd needs the 'zstandard' package)")
+def archive(paths, archive_path, codec):
+    """
+    Packs saved games (md, json, txt, .jsonl journals, or folders containing them) into one compressed archive.
+    """
+    from src.storage.archive import pack
+
+    try:
+        archived, skipped = pack(paths, archive_path, codec)
+    except ValueError as e:
+        click.echo(f"❌ Error: {e}")
+        return
+    click.echo(f"📦 {archived} partidas añadidas a {archive_path} ({os.path.getsize(archive_path) / 1024:.1f} KiB); "
+               f"{skipped} ficheros ignorados")
+
+@main.command()
+@click.argument('archive_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--game', 'game_ids', multiple=True, metavar='GAME_ID', help='Extract only this game. Repetible.')
+@click.option('--format', 'file_format', type=click.Choice(['json', 'txt', 'md']), default='md', help='Format of the extracted conversations')
+@click.option('--output-dir', default='./conversations', help='Folder where conversations will be written')
+@click.option('--list', 'list_only', is_flag=True, help='Only list the games in the archive')
+def extract(archive_path, game_ids, file_format, output_dir, list_only):
+    """
+    Extracts games from an archive as md, json or txt files.
+    """
+    from src.storage.archive import ArchiveReader, unpack
+
+    try:
+        if list_only:
+            with ArchiveReader(archive_path) as reader:
+                for game_id in reader.game_ids():
+                    click.echo(game_id)
+            return
+        written = unpack(archive_path, output_dir, file_format, game_ids)
+    except KeyError as e:
+        click.echo(f"❌ La partida {e.args[0]} no está en {archive_path}")
+        return
+    except ValueError as e:
+        click.echo(f"❌ Error: {e}")
+        return
+    click.echo(f"✅ {len(written)} partidas extraídas en {output_dir}")
 
 if __name__ == '__main__':
     main()
@@ -1,15 +1,23 @@
-import threading
+import os
 import queue
+import threading
+import tkinter as tk
 import customtkinter as ctk
 from datetime import datetime
 from ..game.interfaces import GameObserver
 from ..game.events import GameEvent, EventType
 from ..game.enums import GameState
 # Importamos factoría para el launcher
-from ..game.providers_factory import get_provider
-from ..game.orchestrator import GameOrchestrator
+from ..game.providers_factory import get_shared_provider
+from ..game.orchestrator import GameOrchestrator, resume_settings
+from ..game import runtime
+from ..game.story_pool import get_story_pool, STORY_POOL_FILE
+from ..storage.database import DEFAULT_DB_FILE, get_store
 from .terminal import TerminalObserver
 
+# Base de datos de partidas del launcher: alimenta la clasificación
+DB_PATH = os.path.join("./conversations", DEFAULT_DB_FILE)
+
 # Configuración de apariencia
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
@@ -48,7 +56,7 @@ class BlackStoryGUI(ctk.CTk):
             
         game_ui = GameFrame(self.container, orchestrator, human_moderator, self.quit_game)
         game_ui.pack(fill="both", expand=True)
-        game_ui.start_game_thread()
+        game_ui.start_game_task()
         
     def quit_game(self):
         # Volver al launcher o cerrar?
@@ -111,9 +119,28 @@ class LauncherFrame(ctk.CTkFrame):
         self.chk_moderator = ctk.CTkCheckBox(self.form_frame, text="Habilitar Moderador Humano")
         self.chk_moderator.grid(row=4, column=1, padx=20, pady=10, sticky="w")
         
+        self.chk_session = ctk.CTkCheckBox(self.form_frame, text="Modo sesión (solo envía lo nuevo en cada turno)")
+        self.chk_session.grid(row=5, column=1, padx=20, pady=10, sticky="w")
+        
+        self.chk_pipelined = ctk.CTkCheckBox(self.form_frame, text="Pipeline (prepara la siguiente pregunta en paralelo)")
+        self.chk_pipelined.grid(row=6, column=1, padx=20, pady=10, sticky="w")
+        
+        self.chk_story_pool = ctk.CTkCheckBox(self.form_frame, text="Reserva de historias (empieza sin esperar)")
+        self.chk_story_pool.grid(row=7, column=1, padx=20, pady=10, sticky="w")
+        
+        # RESUME (partida sin terminar, por su id)
+        self.entry_resume = ctk.CTkEntry(self.form_frame, placeholder_text="ID de partida a reanudar (ej: 20250101_120000_1a2b3c4d)")
+        self.entry_resume.grid(row=8, column=0, padx=20, pady=10, sticky="ew")
+        
         # START BUTTON
         self.btn_start = ctk.CTkButton(self, text="🚀 INICIAR PARTIDA", font=("Roboto", 20, "bold"), height=50, command=self.start_game)
-        self.btn_start.pack(pady=40, padx=100, fill="x")
+        self.btn_start.pack(pady=(40, 10), padx=100, fill="x")
+        
+        self.btn_resume = ctk.CTkButton(self, text="⏯️ REANUDAR PARTIDA", font=("Roboto", 16, "bold"), height=40, command=self.resume_game, fg_color="#555")
+        self.btn_resume.pack(pady=(0, 10), padx=100, fill="x")
+        
+        self.btn_leaderboard = ctk.CTkButton(self, text="🏆 CLASIFICACIÓN", font=("Roboto", 16, "bold"), height=40, command=self.show_leaderboard, fg_color="#555")
+        self.btn_leaderboard.pack(pady=(0, 30), padx=100, fill="x")
         
         self.lbl_error = ctk.CTkLabel(self, text="", text_color="red")
         self.lbl_error.pack(pady=5)
@@ -126,10 +153,15 @@ class LauncherFrame(ctk.CTkFrame):
             p2_prov = self.opt_m2_provider.get()
             max_q = int(self.entry_max_q.get())
             human_mod = self.chk_moderator.get() == 1
+            session_mode = self.chk_session.get() == 1
+            pipelined = self.chk_pipelined.get() == 1
+            use_story_pool = self.chk_story_pool.get() == 1
             
-            # Instanciar proveedores
-            prov1_instance = get_provider(p1_prov, m1_name)
-            prov2_instance = get_provider(p2_prov, m2_name)
+            # Proveedores compartidos entre partidas: se reutilizan sus conexiones
+            prov1_instance = get_shared_provider(p1_prov, m1_name)
+            prov2_instance = get_shared_provider(p2_prov, m2_name)
+            # La reserva es compartida entre partidas de la sesión y se rellena en segundo plano
+            story_pool = get_story_pool(prov1_instance, max_q, os.path.join("./conversations", STORY_POOL_FILE)) if use_story_pool else None
             
             # Crear orquestador
             game = GameOrchestrator(
@@ -138,7 +170,11 @@ class LauncherFrame(ctk.CTkFrame):
                 max_questions=max_q,
                 no_pause=False, # GUI needs pause for step-by-step control
                 output_dir="./conversations",
-                save_format="md"
+                save_format="md",
+                session_mode=session_mode,
+                pipelined=pipelined,
+                story_pool=story_pool,
+                store=get_store(DB_PATH)
             )
             
             # Conectar observador terminal para logs de consola tambien
@@ -152,6 +188,89 @@ class LauncherFrame(ctk.CTkFrame):
             self.lbl_error.configure(text=f"Error al iniciar: {str(e)}")
 
 
+    def resume_game(self):
+        """Continúa una partida sin terminar desde su último turno completo."""
+        try:
+            game_id = self.entry_resume.get().strip()
+            if not game_id:
+                raise ValueError("Indica el ID de la partida a reanudar")
+            settings = resume_settings("./conversations", game_id)
+            # Si el proveedor no se puede deducir (ej. un cassette), se usa el del formulario
+            prov1_instance = get_shared_provider(settings["provider1"] or self.opt_m1_provider.get(), settings["model1"])
+            prov2_instance = get_shared_provider(settings["provider2"] or self.opt_m2_provider.get(), settings["model2"])
+            
+            game = GameOrchestrator(
+                model1=prov1_instance,
+                model2=prov2_instance,
+                max_questions=settings["max_questions"],
+                no_pause=False,
+                output_dir="./conversations",
+                save_format="md",
+                session_mode=settings.get("session_mode", False),
+                history_token_budget=settings.get("history_token_budget"),
+                token_budget=settings.get("token_budget"),
+                pipelined=self.chk_pipelined.get() == 1,
+                resume=game_id,
+                store=get_store(DB_PATH)
+            )
+            game.subscribe(TerminalObserver())
+            self.app.show_game_frame(game, self.chk_moderator.get() == 1)
+
+        except Exception as e:
+            self.lbl_error.configure(text=f"Error al reanudar: {str(e)}")
+
+    def show_leaderboard(self):
+        """Abre la clasificación Elo de las partidas guardadas."""
+        try:
+            LeaderboardWindow(self)
+        except Exception as e:
+            self.lbl_error.configure(text=f"Error al abrir la clasificación: {str(e)}")
+
+
+class LeaderboardWindow(ctk.CTkToplevel):
+    """
+    Ventana con la clasificación Elo de detectives y Story Masters y las estadísticas por pareja.
+    Se actualiza con cada partida guardada; el botón "Actualizar" vuelve a consultarla.
+    """
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("🏆 Clasificación")
+        self.geometry("900x600")
+        
+        controls = ctk.CTkFrame(self)
+        controls.pack(fill="x", padx=10, pady=10)
+        self.opt_role = ctk.CTkOptionMenu(controls, values=["Todos", "Detective", "Story Master"], command=lambda _: self.refresh())
+        self.opt_role.set("Todos")
+        self.opt_role.pack(side="left", padx=10)
+        ctk.CTkButton(controls, text="🔄 Actualizar", command=self.refresh).pack(side="left", padx=10)
+        
+        self.text = ctk.CTkTextbox(self, font=("Consolas", 12), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.refresh()
+
+    def refresh(self):
+        roles = {"Todos": None, "Detective": "detective", "Story Master": "master"}
+        store = get_store(DB_PATH)
+        ratings = store.leaderboard(roles[self.opt_role.get()])
+        lines = [f"{'#':>3}  {'Modelo':<32} {'Rol':<13} {'Elo':>6} {'Partidas':>9} {'% Vict.':>10}"]
+        for position, row in enumerate(ratings, 1):
+            role = "Detective" if row["role"] == "detective" else "Story Master"
+            lines.append(f"{position:>3}  {row['model'][:32]:<32} {role:<13} {row['rating']:>6.0f} "
+                         f"{row['games']:>9} {row['win_rate']:>10.0%}")
+        if not ratings:
+            lines.append("   (Aún no hay partidas terminadas)")
+        lines += ["", f"{'Story Master':<24} {'Detective':<24} {'Partidas':>9} {'% Vict.':>8} {'Preg.':>6} {'Latencia':>9} {'Tok/vict.':>10}"]
+        for row in store.pairings():
+            latency = f"{row['latency']:.2f}s" if row["latency"] is not None else "-"
+            tokens = f"{row['tokens_per_win']:.0f}" if row["tokens_per_win"] is not None else "-"
+            lines.append(f"{row['master'][:24]:<24} {row['detective'][:24]:<24} {row['games']:>9} {row['win_rate']:>8.0%} "
+                         f"{row['questions']:>6.1f} {latency:>9} {tokens:>10}")
+        self.text.configure(state="normal")
+        self.text.delete("0.0", "end")
+        self.text.insert("0.0", "\n".join(lines))
+        self.text.configure(state="disabled")
+
+
 class GameFrame(ctk.CTkFrame, GameObserver):
     def __init__(self, master, orchestrator, human_moderator, on_quit_callback):
         ctk.CTkFrame.__init__(self, master) # Explicit super call for multi-inheritance safety
@@ -162,6 +281,10 @@ class GameFrame(ctk.CTkFrame, GameObserver):
         
         self.orchestrator.subscribe(self)
         self.event_queue = queue.Queue()
+        # Evita encolar un evento virtual por cada evento del juego si ya hay un drenado pendiente
+        self._drain_lock = threading.Lock()
+        self._drain_pending = False
+        self.bind("<<GameEvent>>", lambda _e: self._drain_queue())
         
         # Grid Layout
         self.grid_columnconfigure(0, weight=1)
@@ -186,18 +309,21 @@ class GameFrame(ctk.CTkFrame, GameObserver):
         self.btn_back = ctk.CTkButton(self.panel_detective, text="⬅️ Volver / Salir", command=self.on_quit, fg_color="#555")
         self.btn_back.pack(side="bottom", pady=10)
 
-        # Loop
-        self.after(100, self._check_queue)
+        # Eventos encolados antes de que arranque el mainloop
+        self.after_idle(self._drain_queue)
         
         # Variables
         self.questions_count = 0
+        self._partial_start = None  # Índice donde empieza el texto parcial en interaction_view
 
-    def start_game_thread(self):
-        thread = threading.Thread(target=self.orchestrator.play, daemon=True)
-        thread.start()
+    def start_game_task(self):
+        # La partida corre en el bucle de eventos compartido; no hace falta un hilo por partida
+        runtime.submit(self.orchestrator.aplay())
 
     def on_quit(self):
-        # TODO: Implement cleaner shutdown in orchestrator
+        # Una partida sin terminar se suspende: se puede reanudar desde el launcher con su ID
+        if self.orchestrator.state not in (GameState.RESUELTO, GameState.ERROR):
+            self.orchestrator.suspend()
         self.on_quit_callback()
     
     def on_next_question(self):
@@ -270,20 +396,52 @@ class GameFrame(ctk.CTkFrame, GameObserver):
             self.orchestrator.process_intervention(action, data)
 
     def on_event(self, event: GameEvent):
+        # Llamado desde el hilo del juego: se encola y se despierta al hilo de Tk
         self.event_queue.put(event)
+        with self._drain_lock:
+            if self._drain_pending:
+                return
+            self._drain_pending = True
+        try:
+            self.event_generate("<<GameEvent>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            # Ventana destruida o mainloop aún sin arrancar: se drenará en el próximo aviso
+            with self._drain_lock:
+                self._drain_pending = False
 
-    def _check_queue(self):
+    def _drain_queue(self):
+        with self._drain_lock:
+            self._drain_pending = False
         try:
             while True:
                 event = self.event_queue.get_nowait()
                 self._handle_event(event)
         except queue.Empty:
             pass
-        finally:
-            self.after(100, self._check_queue)
             
+    def _clear_partial(self):
+        """Elimina el texto parcial en curso; el mensaje completo lo sustituye."""
+        if self._partial_start is not None:
+            self.interaction_view.configure(state="normal")
+            self.interaction_view.delete(self._partial_start, "end")
+            self.interaction_view.configure(state="disabled")
+            self._partial_start = None
+
     def _handle_event(self, event):
         # Reutilizamos logica de evento anterior, simplificada
+        if event.type == EventType.RESPUESTA_PARCIAL:
+             self.interaction_view.configure(state="normal")
+             if self._partial_start is None:
+                 self._partial_start = self.interaction_view.index("end-1c")
+                 icon = "❓" if event.payload.get("role") == "Detective" else "🎭"
+                 self.interaction_view.insert("end", f"\n{icon} {event.payload.get('role', '').upper()} (escribiendo...):\n")
+             self.interaction_view.insert("end", event.payload.get("chunk", ""))
+             self.interaction_view.see("end")
+             self.interaction_view.configure(state="disabled")
+             return
+        if event.type in (EventType.PREGUNTA_DETECTIVE, EventType.RESPUESTA_MAESTRO, EventType.FIN_JUEGO):
+             self._clear_partial()
+
         if event.type == EventType.CAMBIO_ESTADO:
              self.lbl_status.configure(text=f"Estado: {event.payload.get('state').name}")
         elif event.type == EventType.NEW_STORY:
@@ -312,6 +470,13 @@ class GameFrame(ctk.CTkFrame, GameObserver):
              self.interaction_view.insert("end", f"\n🏁 {event.payload.get('result')}\n")
              self.interaction_view.see("end")
              self.interaction_view.configure(state="disabled")
+        elif event.type == EventType.METRICAS:
+             self.detective_log.configure(state="normal")
+             self.detective_log.insert("end", "> ⏱️ Latencias (p50 / p95):\n")
+             for row in event.payload.get("summary", []):
+                 self.detective_log.insert("end", f"  {row['phase']} {row['model']}: {row['p50']:.2f}s / {row['p95']:.2f}s\n")
+             self.detective_log.see("end")
+             self.detective_log.configure(state="disabled")
         elif event.type == EventType.LOG:
              self.detective_log.configure(state="normal")
              self.detective_log.insert("end", f"> {event.message}\n")
@@ -2,6 +2,7 @@ import logging
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
+from rich.table import Table
 from ..game.interfaces import GameObserver
 from ..game.events import GameEvent, EventType
 from ..game.enums import GameState
@@ -14,9 +15,27 @@ class TerminalObserver(GameObserver):
     """
     def __init__(self, console: Console = None):
         self.console = console or Console()
+        self._streaming_role = None  # Rol cuyo texto parcial se está mostrando
+
+    def _end_stream(self):
+        """Cierra la línea de texto parcial antes de pintar el mensaje completo."""
+        if self._streaming_role is not None:
+            self.console.print()
+            self._streaming_role = None
 
     def on_event(self, event: GameEvent):
         try:
+            if event.type == EventType.RESPUESTA_PARCIAL:
+                role = event.payload.get("role")
+                if role != self._streaming_role:
+                    self._end_stream()
+                    self.console.print(f"[dim]✍️ {role} ({event.payload.get('model_name', '')}):[/dim] ", end="")
+                    self._streaming_role = role
+                self.console.print(event.payload.get("chunk", ""), end="", style="dim", markup=False, highlight=False)
+                return
+
+            self._end_stream()
+
             if event.type == EventType.INICIO_JUEGO:
                 self.console.print("[bold green]🎮 Juego Iniciado[/bold green]")
 
@@ -47,6 +66,15 @@ class TerminalObserver(GameObserver):
                 color = "green" if result == "Victoria" else "red"
                 self.console.print(f"[{color}]🏁 Fin del juego: {result}[/{color}]")
 
+            elif event.type == EventType.METRICAS:
+                table = Table(title="⏱️ Latencias por fase", title_justify="left")
+                for column in ("Fase", "Modelo", "N", "p50", "p95", "p99", "Total"):
+                    table.add_column(column, justify="left" if column in ("Fase", "Modelo") else "right")
+                for row in event.payload.get("summary", []):
+                    table.add_row(row["phase"], row["model"] or "-", str(row["count"]), f"{row['p50']:.3f}s",
+                                  f"{row['p95']:.3f}s", f"{row['p99']:.3f}s", f"{row['total']:.2f}s")
+                self.console.print(table)
+
             elif event.type == EventType.ERROR:
                 self.console.print(f"[bold red]❌ Error: {event.message}[/bold red]")
 
@@ -1,6 +1,8 @@
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
+from rich.table import Table
+from typing import Any, Dict, List
 from ..storage.models import Message
 
 console = Console()
@@ -21,6 +23,8 @@ def print_message(message: Message, question_count: int = 0, max_questions: int
     meta = f"⏱️ {message.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
     if message.response_time:
         meta += f" | ⚡ {message.response_time:.2f}s"
+    if message.time_to_first_token:
+        meta += f" | 🥇 {message.time_to_first_token:.2f}s"
     if message.tokens:
         meta += f" | 🎫 {message.tokens} tokens"
     if question_count > 0:
@@ -36,6 +40,29 @@ def print_message(message: Message, question_count: int = 0, max_questions: int
     )
     console.print(content_panel)
 
+def print_leaderboard(ratings: List[Dict[str, Any]], pairings: List[Dict[str, Any]]):
+    """
+    Prints the Elo leaderboard and the per-pairing stats (see ConversationStore.leaderboard / pairings).
+    """
+    table = Table(title="🏆 Clasificación (Elo)")
+    for column in ("#", "Modelo", "Rol", "Elo", "Partidas", "Victorias", "% Victorias"):
+        table.add_column(column, justify="left" if column in ("Modelo", "Rol") else "right")
+    for position, row in enumerate(ratings, 1):
+        table.add_row(str(position), row["model"], "Detective" if row["role"] == "detective" else "Story Master",
+                      f"{row['rating']:.0f}", str(row["games"]), str(row["wins"]), f"{row['win_rate']:.0%}")
+    console.print(table)
+    if not pairings:
+        return
+    table = Table(title="🤝 Parejas")
+    for column in ("Story Master", "Detective", "Partidas", "% Victorias det.", "Preg. media", "Latencia media", "Tokens / victoria"):
+        table.add_column(column, justify="left" if column in ("Story Master", "Detective") else "right")
+    for row in pairings:
+        latency = f"{row['latency']:.2f}s" if row["latency"] is not None else "-"
+        tokens = f"{row['tokens_per_win']:.0f}" if row["tokens_per_win"] is not None else "-"
+        table.add_row(row["master"], row["detective"], str(row["games"]), f"{row['win_rate']:.0%}",
+                      f"{row['questions']:.1f}", latency, tokens)
+    console.print(table)
+
 def wait_for_enter(no_pause: bool):
     """
     Pauses execution until the user presses Enter.
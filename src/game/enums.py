@@ -24,3 +24,5 @@ class EventType(Enum):
     ERROR = auto()                # Ha ocurrido un error
     INTERVENCION = auto()         # Un humano o sistema externo ha intervenido (ej. pista forzada)
     LOG = auto()                  # Mensaje de log para mostrar en consola/UI
+    RESPUESTA_PARCIAL = auto()    # Fragmento de texto recibido mientras un modelo genera (streaming)
+    METRICAS = auto()             # Resumen de latencias por fase y modelo al terminar la partida
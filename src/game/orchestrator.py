@@ -1,35 +1,132 @@
 import time
+import asyncio
 import logging
 import threading
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from rich.console import Console # Kept for fail-safe or direct logging if strictly needed
-from ..providers.base import BaseProvider
+from ..providers.base import BaseProvider, Usage
+from ..providers.errors import ProviderError
 from ..storage.models import Conversation, Message
 from ..storage.saver import ConversationSaver
+from ..storage.database import ConversationStore
+from ..storage.history import HistoryBuffer
+from ..storage.answer_cache import AnswerCache, answer_key
+from ..storage.journal import ConversationJournal, new_game_id, journal_path, load_checkpoint, read_journal
 # Removed wait_for_enter import - using _wait_for_continue instead
-from .prompts import STORY_MASTER_PROMPT, DETECTIVE_PROMPT
+from ..providers.session import ChatSession
+from .prompts import (STORY_MASTER_PROMPT, DETECTIVE_PROMPT, DETECTIVE_SYSTEM_PROMPT, DETECTIVE_TURN_PROMPT,
+                      MASTER_ANSWER_SYSTEM_PROMPT, MASTER_ANSWER_TURN_PROMPT, HISTORY_SUMMARY_PROMPT,
+                      DUPLICATE_QUESTION_FEEDBACK)
 from .interfaces import GameObserver
 from .events import GameEvent, EventType
 from .enums import GameState
+from .rules import find_detective_cutoff, estimate_tokens, classify_answer, extract_question, parse_story, SPECULATIVE_ANSWERS
+from .story_pool import Story, StoryPool
+from .questions import QuestionIndex, DUPLICATE_MODES
+from . import runtime
+from ..metrics.registry import (MetricsRegistry, get_registry, PHASE_DURATION, TIME_TO_FIRST_TOKEN, STORY_GENERATION,
+                                STORY_PARSING, DETECTIVE_CALL, DETECTIVE_SPECULATION, MASTER_ANSWER, EVALUATION,
+                                HINT_GENERATION, HISTORY_SUMMARY, NOTIFY, SAVE, PROMPT_TOKENS, COMPLETION_TOKENS,
+                                TOKENS_PER_SECOND, WARMUP, MODEL_LOAD, log_summary)
 
 console = Console()
 
+# Por encima de este load_duration la llamada tuvo que cargar el modelo (si ya está cargado son milisegundos)
+MODEL_RELOAD_SECONDS = 0.5
+INITIAL_FEEDBACK = "Esta es tu primera pregunta. ¡Analiza bien la situación!"
+
+
+def resume_settings(output_dir: str, game_id: str) -> Dict:
+    """
+    Configuración con la que se jugó una partida guardada en `output_dir`, para reanudarla:
+    modelos y proveedores (None si el proveedor no se puede deducir, ej. un cassette),
+    límite de preguntas y opciones que afectan al estado guardado.
+
+    Raises:
+        ValueError: Si no existe el diario de esa partida.
+    """
+    try:
+        header = next(read_journal(journal_path(output_dir, game_id)), None)
+    except FileNotFoundError:
+        header = None
+    if header is None or header.get("type") != "header":
+        raise ValueError(f"No se encuentra la partida {game_id} en {output_dir}")
+    return {
+        "model1": header["model1_name"],
+        "provider1": header.get("model1_provider_name") or None,
+        "model2": header["model2_name"],
+        "provider2": header.get("model2_provider_name") or None,
+        "max_questions": header["max_questions"],
+        **header.get("options", {}),
+    }
+
+def _resolve_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+@dataclass
+class Generation:
+    """
+    Resultado de una llamada a un modelo desde el orquestador.
+    """
+    text: str
+    response_time: float
+    first_token_time: Optional[float] = None
+    stopped_early: bool = False # Se cortó el stream al detectar una jugada completa
+    usage: Optional[Usage] = None # Tokens y tiempos informados por el proveedor (o estimados)
+
+    def message_fields(self) -> Dict:
+        """Campos de Message con los tiempos y el consumo de tokens de la llamada."""
+        usage = self.usage or Usage()
+        return {
+            "response_time": self.response_time,
+            "time_to_first_token": self.first_token_time,
+            "tokens": usage.completion_tokens,
+            "prompt_tokens": usage.prompt_tokens,
+            "eval_duration": usage.eval_duration,
+            "load_duration": usage.load_duration,
+        }
+
 class GameOrchestrator:
-    def __init__(self, model1: BaseProvider, model2: BaseProvider, max_questions: int, no_pause: bool, output_dir: str, save_format: str):
+    def __init__(self, model1: BaseProvider, model2: BaseProvider, max_questions: int, no_pause: bool, output_dir: str, save_format: str,
+                 stream: bool = True, early_stop: bool = True, session_mode: bool = False,
+                 history_token_budget: Optional[int] = None, pipelined: bool = False,
+                 story: Optional[Story] = None, story_pool: Optional[StoryPool] = None,
+                 token_budget: Optional[int] = None, warm_up: bool = True,
+                 answer_cache: Optional[AnswerCache] = None, duplicate_questions: str = "nudge",
+                 resume: Optional[str] = None, store: Optional[ConversationStore] = None):
         self.model1 = model1
         self.model2 = model2
         self.max_questions = max_questions
         self.no_pause = no_pause
+        self.stream = stream # Emitir RESPUESTA_PARCIAL mientras los modelos generan
+        self.early_stop = early_stop # Cortar al detective en cuanto formula una pregunta o RESOLVER (requiere stream)
+        self.session_mode = session_mode # Sesiones de chat: cada turno solo envía lo nuevo
+        self.pipelined = pipelined # Preparar la siguiente pregunta mientras el maestro responde
+        self.story = story # Historia fija para esta partida (ej. conjunto fijo de un torneo)
+        self.story_pool = story_pool # Reserva de historias pre-generadas
+        self.token_budget = token_budget # Tokens (prompt + respuesta) tras los que la partida se detiene
+        self.warm_up = warm_up # Precargar los modelos antes de empezar
+        self.answer_cache = answer_cache # Respuestas del maestro ya dadas a la misma pregunta y solución
+        if duplicate_questions not in DUPLICATE_MODES:
+            raise ValueError(f"Unknown duplicate question mode: {duplicate_questions}")
+        # Pregunta repetida: 'reuse' repite la respuesta anterior sin llamar al maestro,
+        # 'nudge' pide otra pregunta al detective (una vez por turno), 'off' no las detecta
+        self.duplicate_questions = duplicate_questions
+        self._questions = QuestionIndex() if duplicate_questions != "off" else None
         self.output_dir = output_dir
         self.save_format = save_format
-        self.saver = ConversationSaver(output_dir)
+        self.saver = ConversationSaver(output_dir, store=store) # store: base de datos SQLite de partidas
+        self.game_id = new_game_id()
         self.conversation = Conversation(
             model1_name=self.model1.model_name,
             model1_provider=self.model1.__class__.__name__,
             model2_name=self.model2.model_name,
             model2_provider=self.model2.__class__.__name__,
             max_questions=self.max_questions,
-            full_solution=""
+            full_solution="",
+            game_id=self.game_id
         )
         
         self._observers: List[GameObserver] = []
@@ -37,7 +134,38 @@ class GameOrchestrator:
         self._stop_event = threading.Event()
         self._pause_event = threading.Event()  # Para control paso a paso
         self._pause_event.set()  # Inicialmente no pausado
+        # Espera combinada sobre pausa/parada: los futuros pendientes se resuelven desde
+        # continue_game()/stop() (cualquier hilo) sin sondear periódicamente
+        self._wakeup_lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
         self._intervention_queue = [] # Para intervenciones del moderador
+        self.saved_path: Optional[str] = None # Ruta del fichero guardado al terminar
+        self.error: Optional[str] = None # Motivo del fallo si la partida termina en ERROR
+        self._detective_full_tokens: List[int] = [] # Longitud de las respuestas no cortadas del detective
+        self._detective_session: Optional[ChatSession] = None
+        self._master_session: Optional[ChatSession] = None
+        self._session_cursor = 1 # Primer mensaje que el detective aún no ha recibido en su sesión
+        self._suspended = False # Detenida para reanudarla más tarde: no se resuelve ni se guarda
+        # Latencias por fase de esta partida; también alimentan el registro global que se exporta
+        self.metrics = MetricsRegistry(parent=get_registry())
+        # Punto de control desde el que continúa una partida reanudada (ver _restore)
+        self._resume_point: Optional[Dict] = None
+        if resume is not None:
+            self._restore(resume)
+        # Diario de la partida: cada mensaje y evento se añade a disco en cuanto ocurre
+        self.journal = ConversationJournal(journal_path(output_dir, self.game_id))
+        self.conversation.journal = self.journal
+        # Por encima de este tamaño (tokens aprox.) el historial antiguo se resume
+        self.conversation.history.token_budget = history_token_budget
+        if self._resume_point is not None and self._resume_point.get("history_summary"):
+            # El historial ya estaba resumido: se rehace el mismo resumen sin volver a llamar al modelo
+            history = self.conversation.history
+            history.compact(len(history.lines) - self._resume_point["history_tail"], self._resume_point["history_summary"])
+
+    @property
+    def state(self) -> GameState:
+        """Estado actual del juego (solo lectura)."""
+        return self._state
 
     def subscribe(self, observer: GameObserver):
         """Añade un observador."""
@@ -46,11 +174,17 @@ class GameOrchestrator:
     def _notify(self, type: EventType, message: str = None, payload: dict = None):
         """Notifica un evento a todos los observadores."""
         event = GameEvent(type=type, message=message, payload=payload or {})
+        if type != EventType.RESPUESTA_PARCIAL:
+            # Los fragmentos de streaming no se apuntan: el mensaje completo ya queda en el diario
+            self.journal.write("event", event=type.name, message=message,
+                               payload={k: v for k, v in event.payload.items() if isinstance(v, (str, int, float, bool, GameState))})
+        start = time.perf_counter()
         for observer in self._observers:
             try:
                 observer.on_event(event)
             except Exception as e:
                 logging.error(f"Error notificando a observador {observer}: {e}")
+        self.metrics.observe(PHASE_DURATION, time.perf_counter() - start, phase=NOTIFY, model="")
 
     def _set_state(self, new_state: GameState):
         self._state = new_state
@@ -58,15 +192,43 @@ class GameOrchestrator:
 
     def continue_game(self):
         """Permite que el juego continúe al siguiente paso."""
-        self._pause_event.set()
+        self._signal(self._pause_event)
+
+    def stop(self):
+        """Detiene el juego en el siguiente paso, despertando cualquier espera pendiente."""
+        self._signal(self._stop_event)
+
+    def suspend(self):
+        """
+        Detiene el juego sin darlo por terminado: queda en el diario hasta su último turno
+        completo y se puede continuar con GameOrchestrator(..., resume=game_id).
+        """
+        self._suspended = True
+        self.stop()
+
+    def _signal(self, event: threading.Event):
+        """Activa un evento y despierta a todas las esperas. Seguro desde cualquier hilo."""
+        with self._wakeup_lock:
+            event.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_resolve_waiter, waiter)
     
-    def _wait_for_continue(self):
+    async def _wait_for_continue(self):
         """Espera hasta que se llame continue_game() o se detenga el juego."""
-        if not self.no_pause:
-            self._pause_event.clear()
-            self._notify(EventType.LOG, message="⏸️ Esperando continuar...")
-            while not self._pause_event.is_set() and not self._stop_event.is_set():
-                time.sleep(0.1)
+        if self.no_pause:
+            return
+        self._pause_event.clear()
+        self._notify(EventType.LOG, message="⏸️ Esperando continuar...")
+
+        with self._wakeup_lock:
+            # Comprobación bajo el lock: una señal llegada antes de registrarse no se pierde
+            if self._pause_event.is_set() or self._stop_event.is_set():
+                return
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        await waiter
     
     def process_intervention(self, action: str, data: dict = None):
         """
@@ -77,10 +239,12 @@ class GameOrchestrator:
         self._notify(EventType.INTERVENCION, message=f"Intervención: {action}", payload=data or {})
         
         if action == "force_end":
-            self._stop_event.set()
+            self.stop()
             
         elif action == "hint":
             text = data.get("text", "") if data else ""
+            response_time = None # Solo las pistas generadas por el modelo tienen tiempo de respuesta
+            usage = Usage()
             
             if not text:
                 # Auto-generate hint using AI
@@ -97,11 +261,12 @@ class GameOrchestrator:
                 )
                 
                 try:
-                    import time
                     start_time = time.time()
-                    ai_hint = self.model1.generate_response(hint_prompt)
+                    with self.metrics.span(HINT_GENERATION, self.model1.model_name):
+                        response = self.model1.generate(hint_prompt)
                     response_time = time.time() - start_time
-                    text = ai_hint.strip()
+                    usage = self._complete_usage(response.usage, hint_prompt, {}, response.text)
+                    text = response.text.strip()
                     logging.info(f"AI hint generated: {text[:100]}...")
                 except Exception as e:
                     logging.error(f"Error generating AI hint: {e}")
@@ -109,7 +274,9 @@ class GameOrchestrator:
             
             # Crear mensaje de pista
             formatted_content = f"💡 Moderador (Pista): {text}"
-            msg = Message("ai_hint", self.model1.model_name, "Moderator", formatted_content)
+            msg = Message("ai_hint", self.model1.model_name, "Moderator", formatted_content, response_time=response_time,
+                          tokens=usage.completion_tokens, prompt_tokens=usage.prompt_tokens,
+                          eval_duration=usage.eval_duration, load_duration=usage.load_duration)
             self.conversation.add_message(msg)
             
             # Notificar para que salga en la UI
@@ -126,26 +293,172 @@ class GameOrchestrator:
                 # Notificar para que salga en la UI
                 self._notify(EventType.RESPUESTA_MAESTRO, payload={"message": msg}) 
 
+    async def _generate(self, provider: BaseProvider, prompt: str, role: str, phase: str, notify_chunks: bool = True,
+                        stop_at: Optional[Callable[[str], Optional[int]]] = None,
+                        session: Optional[ChatSession] = None) -> Generation:
+        """
+        Llama al modelo dentro de una medición de la fase `phase` (ver _call_model).
+        """
+        with self.metrics.span(phase, provider.model_name):
+            generation = await self._call_model(provider, prompt, role, notify_chunks, stop_at, session)
+        model = provider.model_name
+        if generation.first_token_time is not None:
+            self.metrics.observe(TIME_TO_FIRST_TOKEN, generation.first_token_time, phase=phase, model=model)
+        usage = generation.usage
+        if usage.prompt_tokens is not None:
+            self.metrics.observe(PROMPT_TOKENS, usage.prompt_tokens, phase=phase, model=model)
+        if usage.completion_tokens is not None:
+            self.metrics.observe(COMPLETION_TOKENS, usage.completion_tokens, phase=phase, model=model)
+        if usage.tokens_per_second is not None:
+            self.metrics.observe(TOKENS_PER_SECOND, usage.tokens_per_second, phase=phase, model=model)
+        if usage.load_duration is not None and usage.load_duration >= MODEL_RELOAD_SECONDS:
+            # El modelo no estaba cargado: expulsado por el otro, o caducó su keep_alive
+            self.conversation.stats["model_reloads"] = self.conversation.stats.get("model_reloads", 0) + 1
+            self._record_load(model, phase, usage.load_duration)
+            logging.warning(f"{model} was reloaded during {phase} ({usage.load_duration:.1f}s)")
+        return generation
+
+    def _complete_usage(self, usage: Optional[Usage], prompt: str, kwargs: Dict, text: str) -> Usage:
+        """
+        Rellena con estimaciones los tokens que el proveedor no informó (proveedores sin
+        contabilidad, o streams cortados antes del último fragmento), para que el
+        presupuesto de tokens no se quede corto.
+        """
+        usage = usage or Usage()
+        if usage.prompt_tokens is not None and usage.completion_tokens is not None:
+            return usage
+        self.conversation.stats["estimated_usage_calls"] = self.conversation.stats.get("estimated_usage_calls", 0) + 1
+        if usage.prompt_tokens is None:
+            parts = [prompt, kwargs.get("system") or ""] + [m["content"] for m in kwargs.get("history") or []]
+            usage.prompt_tokens = sum(estimate_tokens(part) for part in parts)
+        if usage.completion_tokens is None:
+            usage.completion_tokens = estimate_tokens(text)
+        return usage
+
+    async def _call_model(self, provider: BaseProvider, prompt: str, role: str, notify_chunks: bool,
+                          stop_at: Optional[Callable[[str], Optional[int]]],
+                          session: Optional[ChatSession]) -> Generation:
+        """
+        Llama al modelo y devuelve el texto junto con sus tiempos.
+        En modo streaming notifica cada fragmento como RESPUESTA_PARCIAL para que la UI
+        muestre el progreso sin esperar al texto completo.
+
+        Si se indica `stop_at`, se evalúa sobre el texto acumulado tras cada fragmento; en
+        cuanto devuelve una posición se corta el texto ahí y se cierra el stream, lo que
+        cancela la generación en el servidor.
+
+        Con `session`, el prompt es solo el mensaje nuevo del turno; el turno (ya recortado)
+        se añade al historial de la sesión al terminar.
+        """
+        start_time = time.time()
+        kwargs = {}
+        if session is not None:
+            turn_prompt = prompt
+            prompt, kwargs = session.prepare(turn_prompt)
+
+        if not self.stream:
+            response = await provider.agenerate(prompt, **kwargs)
+            text = response.text
+            if session is not None:
+                session.record(turn_prompt, text)
+            return Generation(text, time.time() - start_time,
+                              usage=self._complete_usage(response.usage, prompt, kwargs, text))
+
+        text = ""
+        first_token_time = None
+        stopped_early = False
+        stream = provider.astream(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                if not chunk:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                text += chunk
+                if notify_chunks:
+                    self._notify(EventType.RESPUESTA_PARCIAL, payload={
+                        "role": role,
+                        "model_name": provider.model_name,
+                        "chunk": chunk
+                    })
+                if stop_at is not None:
+                    cutoff = stop_at(text)
+                    if cutoff is not None:
+                        text = text[:cutoff]
+                        stopped_early = True
+                        break
+        finally:
+            await stream.aclose()
+        if session is not None:
+            session.record(turn_prompt, text)
+        # Si el stream se cortó antes del final, el proveedor no llegó a informar el consumo
+        usage = self._complete_usage(stream.usage, prompt, kwargs, text)
+        return Generation(text, time.time() - start_time, first_token_time, stopped_early, usage)
+
+    def _record_detective_length(self, generation: Generation) -> Optional[int]:
+        """
+        Lleva la longitud media de las respuestas completas del detective y, si la
+        generación se cortó antes, devuelve una estimación de los tokens ahorrados.
+        """
+        tokens = estimate_tokens(generation.text)
+        if not generation.stopped_early:
+            self._detective_full_tokens.append(tokens)
+            return None
+        if not self._detective_full_tokens:
+            # Aún no hay ninguna respuesta completa con la que comparar
+            return 0
+        average = sum(self._detective_full_tokens) / len(self._detective_full_tokens)
+        return max(0, round(average) - tokens)
+
     def play(self):
         """
-        Método principal de ejecución. 
+        Método principal de ejecución (síncrono).
+        Envoltorio fino sobre aplay(): ejecuta la partida en el bucle de eventos compartido
+        del proceso y bloquea hasta que termina.
+        """
+        runtime.run(self.aplay())
+
+    async def aplay(self):
+        """
+        Versión asíncrona de play().
         Ahora diseñado para ser thread-safe en cuanto a la notificación de eventos.
+        Muchas partidas pueden ejecutarse a la vez en un mismo bucle de eventos.
         """
         try:
-            logging.info("Starting a new game.")
+            resume_point = self._resume_point
+            if resume_point is None:
+                logging.info("Starting a new game.")
+                self.journal.write_header(self.conversation, self.game_id, **self._header_fields())
+            else:
+                logging.info(f"Resuming game {self.game_id} after {resume_point['questions_asked']} questions.")
+                # Lo escrito tras el último punto de control se descarta al leer el diario
+                self.journal.write("resume", durable=True, messages=resume_point["messages"])
             self._notify(EventType.INICIO_JUEGO)
+            self._notify(EventType.LOG, message=f"🆔 Partida {self.game_id}")
             
+            # Fase 0: Precarga de modelos
+            if self.warm_up:
+                await self._warm_up()
+
             # Fase 1: Inicio
             if self._stop_event.is_set(): return
-            self._start_game()
+            if resume_point is None:
+                await self._start_game()
+            else:
+                await self._replay_resumed()
 
             # Fase 2: Interrogatorio
             if self._stop_event.is_set(): return
-            self._interrogation_loop()
+            if resume_point is None or resume_point["phase"] == "interrogation":
+                await self._interrogation_loop()
+
+            if self._suspended:
+                self._notify(EventType.LOG, message=f"⏸️ Partida suspendida; se puede reanudar con --resume {self.game_id}")
+                return
 
             # Fase 3: Resolución (si no se detuvo antes)
             if not self._stop_event.is_set() and self._state != GameState.RESUELTO:
-                self._resolve_game()
+                await self._resolve_game()
 
              # Fase 4: Guardado
             self._save_conversation()
@@ -154,93 +467,191 @@ class GameOrchestrator:
             if self._state != GameState.RESUELTO:
                  self._set_state(GameState.RESUELTO)
 
+        except ProviderError as e:
+            # El modelo no respondió ni tras los reintentos: la partida no puede seguir,
+            # pero lo jugado hasta ahora se conserva
+            logging.error(f"Error del proveedor {e.provider}({e.model}): {e}")
+            self.error = str(e)
+            self.conversation.result = "Error"
+            self._notify(EventType.ERROR, message=f"{e.model or e.provider} no responde: {e}")
+            self._set_state(GameState.ERROR)
+            self._save_partial()
         except Exception as e:
             logging.error(f"Error crítico en el juego: {e}", exc_info=True)
+            self.error = str(e)
             self._notify(EventType.ERROR, message=str(e))
             self._set_state(GameState.ERROR)
+        finally:
+            self._report_metrics()
+            self.journal.close()
 
-    def _start_game(self):
-        prompt = STORY_MASTER_PROMPT.format(max_questions=self.max_questions)
-        start_time = time.time()
-        
-        # Notificar estado
-        self._notify(EventType.LOG, message="Generando historia...")
-        
-        raw_story_response = self.model1.generate_response(prompt)
-        response_time = time.time() - start_time
-        
-        # Debug logging
-        logging.info(f"Raw story response length: {len(raw_story_response)}")
-        logging.debug(f"Raw story response: {raw_story_response[:500]}...")  # First 500 chars
-        
-        story_situation = ""
-        full_solution = ""
-        
-        # Intentar extraer con diferentes variaciones
-        response_upper = raw_story_response.upper()
-        
-        if "SITUACIÓN:" in response_upper and "SOLUCIÓN:" in response_upper:
-            # Encontrar las posiciones case-insensitive
-            sit_idx = response_upper.find("SITUACIÓN:")
-            sol_idx = response_upper.find("SOLUCIÓN:")
-            
-            # Extraer usando las posiciones encontradas
-            story_situation = raw_story_response[sit_idx+10:sol_idx].strip()
-            full_solution = raw_story_response[sol_idx+9:].strip()
-            logging.info("Extracted using SITUACIÓN/SOLUCIÓN format")
-        elif "SITUACION:" in response_upper and "SOLUCION:" in response_upper:
-            # Sin tilde
-            sit_idx = response_upper.find("SITUACION:")
-            sol_idx = response_upper.find("SOLUCION:")
-            
-            story_situation = raw_story_response[sit_idx+10:sol_idx].strip()
-            full_solution = raw_story_response[sol_idx+9:].strip()
-            logging.info("Extracted using SITUACION/SOLUCION format (no accents)")
+    def _header_fields(self) -> Dict:
+        """
+        Datos de la cabecera del diario necesarios para reanudar la partida (ver resume_settings).
+        """
+        return {
+            "model1_provider_name": self.model1.provider_name,
+            "model2_provider_name": self.model2.provider_name,
+            "options": {
+                "session_mode": self.session_mode,
+                "history_token_budget": self.conversation.history.token_budget,
+                "token_budget": self.token_budget,
+            },
+        }
+
+    def _checkpoint(self, questions_asked: int, score_feedback: str, phase: str = "interrogation"):
+        """
+        Guarda en el diario (con fsync) el estado tras un turno completo, desde el que la
+        partida se puede reanudar sin repetir ninguna llamada ya hecha. `phase` es
+        'interrogation', o 'resolution' si el detective ya propuso su solución.
+        """
+        history = self.conversation.history
+        self.journal.write(
+            "checkpoint", durable=True, phase=phase, messages=len(self.conversation.messages),
+            questions_asked=questions_asked, score_feedback=score_feedback, state=self._state,
+            stats=self.conversation.stats, prompt_tokens=self.conversation.prompt_tokens,
+            completion_tokens=self.conversation.completion_tokens,
+            history_summary=history.summary, history_tail=len(history.lines) - 1,
+            detective_session=self._detective_session.history if self._detective_session is not None else None,
+            session_cursor=self._session_cursor
+        )
+
+    def _restore(self, game_id: str):
+        """
+        Carga el último punto de control de la partida `game_id` para continuarla.
+
+        Raises:
+            ValueError: Si la partida no existe, ya terminó o no completó ningún turno.
+        """
+        conversation, state = load_checkpoint(journal_path(self.output_dir, game_id))
+        checkpoint = state.checkpoint
+        self.game_id = game_id
+        self.max_questions = conversation.max_questions
+        self.conversation = conversation
+        self.conversation.questions_used = checkpoint["questions_asked"]
+        self._state = GameState[checkpoint["state"]]
+        self._resume_point = {**checkpoint, "situation": state.solution.get("situation", "")}
+        if self._questions is not None:
+            question = None
+            for message in conversation.messages[1:]:
+                if message.role == "Detective":
+                    question = message.content
+                elif message.role == "Story Master" and question is not None:
+                    self._questions.add(question, message.content)
+                    question = None
+
+    async def _replay_resumed(self):
+        """
+        Vuelve a notificar lo ya jugado de una partida reanudada, para que la interfaz lo
+        muestre, sin llamar a ningún modelo.
+        """
+        messages = self.conversation.messages
+        self._notify(EventType.NEW_STORY, payload={
+            "message": messages[0],
+            "story_situation": self._resume_point["situation"] or messages[0].content,
+            "full_solution": self.conversation.full_solution
+        })
+        questions_asked = 0
+        for message in messages[1:]:
+            if message.role == "Detective":
+                questions_asked += 1
+                self._notify(EventType.PREGUNTA_DETECTIVE, payload={
+                    "message": message,
+                    "questions_asked": questions_asked,
+                    "max_questions": self.max_questions
+                })
+            else:
+                self._notify(EventType.RESPUESTA_MAESTRO, payload={"message": message})
+        self._notify(EventType.LOG, message=f"▶️ Partida reanudada tras {self._resume_point['questions_asked']} preguntas")
+        self._set_state(self._state)
+        await self._wait_for_continue()
+
+    def _providers(self) -> List[BaseProvider]:
+        # El mismo proveedor puede hacer de Story Master y de Detective
+        return [self.model1] if self.model2 is self.model1 else [self.model1, self.model2]
+
+    async def _warm_up(self):
+        """
+        Precarga los modelos antes de la primera llamada real, para que la carga de pesos
+        no caiga en la generación de la historia, y comprueba que caben los dos a la vez.
+        """
+        self._notify(EventType.LOG, message="Precargando modelos...")
+        for provider in self._providers():
+            try:
+                with self.metrics.span(WARMUP, provider.model_name):
+                    load_seconds = await provider.awarm_up()
+            except Exception as e:
+                # La partida sigue: si el modelo no está disponible, la primera llamada lo dirá
+                logging.warning(f"Warm-up of {provider.model_name} failed: {e}")
+                continue
+            if load_seconds is not None:
+                self._record_load(provider.model_name, WARMUP, load_seconds)
+                self._notify(EventType.LOG, message=f"🔥 {provider.model_name} listo (carga: {load_seconds:.1f}s)")
+        await self._check_residency()
+
+    async def _check_residency(self):
+        """
+        Avisa si los dos modelos no pueden estar cargados a la vez en un mismo servidor:
+        se expulsarían mutuamente de la memoria y cada turno pagaría una recarga.
+        """
+        providers = self._providers()
+        if len(providers) < 2:
+            return
+        try:
+            residency = [await p.aresident_models() for p in providers]
+        except Exception as e:
+            logging.warning(f"Could not check model residency: {e}")
+            return
+        if any(r is None for r in residency):
+            return
+        for host in set(residency[0]) & set(residency[1]):
+            # Tras precargar los dos, el último estado del servidor dice cuáles siguen cargados
+            loaded = residency[1][host]
+            missing = [p.model_name for p in providers if p.resident_name not in loaded]
+            if missing:
+                message = (f"⚠️ {', '.join(missing)} no sigue cargado en {host} junto al otro modelo: "
+                           "los turnos pagarán recargas. Usa modelos más pequeños o servidores distintos.")
+                logging.warning(message)
+                self._notify(EventType.LOG, message=message)
+
+    def _record_load(self, model: str, phase: str, seconds: float):
+        """
+        Contabiliza el tiempo de carga del modelo aparte del de inferencia.
+        """
+        stats = self.conversation.stats
+        stats["model_load_seconds"] = round(stats.get("model_load_seconds", 0.0) + seconds, 3)
+        self.metrics.observe(MODEL_LOAD, seconds, phase=phase, model=model)
+
+    async def _start_game(self):
+        story = self.story
+        if story is None and self.story_pool is not None:
+            story = self.story_pool.pop()
+
+        if story is not None:
+            # Historia pre-generada: la partida empieza sin esperar al Story Master
+            self._notify(EventType.LOG, message="Historia tomada de la reserva")
+            story_situation, full_solution = story.situation, story.solution
+            generation = Generation(text="", response_time=0.0)
         else:
-            # Fallback: intentar dividir por líneas y buscar patrones
-            lines = raw_story_response.split('\n')
-            in_solution = False
-            situation_lines = []
-            solution_lines = []
+            prompt = STORY_MASTER_PROMPT.format(max_questions=self.max_questions)
             
-            for line in lines:
-                line_upper = line.upper()
-                if "SITUACIÓN:" in line_upper or "SITUACION:" in line_upper:
-                    # Extraer lo que viene después de SITUACIÓN:
-                    if ":" in line:
-                        situation_lines.append(line.split(":", 1)[1].strip())
-                    in_solution = False
-                elif "SOLUCIÓN:" in line_upper or "SOLUCION:" in line_upper:
-                    # Extraer lo que viene después de SOLUCIÓN:
-                    if ":" in line:
-                        solution_lines.append(line.split(":", 1)[1].strip())
-                    in_solution = True
-                elif in_solution and line.strip():
-                    solution_lines.append(line.strip())
-                elif not in_solution and line.strip() and not situation_lines:
-                    situation_lines.append(line.strip())
+            # Notificar estado
+            self._notify(EventType.LOG, message="Generando historia...")
             
-            if situation_lines:
-                story_situation = " ".join(situation_lines)
-            if solution_lines:
-                full_solution = " ".join(solution_lines)
-            
-            logging.info(f"Used fallback extraction. Found {len(situation_lines)} situation lines, {len(solution_lines)} solution lines")
-            
-            # Si aún no tenemos nada, usar toda la respuesta como situación
-            if not story_situation:
-                logging.warning("Story Master did not follow format. Using full response as situation.")
-                story_situation = raw_story_response.strip()
-                full_solution = "No se pudo extraer la solución completa. Por favor, revisa el formato de respuesta del modelo."
+            # Los fragmentos no se notifican: la respuesta incluye la solución secreta
+            generation = await self._generate(self.model1, prompt, "Story Master", STORY_GENERATION, notify_chunks=False)
+            with self.metrics.span(STORY_PARSING, self.model1.model_name):
+                story_situation, full_solution = parse_story(generation.text)
 
         logging.info(f"Final solution length: {len(full_solution)}")
         logging.debug(f"Final solution: {full_solution[:200]}...")  # First 200 chars
         
         self.conversation.full_solution = full_solution
+        self.journal.write("solution", full_solution=full_solution, situation=story_situation)
         
         display_content = f"🎭 HISTORIA:\n\n{story_situation}\n\n📋 REGLAS:\n\n- Solo puedes hacer preguntas que se respondan con SÍ, NO o NO ES RELEVANTE\n- Cuando creas tener la solución completa, di \"RESOLVER:\" seguido de tu explicación\n- Tienes un máximo de {self.max_questions} preguntas\n\n¡Empieza a preguntar!"
 
-        msg = Message("model1", self.model1.model_name, "Story Master", display_content, response_time=response_time)
+        msg = Message("model1", self.model1.model_name, "Story Master", display_content, **generation.message_fields())
         self.conversation.add_message(msg)
         
         # Notificar evento
@@ -249,106 +660,365 @@ class GameOrchestrator:
             "story_situation": story_situation,
             "full_solution": full_solution
         })
+        self._checkpoint(0, INITIAL_FEEDBACK)
 
         # Story displayed, wait for user to continue
-        self._wait_for_continue()
+        await self._wait_for_continue()
+
+    def _token_budget_exhausted(self) -> bool:
+        """
+        Indica si la partida ya ha consumido su presupuesto de tokens (si lo tiene).
+        """
+        if self.token_budget is None or self.conversation.total_tokens < self.token_budget:
+            return False
+        if not self.conversation.stats.get("token_budget_exhausted"):
+            self.conversation.stats["token_budget_exhausted"] = True
+            logging.info(f"Token budget exhausted: {self.conversation.total_tokens}/{self.token_budget}")
+            self._notify(EventType.LOG, message=f"🪙 Presupuesto de tokens agotado ({self.conversation.total_tokens}/{self.token_budget})")
+        return True
 
     def _format_history(self):
-        history = []
-        for msg in self.conversation.messages[1:]:
-            role = "Detective" if msg.role == "Detective" else "Respuesta"
-            history.append(f"- {role}: {msg.content.strip()}")
-        return "\n".join(history) if history else "Aún no hay preguntas."
+        # El historial se renderiza de forma incremental en Conversation.add_message
+        return self.conversation.history.text
 
-    def _interrogation_loop(self):
-        questions_asked = 0
-        score_feedback = "Esta es tu primera pregunta. ¡Analiza bien la situación!"
-        
-        while questions_asked < self.max_questions and not self._stop_event.is_set():
-            # Check interaction queue or manual pause here if needed
-            self._set_state(GameState.EN_PROGRESO)
+    async def _compact_history(self):
+        """
+        Si el historial supera el presupuesto de tokens, resume la mitad más antigua.
+        Lo resume el detective y no el maestro, para que la solución secreta no se filtre al resumen.
+        """
+        history = self.conversation.history
+        if not history.over_budget() or len(history.lines) < 4:
+            return
 
-            story_situation = self.conversation.messages[0].content
-            conversation_history = self._format_history()
+        count = len(history.lines) // 2
+        prompt = HISTORY_SUMMARY_PROMPT.format(history="\n".join(history.lines[:count]))
+        self._notify(EventType.LOG, message="Resumiendo historial...")
+        try:
+            with self.metrics.span(HISTORY_SUMMARY, self.model2.model_name):
+                response = await self.model2.agenerate(prompt)
+        except Exception as e:
+            logging.error(f"Error resumiendo el historial: {e}")
+            return
+        summary = response.text
+        usage = self._complete_usage(response.usage, prompt, {}, summary)
+        self.conversation.add_usage(usage.prompt_tokens, usage.completion_tokens)
+        before = history.token_estimate
+        history.compact(count, summary)
+        logging.info(f"Historial resumido: ~{before} -> ~{history.token_estimate} tokens")
 
-            force_solve_instructions = ""
-            if questions_asked >= 5:
-                force_solve_instructions = "YA HAS HECHO 5 PREGUNTAS. DEBES INTENTAR RESOLVER LA HISTORIA AHORA. USA 'RESOLVER:'."
-                self._set_state(GameState.CERCA) # Indicativo visual opcional
+    def _open_sessions(self):
+        """
+        Abre las sesiones de chat de la partida (modo sesión).
+        El detective conserva su historial; el maestro solo un prefijo fijo con la solución,
+        porque cada respuesta depende únicamente de la pregunta y de la historia secreta.
+        """
+        self._detective_session = self.model2.start_session(
+            DETECTIVE_SYSTEM_PROMPT.format(story_situation=self.conversation.messages[0].content, max_questions=self.max_questions)
+        )
+        self._master_session = self.model1.start_session(
+            MASTER_ANSWER_SYSTEM_PROMPT.format(full_solution=self.conversation.full_solution),
+            keep_history=False
+        )
+        if self._resume_point is not None and self._resume_point.get("detective_session") is not None:
+            # Partida reanudada: el detective recupera su conversación tal y como la tenía
+            self._detective_session.history = list(self._resume_point["detective_session"])
+            self._session_cursor = self._resume_point["session_cursor"]
+
+    @staticmethod
+    def _force_solve_instructions(questions_asked: int) -> str:
+        if questions_asked >= 5:
+            return "YA HAS HECHO 5 PREGUNTAS. DEBES INTENTAR RESOLVER LA HISTORIA AHORA. USA 'RESOLVER:'."
+        return ""
 
-            prompt = DETECTIVE_PROMPT.format(
-                story_situation=story_situation,
-                conversation_history=conversation_history,
+    def _detective_prompt(self, questions_asked: int, score_feedback: str, extra_lines: Tuple[str, ...] = ()) -> str:
+        """
+        Construye el prompt del siguiente turno del detective.
+        `extra_lines` añade líneas de historial que aún no existen (ej. una respuesta supuesta
+        al generar la pregunta de forma especulativa).
+
+        En modo sesión el mensaje solo contiene lo ocurrido desde la última pregunta del detective
+        (respuesta del maestro, pistas o advertencias del moderador).
+        """
+        force_solve_instructions = self._force_solve_instructions(questions_asked)
+        if self.session_mode:
+            new_messages = [m for m in self.conversation.messages[self._session_cursor:] if m.role != "Detective"]
+            lines = [HistoryBuffer.render_line(m) for m in new_messages] + list(extra_lines)
+            return DETECTIVE_TURN_PROMPT.format(
+                new_information="\n".join(lines) or "Aún no hay preguntas.",
                 max_questions=self.max_questions,
                 questions_left=self.max_questions - questions_asked,
                 score_feedback=score_feedback,
                 force_solve_instructions=force_solve_instructions
             )
-            
-            self._notify(EventType.LOG, message="Detective pensando...")
-            start_time = time.time()
-            question = self.model2.generate_response(prompt)
-            response_time = time.time() - start_time
-            
-            questions_asked += 1
-            msg = Message("model2", self.model2.model_name, "Detective", question, response_time=response_time)
-            self.conversation.add_message(msg)
-            
-            self._notify(EventType.PREGUNTA_DETECTIVE, payload={
-                "message": msg,
-                "questions_asked": questions_asked,
-                "max_questions": self.max_questions
-            })
-            
-            # Question asked, wait for user to continue
-            self._wait_for_continue()
 
-            if "RESOLVER:" in question.upper():
-                break
-            
-            # --- Respuesta del Maestro ---
-            self._notify(EventType.LOG, message="Maestro evaluando...")
-            start_time = time.time()
-            answer_prompt = (
-                f"La pregunta del detective es: '{question}'.\n"
-                f"La historia completa y secreta es: '{self.conversation.full_solution}'.\n"
-                "Basa tu respuesta ÚNICAMENTE en la historia secreta. Responde con SÍ, NO o NO ES RELEVANTE. "
-                "Luego, en una nueva línea, añade una puntuación de 1 a 10 sobre qué tan cerca está el detective de la solución, "
-                "usando el formato PUNTUACIÓN: X/10."
-            )
-            answer_raw = self.model1.generate_response(answer_prompt)
-            response_time = time.time() - start_time
+        conversation_history = self._format_history()
+        if extra_lines:
+            conversation_history = "\n".join(self.conversation.history.lines + list(extra_lines))
+        return DETECTIVE_PROMPT.format(
+            story_situation=self.conversation.messages[0].content,
+            conversation_history=conversation_history,
+            max_questions=self.max_questions,
+            questions_left=self.max_questions - questions_asked,
+            score_feedback=score_feedback,
+            force_solve_instructions=force_solve_instructions
+        )
+
+    async def _speculate(self, hypothetical_answer: str, questions_asked: int, score_feedback: str) -> Tuple[Generation, Optional[ChatSession]]:
+        """
+        Genera la siguiente pregunta del detective suponiendo que el maestro responderá
+        `hypothetical_answer`. No notifica fragmentos: la rama puede descartarse.
+        La puntuación de la respuesta aún no se conoce, así que se usa el feedback del turno anterior.
+        """
+        session = self._detective_session.fork() if self._detective_session is not None else None
+        prompt = self._detective_prompt(questions_asked, score_feedback, extra_lines=(f"- Respuesta: {hypothetical_answer}",))
+        generation = await self._generate(self.model2, prompt, "Detective", DETECTIVE_SPECULATION, notify_chunks=False,
+                                          stop_at=find_detective_cutoff if self.early_stop else None,
+                                          session=session)
+        return generation, session
 
-            answer_display = answer_raw
+    def _start_speculation(self, questions_asked: int, score_feedback: str) -> Dict[str, asyncio.Task]:
+        return {
+            answer: asyncio.create_task(self._speculate(answer, questions_asked, score_feedback))
+            for answer in SPECULATIVE_ANSWERS
+        }
+
+    def _cancel_speculation(self, speculation: Dict[str, asyncio.Task]):
+        for task in speculation.values():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                # Rama descartada pero ya generada: sus tokens se gastaron igualmente
+                generation, _session = task.result()
+                self.conversation.add_usage(generation.usage.prompt_tokens, generation.usage.completion_tokens)
+            task.cancel()
+        speculation.clear()
+
+    async def _take_speculation(self, speculation: Dict[str, asyncio.Task], answer: Optional[str], expected_messages: int) -> Optional[Generation]:
+        """
+        Confirma la rama especulativa que coincide con la respuesta real y descarta las demás.
+        Devuelve None si ninguna sirve (respuesta con matices, o el moderador intervino entretanto).
+        """
+        stats = self.conversation.stats
+        task = None
+        if answer is not None and len(self.conversation.messages) == expected_messages:
+            task = speculation.pop(answer, None)
+        self._cancel_speculation(speculation)
+
+        if task is not None:
+            wait_start = time.time()
             try:
-                if "PUNTUACIÓN:" in answer_raw:
-                    parts = answer_raw.split("PUNTUACIÓN:")
-                    answer_display = parts[0].strip()
-                    score = parts[1].strip()
-                    score_feedback = f"La puntuación de tu última pregunta fue {score}. ¡Sigue investigando!"
+                generation, session = await task
+            except Exception as e:
+                logging.warning(f"Rama especulativa fallida: {e}")
+            else:
+                waited = time.time() - wait_start
+                saved = max(0.0, generation.response_time - waited)
+                stats["speculation_hits"] = stats.get("speculation_hits", 0) + 1
+                stats["speculation_saved_seconds"] = round(stats.get("speculation_saved_seconds", 0.0) + saved, 3)
+                self._update_speculation_rate()
+                if session is not None:
+                    self._detective_session = session
+                self._notify(EventType.LOG, message=f"⚡ Pregunta especulativa reutilizada ({saved:.1f}s ahorrados)")
+                return generation
+
+        stats["speculation_misses"] = stats.get("speculation_misses", 0) + 1
+        self._update_speculation_rate()
+        return None
+
+    def _update_speculation_rate(self):
+        stats = self.conversation.stats
+        hits = stats.get("speculation_hits", 0)
+        total = hits + stats.get("speculation_misses", 0)
+        stats["speculation_hit_rate"] = round(hits / total, 3) if total else 0.0
+
+    def _answer_cache_key(self, question: str) -> Optional[str]:
+        """
+        Clave de la respuesta del maestro a `question` en la caché, o None si no se usa caché.
+        La respuesta depende solo del modelo, la solución secreta y la pregunta (normalizada).
+        """
+        if self.answer_cache is None:
+            return None
+        model = f"{self.model1.__class__.__name__}:{self.model1.model_name}"
+        return answer_key(model, self.conversation.full_solution, extract_question(question))
+
+    def _cached_answer(self, cache_key: Optional[str], answer_prompt: str) -> Optional[Generation]:
+        """
+        Respuesta del maestro tomada de la caché (sin llamar al modelo), o None si no está.
+        En modo sesión el turno se añade igualmente al historial del maestro.
+        """
+        if cache_key is None:
+            return None
+        answer = self.answer_cache.get(cache_key)
+        stats = self.conversation.stats
+        counter = "answer_cache_hits" if answer is not None else "answer_cache_misses"
+        stats[counter] = stats.get(counter, 0) + 1
+        hits = stats.get("answer_cache_hits", 0)
+        stats["answer_cache_hit_rate"] = round(hits / (hits + stats.get("answer_cache_misses", 0)), 3)
+        if answer is None:
+            return None
+        if self._master_session is not None:
+            self._master_session.record(answer_prompt, answer)
+        self._notify(EventType.LOG, message="♻️ Respuesta del maestro reutilizada de la caché")
+        return Generation(answer, 0.0, usage=Usage(prompt_tokens=0, completion_tokens=0))
+
+    async def _interrogation_loop(self):
+        questions_asked = 0
+        score_feedback = INITIAL_FEEDBACK
+        if self._resume_point is not None:
+            questions_asked = self._resume_point["questions_asked"]
+            score_feedback = self._resume_point["score_feedback"]
+        # Modo pipeline: preguntas especulativas por respuesta supuesta del maestro
+        speculation: Dict[str, asyncio.Task] = {}
+        speculated_answer: Optional[str] = None
+        expected_messages = 0
+        nudged = False # Ya se pidió otra pregunta al detective en este turno
+
+        if self.session_mode:
+            self._open_sessions()
+
+        try:
+            while questions_asked < self.max_questions and not self._stop_event.is_set():
+                # Check interaction queue or manual pause here if needed
+                self._set_state(GameState.EN_PROGRESO)
+
+                if questions_asked >= 5:
+                    self._set_state(GameState.CERCA) # Indicativo visual opcional
+
+                if self._token_budget_exhausted():
+                    break
+
+                generation = None
+                if speculation:
+                    generation = await self._take_speculation(speculation, speculated_answer, expected_messages)
+
+                if generation is None:
+                    if not self.session_mode:
+                        await self._compact_history()
+                    prompt = self._detective_prompt(questions_asked, score_feedback)
+
+                    self._notify(EventType.LOG, message="Detective pensando...")
+                    generation = await self._generate(self.model2, prompt, "Detective", DETECTIVE_CALL,
+                                                      stop_at=find_detective_cutoff if self.early_stop else None,
+                                                      session=self._detective_session)
+                question = generation.text
+                duplicate = None
+                if self._questions is not None and "RESOLVER:" not in question.upper():
+                    duplicate = self._questions.find(question)
+                if duplicate is not None:
+                    stats = self.conversation.stats
+                    stats["duplicate_questions"] = stats.get("duplicate_questions", 0) + 1
+                    if self.duplicate_questions == "nudge" and not nudged:
+                        # La pregunta repetida se descarta sin gastar turno ni llamada al maestro
+                        nudged = True
+                        score_feedback = DUPLICATE_QUESTION_FEEDBACK.format(question=duplicate.text, answer=duplicate.answer)
+                        stats["duplicate_question_nudges"] = stats.get("duplicate_question_nudges", 0) + 1
+                        # Pregunta descartada pero ya generada: sus tokens se gastaron igualmente
+                        self.conversation.add_usage(generation.usage.prompt_tokens, generation.usage.completion_tokens)
+                        # En modo sesión el turno descartado sale de la conversación del detective:
+                        # el siguiente vuelve a enviarle lo nuevo (el cursor no avanza) junto con el aviso
+                        if self._detective_session is not None:
+                            self._detective_session.undo()
+                        self._notify(EventType.LOG, message="🔁 Pregunta repetida: se pide otra al detective")
+                        continue
+                nudged = False
+                tokens_saved = self._record_detective_length(generation)
+                if tokens_saved is not None:
+                    logging.info(f"Detective cortado tras una jugada completa (~{tokens_saved} tokens ahorrados)")
+
+                questions_asked += 1
+                msg = Message("model2", self.model2.model_name, "Detective", question, tokens_saved=tokens_saved,
+                              **generation.message_fields())
+                self.conversation.add_message(msg)
+                self._session_cursor = len(self.conversation.messages)
+
+                self._notify(EventType.PREGUNTA_DETECTIVE, payload={
+                    "message": msg,
+                    "questions_asked": questions_asked,
+                    "max_questions": self.max_questions
+                })
+
+                # Question asked, wait for user to continue
+                await self._wait_for_continue()
+
+                if "RESOLVER:" in question.upper():
+                    self._checkpoint(questions_asked, score_feedback, phase="resolution")
+                    break
+
+                # --- Respuesta del Maestro ---
+                self._notify(EventType.LOG, message="Maestro evaluando...")
+                if self.session_mode:
+                    answer_prompt = MASTER_ANSWER_TURN_PROMPT.format(question=question)
                 else:
-                    score_feedback = "No se recibió puntuación. Intenta ser más específico."
-            except Exception:
-                score_feedback = "Hubo un problema al procesar la puntuación."
+                    answer_prompt = (
+                        f"La pregunta del detective es: '{question}'.\n"
+                        f"La historia completa y secreta es: '{self.conversation.full_solution}'.\n"
+                        "Basa tu respuesta ÚNICAMENTE en la historia secreta. Responde con SÍ, NO o NO ES RELEVANTE. "
+                        "Luego, en una nueva línea, añade una puntuación de 1 a 10 sobre qué tan cerca está el detective de la solución, "
+                        "usando el formato PUNTUACIÓN: X/10."
+                    )
+                if duplicate is not None:
+                    self._notify(EventType.LOG, message="🔁 Pregunta repetida: se repite la respuesta anterior")
+                    if self._master_session is not None:
+                        self._master_session.record(answer_prompt, duplicate.answer)
+                    cache_key = None
+                    generation = Generation(duplicate.answer, 0.0, usage=Usage(prompt_tokens=0, completion_tokens=0))
+                else:
+                    cache_key = self._answer_cache_key(question)
+                    generation = self._cached_answer(cache_key, answer_prompt)
+                from_cache = generation is not None
+                if not from_cache:
+                    answer_call = self._generate(self.model1, answer_prompt, "Story Master", MASTER_ANSWER, session=self._master_session)
+                    if self.pipelined and questions_asked < self.max_questions:
+                        # Mientras el maestro responde, el detective prepara la siguiente pregunta
+                        # para cada respuesta probable; se confirma la que coincida
+                        speculation = self._start_speculation(questions_asked, score_feedback)
+                    generation = await answer_call
+                answer_raw = generation.text
 
-            msg = Message("model1", self.model1.model_name, "Story Master", answer_display, response_time=response_time)
-            self.conversation.add_message(msg)
+                answer_display = answer_raw
+                try:
+                    if "PUNTUACIÓN:" in answer_raw:
+                        parts = answer_raw.split("PUNTUACIÓN:")
+                        answer_display = parts[0].strip()
+                        score = parts[1].strip()
+                        score_feedback = f"La puntuación de tu última pregunta fue {score}. ¡Sigue investigando!"
+                    else:
+                        score_feedback = "No se recibió puntuación. Intenta ser más específico."
+                except Exception:
+                    score_feedback = "Hubo un problema al procesar la puntuación."
+                if duplicate is not None:
+                    score_feedback = DUPLICATE_QUESTION_FEEDBACK.format(question=duplicate.text, answer=duplicate.answer)
+                elif self._questions is not None:
+                    self._questions.add(question, answer_display)
 
-            self._notify(EventType.RESPUESTA_MAESTRO, payload={"message": msg})
-            
-            # Esperar confirmación para continuar (GUI mode)
-            self._wait_for_continue()
+                msg = Message("model1", self.model1.model_name, "Story Master", answer_display, **generation.message_fields())
+                self.conversation.add_message(msg)
+                speculated_answer = classify_answer(answer_display)
+                if cache_key is not None and not from_cache and speculated_answer is not None:
+                    # Solo respuestas limpias: una con matices depende del contexto de la partida
+                    self.answer_cache.put(cache_key, answer_raw)
+                expected_messages = len(self.conversation.messages)
+
+                self._notify(EventType.RESPUESTA_MAESTRO, payload={"message": msg})
+                self._checkpoint(questions_asked, score_feedback)
+
+                # Esperar confirmación para continuar (GUI mode)
+                await self._wait_for_continue()
+        finally:
+            self._cancel_speculation(speculation)
 
         self.conversation.questions_used = questions_asked
 
-    def _resolve_game(self):
+    async def _resolve_game(self):
         last_response = self.conversation.messages[-1].content
         final_story = ""
-        response_time = 0
+        message_fields = {"response_time": 0}
 
         self._notify(EventType.LOG, message="Resolviendo partida...")
 
-        if "RESOLVER:" not in last_response.upper():
+        if self.conversation.stats.get("token_budget_exhausted") and "RESOLVER:" not in last_response.upper():
+            logging.info("Game ended due to the token budget.")
+            final_story = f"Se ha agotado el presupuesto de tokens. La solución era:\n\n{self.conversation.full_solution}"
+            self.conversation.result = "Derrota"
+        elif "RESOLVER:" not in last_response.upper():
             logging.info("Game ended due to reaching max questions.")
             final_story = f"Has agotado tus preguntas. La solución era:\n\n{self.conversation.full_solution}"
             self.conversation.result = "Derrota"
@@ -356,7 +1026,6 @@ class GameOrchestrator:
             logging.info("Detective attempts to solve.")
             detective_solution = last_response.replace("RESOLVER:", "").strip()
             
-            start_time = time.time()
             evaluation_prompt = (
                 f"El detective ha propuesto la siguiente solución: '{detective_solution}'.\n"
                 f"La verdadera historia es: '{self.conversation.full_solution}'.\n"
@@ -364,8 +1033,9 @@ class GameOrchestrator:
                 "Responde únicamente con '🎉 ¡CORRECTO!' si es correcta, o '❌ INCORRECTO.' si es incorrecta. "
                 "Luego, en una nueva línea, revela la historia completa."
             )
-            final_story = self.model1.generate_response(evaluation_prompt)
-            response_time = time.time() - start_time
+            generation = await self._generate(self.model1, evaluation_prompt, "Story Master", EVALUATION)
+            final_story = generation.text
+            message_fields = generation.message_fields()
             
             if "🎉 ¡CORRECTO!" in final_story:
                 self.conversation.result = "Victoria"
@@ -374,7 +1044,7 @@ class GameOrchestrator:
 
         self._set_state(GameState.RESUELTO)
         
-        msg = Message("model1", self.model1.model_name, "Story Master", final_story, response_time=response_time)
+        msg = Message("model1", self.model1.model_name, "Story Master", final_story, **message_fields)
         self.conversation.add_message(msg)
         
         self._notify(EventType.FIN_JUEGO, payload={
@@ -384,5 +1054,33 @@ class GameOrchestrator:
         })
 
     def _save_conversation(self):
+        """
+        Apunta el resultado en el diario y genera a partir de él el fichero en el formato pedido
+        (o a partir de la conversación en memoria, si el diario no se pudo escribir).
+        """
         self._notify(EventType.LOG, message="Guardando partida...")
-        self.saver.save(self.conversation, self.save_format)
+        with self.metrics.span(SAVE):
+            self.journal.write_end(self.conversation)
+            self.saved_path = self.saver.render(self.journal.path, self.save_format) \
+                or self.saver.save(self.conversation, self.save_format)
+
+    def _save_partial(self):
+        """
+        Guarda la conversación de una partida interrumpida, si llegó a empezar.
+        """
+        if not self.conversation.messages:
+            return
+        try:
+            self._save_conversation()
+        except Exception as e:
+            logging.error(f"Error guardando la partida interrumpida: {e}")
+
+    def _report_metrics(self):
+        """
+        Publica el resumen de latencias por fase y modelo de la partida (p50/p95/p99).
+        """
+        rows = self.metrics.summary()
+        if not rows:
+            return
+        log_summary(self.metrics, "Latencias de la partida por fase")
+        self._notify(EventType.METRICAS, payload={"summary": rows})
@@ -1,10 +1,132 @@
+import os
+import atexit
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from ..providers.base import BaseProvider
 from ..providers.gemini import GeminiProvider
 from ..providers.ollama import OllamaProvider
+from ..providers.cassette import RecordingProvider, ReplayProvider
 
-def get_provider(provider_name: str, model_name: str):
+PROVIDERS = ('gemini', 'ollama')
+
+# Proveedores compuestos:
+#   replay:<cassette>             -> respuestas grabadas, sin red
+#   record:<proveedor>:<cassette> -> proveedor real cuyas respuestas se graban en el cassette
+REPLAY_PREFIX = 'replay:'
+RECORD_PREFIX = 'record:'
+
+
+def validate_provider_name(provider_name: str) -> str:
+    """
+    Comprueba que el nombre de proveedor sea soportado (incluidos replay:/record:).
+    Devuelve el nombre sin modificar o lanza ValueError.
+    """
+    if provider_name in PROVIDERS:
+        return provider_name
+    if provider_name.startswith(REPLAY_PREFIX) and provider_name[len(REPLAY_PREFIX):]:
+        return provider_name
+    if provider_name.startswith(RECORD_PREFIX):
+        inner, sep, path = provider_name[len(RECORD_PREFIX):].partition(':')
+        if sep and path and inner in PROVIDERS:
+            return provider_name
+    raise ValueError(f"Unsupported provider: {provider_name}")
+
+
+def get_provider(provider_name: str, model_name: str, pool_size: Optional[int] = None):
+    """
+    Crea una instancia nueva del proveedor. Para reutilizar conexiones entre partidas
+    usar get_shared_provider().
+    """
     if provider_name == 'gemini':
         return GeminiProvider(model_name)
     elif provider_name == 'ollama':
-        return OllamaProvider(model_name)
+        return OllamaProvider(model_name, pool_size=pool_size)
+    elif provider_name.startswith(REPLAY_PREFIX):
+        # BLACKSTORY_REPLAY_REALTIME=1 reproduce las latencias grabadas
+        realtime = os.getenv("BLACKSTORY_REPLAY_REALTIME", "").lower() in ("1", "true", "yes")
+        return ReplayProvider(provider_name[len(REPLAY_PREFIX):], model_name, realtime=realtime)
+    elif provider_name.startswith(RECORD_PREFIX):
+        validate_provider_name(provider_name)
+        inner, _, path = provider_name[len(RECORD_PREFIX):].partition(':')
+        return RecordingProvider(get_provider(inner, model_name, pool_size), path)
     else:
         raise ValueError(f"Unsupported provider: {provider_name}")
+
+def get_provider_host(provider_name: str) -> str:
+    """
+    Devuelve el identificador del host que atiende las peticiones de un proveedor.
+    Se usa para limitar la concurrencia por servidor (ej. un único Ollama local).
+    """
+    if provider_name == 'gemini':
+        return 'gemini'
+    elif provider_name == 'ollama':
+        return os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    elif provider_name.startswith(REPLAY_PREFIX):
+        # Cada cassette es independiente: no comparte servidor con nadie
+        return provider_name
+    elif provider_name.startswith(RECORD_PREFIX):
+        inner, _, _ = provider_name[len(RECORD_PREFIX):].partition(':')
+        return get_provider_host(inner)
+    else:
+        raise ValueError(f"Unsupported provider: {provider_name}")
+
+
+class ProviderRegistry:
+    """
+    Caché de proveedores por (proveedor, modelo, host).
+
+    Las partidas de una misma sesión (GUI, lote de partidas, worker de un torneo)
+    comparten la instancia y con ella sus clientes HTTP con conexiones keep-alive,
+    en lugar de repetir la conexión y el handshake TLS en cada partida.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None):
+        """
+        Args:
+            pool_size (Optional[int]): Conexiones máximas por cliente HTTP (Ollama).
+                Por defecto OLLAMA_POOL_SIZE o 10.
+        """
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._providers: Dict[Tuple[str, str, str], BaseProvider] = {}
+
+    def get(self, provider_name: str, model_name: str) -> BaseProvider:
+        """
+        Devuelve el proveedor compartido, creándolo la primera vez.
+        """
+        key = (provider_name, model_name, get_provider_host(provider_name))
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = get_provider(provider_name, model_name, self.pool_size)
+                self._providers[key] = provider
+            return provider
+
+    def close(self):
+        """
+        Cierra todos los proveedores y vacía la caché.
+        """
+        with self._lock:
+            providers, self._providers = list(self._providers.values()), {}
+        for provider in providers:
+            try:
+                provider.close()
+            except Exception as e:
+                logging.warning(f"Error closing provider {provider.model_name}: {e}")
+
+
+_registry = ProviderRegistry()
+atexit.register(_registry.close)
+
+
+def get_registry() -> ProviderRegistry:
+    """Devuelve el registro de proveedores del proceso (se cierra al salir)."""
+    return _registry
+
+
+def get_shared_provider(provider_name: str, model_name: str) -> BaseProvider:
+    """
+    Como get_provider(), pero reutiliza la instancia (y sus conexiones) dentro del proceso.
+    """
+    return _registry.get(provider_name, model_name)
@@ -0,0 +1,109 @@
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Tuple
+from .rules import extract_question, normalize_question
+
+# Modos de tratamiento de una pregunta repetida del detective
+DUPLICATE_MODES = ("reuse", "nudge", "off")
+
+# Palabras que no cambian el sentido de una pregunta de sí/no ("no" sí lo cambia)
+_STOPWORDS = frozenset({
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "lo", "al", "del", "de", "a", "en",
+    "y", "e", "o", "u", "que", "se", "su", "sus", "es", "fue", "era", "acaso", "alguna", "algun",
+})
+# Palabras que invierten el sentido de una pregunta (sin tildes, como las deja normalize_question)
+_NEGATIONS = frozenset({
+    "no", "ni", "nunca", "jamas", "nadie", "nada", "ningun", "ninguna", "ninguno", "ningunos", "ningunas",
+    "tampoco", "sin",
+})
+SHINGLE_SIZE = 3
+# Dos palabras distintas solo cuentan como la misma si son variantes (hombre / hombres):
+# comparten al menos este prefijo y difieren como mucho en VARIANT_SUFFIX letras finales
+VARIANT_PREFIX = 4
+VARIANT_SUFFIX = 2
+DEFAULT_THRESHOLD = 0.7
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _is_variant(a: str, b: str) -> bool:
+    prefix = len(os.path.commonprefix((a, b)))
+    return prefix >= VARIANT_PREFIX and max(len(a), len(b)) - prefix <= VARIANT_SUFFIX
+
+
+def _same_words(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """
+    Las palabras en que difieren dos preguntas tienen contenido ("antes" / "después",
+    "completo" / "incompleto") salvo que cada una sea una variante de otra de la otra pregunta.
+    """
+    only_a, only_b = a - b, b - a
+    return (all(any(_is_variant(w, v) for v in only_b) for w in only_a)
+            and all(any(_is_variant(w, v) for v in only_a) for w in only_b))
+
+
+@dataclass
+class AskedQuestion:
+    """
+    Una pregunta ya respondida en la partida, con su forma normalizada para compararla.
+    """
+    text: str
+    answer: str
+    tokens: FrozenSet[str]
+    shingles: FrozenSet[str]
+
+
+def question_features(question: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    Conjunto de palabras significativas y de 3-gramas de caracteres de una pregunta.
+    Las palabras detectan reordenaciones ("¿Estaba solo el hombre?" / "¿El hombre estaba solo?");
+    los 3-gramas, variaciones de una misma palabra ("murió" / "muere").
+    """
+    words = normalize_question(extract_question(question)).split()
+    tokens = frozenset(w for w in words if w not in _STOPWORDS) or frozenset(words)
+    shingles = frozenset(padded[i:i + SHINGLE_SIZE]
+                         for padded in (f" {w} " for w in tokens)
+                         for i in range(len(padded) - SHINGLE_SIZE + 1))
+    return tokens, shingles
+
+
+class QuestionIndex:
+    """
+    Índice de las preguntas respondidas en una partida para detectar repeticiones.
+
+    Dos preguntas se consideran la misma solo si las palabras en que difieren no cambian
+    el sentido (reordenaciones, artículos, variantes como "hombre" / "hombres") y la
+    similitud de sus 3-gramas alcanza `threshold`. Basta una palabra con contenido distinta
+    para que no coincidan, por parecidas que sean: "¿...años antes del crimen?" y
+    "¿...años después del crimen?" tienen respuestas distintas. Tampoco coinciden las que
+    tienen distintas negaciones ("no", "nunca", "nadie", "ningún", "ni", "tampoco"...).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.questions: List[AskedQuestion] = []
+
+    def find(self, question: str) -> Optional[AskedQuestion]:
+        """
+        Devuelve la pregunta anterior más parecida a `question` si es una repetición, o None.
+        """
+        tokens, shingles = question_features(question)
+        best, best_score = None, 0.0
+        negations = tokens & _NEGATIONS
+        for asked in self.questions:
+            if negations != asked.tokens & _NEGATIONS or not _same_words(tokens, asked.tokens):
+                continue
+            score = _jaccard(shingles, asked.shingles)
+            if score > best_score:
+                best, best_score = asked, score
+        return best if best_score >= self.threshold else None
+
+    def add(self, question: str, answer: str):
+        """
+        Registra una pregunta respondida.
+        """
+        tokens, shingles = question_features(question)
+        self.questions.append(AskedQuestion(extract_question(question), answer, tokens, shingles))
@@ -0,0 +1,177 @@
+import re
+import logging
+import unicodedata
+from typing import Optional, Tuple
+
+# Una línea que termina en '?' (admitiendo comillas o marcas de Markdown de cierre)
+_QUESTION_LINE = re.compile(r'\?["”»*_\s]*\n')
+# Encabezados de la plantilla de razonamiento del prompt ("**Análisis**: ¿Qué sé...?"):
+# un modelo que la repite escribe preguntas retóricas que no son su jugada
+_TEMPLATE_LINE = re.compile(
+    r'^[\s>*_\-\d.)]*(an[aá]lisis|hip[oó]tesis|pregunta cr[ií]tica|acci[oó]n|estrategia|ejemplo)\b[^:?]*:',
+    re.IGNORECASE
+)
+
+
+def is_template_line(line: str) -> bool:
+    """
+    Indica si una línea es parte de la plantilla de razonamiento (negritas de Markdown
+    o un encabezado como "Análisis:" o "Hipótesis:") y no la pregunta del detective.
+    """
+    return "**" in line or bool(_TEMPLATE_LINE.match(line))
+
+
+def find_detective_cutoff(text: str) -> Optional[int]:
+    """
+    Decide si la salida del detective ya contiene una jugada completa.
+
+    Devuelve la posición en la que se puede cortar la generación, o None si aún no
+    hay ni una pregunta completa ni un bloque 'RESOLVER:' terminado:
+    - RESOLVER: el bloque se da por cerrado en el primer párrafo en blanco tras la explicación.
+    - Pregunta: la primera línea terminada en '?' (se espera al salto de línea para no
+      cortar una pregunta que el modelo aún está escribiendo), sin contar las de la
+      plantilla de razonamiento (ver is_template_line).
+    """
+    resolve_idx = text.upper().find("RESOLVER:")
+    if resolve_idx != -1:
+        body_start = resolve_idx + len("RESOLVER:")
+        body = text[body_start:]
+        stripped = body.lstrip()
+        if not stripped:
+            return None
+        paragraph_end = stripped.find("\n\n")
+        if paragraph_end == -1:
+            return None
+        return body_start + (len(body) - len(stripped)) + paragraph_end
+
+    for match in _QUESTION_LINE.finditer(text):
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        if not is_template_line(text[line_start:match.end()]):
+            return match.end() - 1
+    return None
+
+
+def extract_question(text: str) -> str:
+    """
+    Devuelve la pregunta de una jugada del detective: la última línea que termina en '?'
+    (el modelo suele escribir antes su análisis), prefiriendo las que no son de la
+    plantilla de razonamiento, o el texto entero si no hay ninguna.
+    """
+    lines = [line for line in text.strip().splitlines() if line.strip(' "”»*_').endswith("?")]
+    questions = [line for line in lines if not is_template_line(line)] or lines
+    return questions[-1].strip(' "”»*_') if questions else text.strip()
+
+
+def normalize_question(text: str) -> str:
+    """
+    Forma canónica de una pregunta para compararla con otras: sin mayúsculas, tildes,
+    signos de puntuación ni espacios repetidos ("¿Murió de forma VIOLENTA?" -> "murio de forma violenta").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", without_accents).split())
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación aproximada de tokens (~4 caracteres por token) cuando el proveedor no los informa.
+    """
+    return (len(text) + 3) // 4
+
+
+# Texto usado como solución cuando el Story Master no respetó el formato
+MISSING_SOLUTION = "No se pudo extraer la solución completa. Por favor, revisa el formato de respuesta del modelo."
+
+
+def parse_story(raw_response: str) -> Tuple[str, str]:
+    """
+    Extrae (situación, solución) de la respuesta del Story Master a STORY_MASTER_PROMPT.
+    Tolera variaciones con y sin tildes; si no encuentra el formato, usa toda la respuesta
+    como situación y MISSING_SOLUTION como solución.
+    """
+    # Debug logging
+    logging.info(f"Raw story response length: {len(raw_response)}")
+    logging.debug(f"Raw story response: {raw_response[:500]}...")  # First 500 chars
+
+    story_situation = ""
+    full_solution = ""
+
+    # Intentar extraer con diferentes variaciones
+    response_upper = raw_response.upper()
+
+    if "SITUACIÓN:" in response_upper and "SOLUCIÓN:" in response_upper:
+        # Encontrar las posiciones case-insensitive
+        sit_idx = response_upper.find("SITUACIÓN:")
+        sol_idx = response_upper.find("SOLUCIÓN:")
+
+        # Extraer usando las posiciones encontradas
+        story_situation = raw_response[sit_idx+10:sol_idx].strip()
+        full_solution = raw_response[sol_idx+9:].strip()
+        logging.info("Extracted using SITUACIÓN/SOLUCIÓN format")
+    elif "SITUACION:" in response_upper and "SOLUCION:" in response_upper:
+        # Sin tilde
+        sit_idx = response_upper.find("SITUACION:")
+        sol_idx = response_upper.find("SOLUCION:")
+
+        story_situation = raw_response[sit_idx+10:sol_idx].strip()
+        full_solution = raw_response[sol_idx+9:].strip()
+        logging.info("Extracted using SITUACION/SOLUCION format (no accents)")
+    else:
+        # Fallback: intentar dividir por líneas y buscar patrones
+        lines = raw_response.split('\n')
+        in_solution = False
+        situation_lines = []
+        solution_lines = []
+
+        for line in lines:
+            line_upper = line.upper()
+            if "SITUACIÓN:" in line_upper or "SITUACION:" in line_upper:
+                # Extraer lo que viene después de SITUACIÓN:
+                if ":" in line:
+                    situation_lines.append(line.split(":", 1)[1].strip())
+                in_solution = False
+            elif "SOLUCIÓN:" in line_upper or "SOLUCION:" in line_upper:
+                # Extraer lo que viene después de SOLUCIÓN:
+                if ":" in line:
+                    solution_lines.append(line.split(":", 1)[1].strip())
+                in_solution = True
+            elif in_solution and line.strip():
+                solution_lines.append(line.strip())
+            elif not in_solution and line.strip() and not situation_lines:
+                situation_lines.append(line.strip())
+
+        if situation_lines:
+            story_situation = " ".join(situation_lines)
+        if solution_lines:
+            full_solution = " ".join(solution_lines)
+
+        logging.info(f"Used fallback extraction. Found {len(situation_lines)} situation lines, {len(solution_lines)} solution lines")
+
+        # Si aún no tenemos nada, usar toda la respuesta como situación
+        if not story_situation:
+            logging.warning("Story Master did not follow format. Using full response as situation.")
+            story_situation = raw_response.strip()
+            full_solution = MISSING_SOLUTION
+
+    return story_situation, full_solution
+
+
+# Respuestas canónicas del maestro para las que se prepara una pregunta especulativa
+SPECULATIVE_ANSWERS = ("SÍ", "NO", "NO ES RELEVANTE")
+
+_ANSWER_ALIASES = {
+    "SÍ": "SÍ",
+    "SI": "SÍ",
+    "NO": "NO",
+    "NO ES RELEVANTE": "NO ES RELEVANTE",
+}
+
+
+def classify_answer(answer: str) -> Optional[str]:
+    """
+    Devuelve la respuesta canónica ('SÍ', 'NO', 'NO ES RELEVANTE') si la respuesta del
+    maestro es exactamente una de ellas (ignorando mayúsculas y puntuación), o None si
+    trae matices que una pregunta preparada de antemano no habría tenido en cuenta.
+    """
+    normalized = " ".join(re.sub(r"[^\wÁÉÍÓÚÜÑáéíóúüñ ]", " ", answer).upper().split())
+    return _ANSWER_ALIASES.get(normalized)
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+# Bucle de eventos compartido por todo el proceso. Los clientes asíncronos de los
+# proveedores (httpx, grpc) quedan ligados al bucle en el que se crean, así que todas
+# las partidas de un proceso se ejecutan sobre el mismo bucle en lugar de crear uno nuevo
+# con asyncio.run() por partida.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Devuelve el bucle de eventos compartido, arrancando su hilo la primera vez.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="blackstory-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def submit(coro: Coroutine) -> Future:
+    """
+    Programa una corrutina en el bucle compartido sin bloquear al llamante.
+    Devuelve un concurrent.futures.Future utilizable desde cualquier hilo.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro: Coroutine) -> Any:
+    """
+    Ejecuta una corrutina en el bucle compartido y espera su resultado (API síncrona).
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("runtime.run() cannot be called from the shared event loop; use 'await' instead")
+
+    future = submit(coro)
+    try:
+        return future.result()
+    except KeyboardInterrupt:
+        # Ctrl-C llega al hilo que espera: cancelar también la tarea en el bucle
+        future.cancel()
+        raise
@@ -0,0 +1,253 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from ..providers.base import BaseProvider
+from ..providers.errors import ProviderError
+from .prompts import STORY_MASTER_PROMPT
+from .rules import parse_story, MISSING_SOLUTION
+from ..metrics.registry import get_registry, STORY_GENERATION, STORY_PARSING
+
+# Nombre del fichero de la reserva dentro de la carpeta de conversaciones
+STORY_POOL_FILE = "story_pool.json"
+
+
+@dataclass
+class Story:
+    """
+    Una historia ya generada y parseada, lista para empezar una partida.
+    """
+    situation: str
+    solution: str
+    created: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+
+    def fingerprint(self) -> str:
+        """Huella de la solución para descartar historias repetidas."""
+        normalized = " ".join("".join(c for c in self.solution.lower() if c.isalnum() or c.isspace()).split())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def pool_key(provider: BaseProvider, max_questions: int) -> str:
+    """
+    Clave de la reserva: las historias dependen del modelo del Story Master y de los
+    parámetros del prompt (el límite de preguntas aparece en STORY_MASTER_PROMPT).
+    """
+    return f"{provider.__class__.__name__}:{provider.model_name}:q{max_questions}"
+
+
+class StoryPool:
+    """
+    Reserva persistente de historias pre-generadas para un Story Master.
+
+    Las partidas toman una historia al instante con pop(); un hilo en segundo plano
+    vuelve a llenar la reserva hasta `high_watermark` cuando baja de `low_watermark`.
+    Con `reuse=True` las historias no se consumen sino que se recorren en orden, lo que
+    permite jugar el mismo conjunto fijo de historias con distintos detectives.
+    """
+
+    def __init__(self, provider: BaseProvider, max_questions: int, path: str,
+                 low_watermark: int = 2, high_watermark: int = 5,
+                 reuse: bool = False, dedupe: bool = True):
+        if low_watermark < 0 or high_watermark < max(1, low_watermark):
+            raise ValueError("Watermarks must satisfy 0 <= low_watermark <= high_watermark and high_watermark >= 1")
+
+        self.provider = provider
+        self.max_questions = max_questions
+        self.path = path
+        self.key = pool_key(provider, max_questions)
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.reuse = reuse
+        self.dedupe = dedupe
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stories: List[Story] = []
+        self._cursor = 0  # Siguiente historia en modo reuse
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._load()
+
+    # --- Persistencia ---
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._stories = [Story(**item) for item in data.get("pools", {}).get(self.key, [])]
+            logging.info(f"Story pool '{self.key}' loaded with {len(self._stories)} stories")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logging.error(f"Error loading story pool {self.path}: {e}")
+
+    def _save(self):
+        """Escribe la reserva de forma atómica, conservando las de otras claves."""
+        try:
+            data = {"version": 1, "pools": {}}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            data.setdefault("pools", {})[self.key] = [asdict(s) for s in self._stories]
+
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error saving story pool {self.path}: {e}")
+
+    # --- API ---
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._stories)
+
+    def add(self, story: Story) -> bool:
+        """
+        Añade una historia a la reserva. Devuelve False si se descarta por repetida.
+        """
+        with self._lock:
+            if self.dedupe:
+                fingerprint = story.fingerprint()
+                if any(s.fingerprint() == fingerprint for s in self._stories):
+                    logging.info(f"Duplicate story discarded from pool '{self.key}'")
+                    return False
+            self._stories.append(story)
+            self._save()
+            return True
+
+    def pop(self) -> Optional[Story]:
+        """
+        Devuelve una historia al instante, o None si la reserva está vacía.
+        """
+        with self._lock:
+            if not self._stories:
+                story = None
+            elif self.reuse:
+                story = self._stories[self._cursor % len(self._stories)]
+                self._cursor += 1
+            else:
+                story = self._stories.pop(0)
+                self._save()
+            self._wakeup.notify_all()
+        return story
+
+    def get(self, index: int) -> Story:
+        """
+        Devuelve la historia en una posición fija (para conjuntos de historias reproducibles).
+        """
+        with self._lock:
+            return self._stories[index]
+
+    def generate_story(self) -> Optional[Story]:
+        """
+        Pide una historia nueva al Story Master. Devuelve None si no sigue el formato.
+        """
+        registry = get_registry()
+        with registry.span(STORY_GENERATION, self.provider.model_name):
+            raw = self.provider.generate_response(STORY_MASTER_PROMPT.format(max_questions=self.max_questions))
+        with registry.span(STORY_PARSING, self.provider.model_name):
+            situation, solution = parse_story(raw)
+        if not solution or solution == MISSING_SOLUTION:
+            logging.warning(f"Discarding malformed story from {self.provider.model_name}")
+            return None
+        return Story(situation, solution)
+
+    def fill(self, count: int, max_attempts: Optional[int] = None) -> int:
+        """
+        Genera historias de forma síncrona hasta tener al menos `count`.
+        Devuelve el número de historias disponibles al terminar.
+        """
+        attempts = 0
+        max_attempts = max_attempts if max_attempts is not None else count * 3
+        while len(self) < count and attempts < max_attempts and not self._closed:
+            attempts += 1
+            try:
+                story = self.generate_story()
+            except ProviderError as e:
+                logging.error(f"Error generating story for pool '{self.key}': {e}")
+                continue
+            if story is not None:
+                self.add(story)
+        return len(self)
+
+    # --- Rellenado en segundo plano ---
+
+    def start(self):
+        """
+        Arranca el hilo que mantiene la reserva por encima de la marca baja.
+        """
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._refill_loop, name=f"story-pool-{self.key}", daemon=True)
+        self._worker.start()
+
+    def close(self):
+        """
+        Detiene el hilo de rellenado (la historia en curso, si la hay, termina antes).
+        """
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+
+    def _needs_refill(self) -> bool:
+        # En modo reuse las historias no se consumen: basta con llegar a la marca alta una vez
+        if self.reuse:
+            return len(self._stories) < self.high_watermark
+        return len(self._stories) < self.low_watermark
+
+    def _refill_loop(self):
+        failures = 0
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._closed or self._needs_refill())
+                if self._closed:
+                    return
+                missing = self.high_watermark - len(self._stories)
+
+            logging.info(f"Refilling story pool '{self.key}' with {missing} stories")
+            for _ in range(missing):
+                if self._closed:
+                    return
+                try:
+                    story = self.generate_story()
+                except Exception as e:
+                    logging.error(f"Error generating story for pool '{self.key}': {e}")
+                    story = None
+                if story is None or not self.add(story):
+                    failures += 1
+                else:
+                    failures = 0
+
+            if failures >= 3:
+                # El modelo no está produciendo historias válidas: esperar a la siguiente petición
+                with self._lock:
+                    self._wakeup.wait(timeout=60)
+                failures = 0
+
+
+_pools: Dict[Tuple[str, str], StoryPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_story_pool(provider: BaseProvider, max_questions: int, path: str, **options) -> StoryPool:
+    """
+    Devuelve la reserva compartida para (fichero, Story Master), arrancando su hilo de rellenado.
+    Reutilizarla entre partidas (ej. en la GUI) evita recargar el fichero y duplicar hilos.
+    """
+    key = (os.path.abspath(path), pool_key(provider, max_questions))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = StoryPool(provider, max_questions, path, **options)
+            _pools[key] = pool
+    pool.start()
+    return pool
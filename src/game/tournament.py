@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import logging
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from .enums import GameState
+from .story_pool import Story, StoryPool
+from ..providers.routing import parse_hosts
+
+
+@dataclass(frozen=True)
+class Participant:
+    """
+    Un modelo concreto dentro del torneo (proveedor + nombre del modelo).
+    """
+    provider: str
+    model: str
+
+    @classmethod
+    def parse(cls, spec: str) -> "Participant":
+        """
+        Construye un participante a partir de 'proveedor:modelo'.
+        Solo se separa por el primer ':' porque los tags de Ollama lo usan (ej. 'ollama:gemma3:12b').
+        """
+        provider, sep, model = spec.partition(":")
+        if not sep or not provider or not model:
+            raise ValueError(f"Invalid participant '{spec}'. Expected format 'provider:model'")
+        return cls(provider.strip(), model.strip())
+
+    def __str__(self):
+        return f"{self.provider}:{self.model}"
+
+
+@dataclass(frozen=True)
+class Match:
+    """
+    Una partida pendiente: Story Master contra Detective.
+    """
+    master: Participant
+    detective: Participant
+    game_index: int
+    story: Optional[Story] = field(default=None, compare=False) # Historia fija (conjunto de historias del torneo)
+
+
+@dataclass
+class MatchResult:
+    """
+    Resultado resumido de una partida del torneo.
+    """
+    match: Match
+    result: Optional[str]
+    state: str
+    questions_used: int
+    max_questions: int
+    duration: float
+    saved_to: Optional[str] = None
+    error: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    answer_cache_hits: int = 0
+    answer_cache_misses: int = 0
+
+    def to_record(self) -> Dict:
+        return {
+            "master": str(self.match.master),
+            "detective": str(self.match.detective),
+            "game_index": self.match.game_index,
+            "result": self.result,
+            "state": self.state,
+            "questions_used": self.questions_used,
+            "max_questions": self.max_questions,
+            "duration": round(self.duration, 3),
+            "saved_to": self.saved_to,
+            "error": self.error,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "answer_cache_hits": self.answer_cache_hits,
+            "answer_cache_misses": self.answer_cache_misses,
+        }
+
+
+def _play_match(match: Match, max_questions: int, output_dir: str, save_format: str, game_options: Dict) -> MatchResult:
+    """
+    Juega una partida completa dentro de un proceso del pool.
+    Debe ser una función de módulo para poder serializarse (pickle) hacia los workers.
+    """
+    # Importaciones locales: cada worker crea sus propios clientes HTTP y los reutiliza
+    # en todas las partidas que juega
+    from .providers_factory import get_shared_provider
+    from .orchestrator import GameOrchestrator
+    from ..storage.answer_cache import get_answer_cache
+    from ..storage.database import get_store
+
+    start = time.time()
+    try:
+        # La caché de respuestas no se puede enviar al worker: cada proceso abre la suya
+        # (compartida entre sus partidas y, con base de datos, con los demás workers)
+        options = dict(game_options)
+        use_cache = options.pop("answer_cache", False)
+        cache_db = options.pop("answer_cache_db", None)
+        if use_cache or cache_db:
+            options["answer_cache"] = get_answer_cache(cache_db)
+        # Igual con la base de datos de partidas: WAL permite que todos los workers escriban en ella
+        db_path = options.pop("db_path", None)
+        if db_path:
+            options["store"] = get_store(db_path)
+        game = GameOrchestrator(
+            model1=get_shared_provider(match.master.provider, match.master.model),
+            model2=get_shared_provider(match.detective.provider, match.detective.model),
+            max_questions=max_questions,
+            no_pause=True,
+            output_dir=output_dir,
+            save_format=save_format,
+            story=match.story,
+            **options
+        )
+        game.play()
+        conversation = game.conversation
+        return MatchResult(
+            match=match,
+            result=conversation.result,
+            state=game.state.name,
+            questions_used=conversation.questions_used,
+            max_questions=max_questions,
+            duration=time.time() - start,
+            saved_to=game.saved_path,
+            prompt_tokens=conversation.prompt_tokens,
+            completion_tokens=conversation.completion_tokens,
+            answer_cache_hits=conversation.stats.get("answer_cache_hits", 0),
+            answer_cache_misses=conversation.stats.get("answer_cache_misses", 0),
+            error=game.error
+        )
+    except Exception as e:
+        logging.error(f"Error jugando {match}: {e}", exc_info=True)
+        return MatchResult(
+            match=match,
+            result=None,
+            state=GameState.ERROR.name,
+            questions_used=0,
+            max_questions=max_questions,
+            duration=time.time() - start,
+            error=str(e)
+        )
+
+
+class TournamentRunner:
+    """
+    Ejecuta una matriz de partidas (Story Master, Detective) en paralelo sobre un pool de procesos.
+
+    La concurrencia global la fija el número de workers; además, cada host de proveedor
+    (un servidor Ollama, la API de Gemini) admite como máximo `host_limit` partidas simultáneas,
+    para no encolar decenas de peticiones contra una sola GPU. Un grupo de varios servidores
+    Ollama admite `host_limit` por cada servidor.
+    """
+
+    def __init__(self,
+                 pairs: List[Tuple[Participant, Participant]],
+                 games_per_pair: int,
+                 max_questions: int,
+                 output_dir: str,
+                 save_format: str,
+                 workers: Optional[int] = None,
+                 host_limit: int = 2,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 host_resolver: Optional[Callable[[str], str]] = None,
+                 game_options: Optional[Dict] = None,
+                 story_sets: Optional[Dict[Participant, List[Story]]] = None,
+                 on_result: Optional[Callable[[MatchResult], None]] = None):
+        if games_per_pair < 1:
+            raise ValueError("games_per_pair must be at least 1")
+        if host_limit < 1 or any(limit < 1 for limit in (host_limits or {}).values()):
+            raise ValueError("host limits must be at least 1")
+
+        self.pairs = pairs
+        self.games_per_pair = games_per_pair
+        self.max_questions = max_questions
+        self.output_dir = output_dir
+        self.save_format = save_format
+        self.workers = workers or os.cpu_count() or 1
+        self.host_limit = host_limit
+        self.host_limits = host_limits or {}
+        self.game_options = game_options or {} # Argumentos extra para cada GameOrchestrator
+        self.story_sets = story_sets or {} # Historias fijas por Story Master: la partida i usa la historia i
+        self.on_result = on_result
+
+        if host_resolver is None:
+            from .providers_factory import get_provider_host
+            host_resolver = get_provider_host
+        self._host_resolver = host_resolver
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.results_path = os.path.join(self.output_dir, f"tournament_{timestamp}.jsonl")
+
+    def matches(self) -> List[Match]:
+        """
+        Expande la matriz en partidas individuales, intercalando las parejas
+        para que todas avancen a la vez en lugar de una detrás de otra.
+        """
+        return [
+            Match(master, detective, game_index, self._story_for(master, game_index))
+            for game_index in range(self.games_per_pair)
+            for master, detective in self.pairs
+        ]
+
+    def _story_for(self, master: Participant, game_index: int) -> Optional[Story]:
+        stories = self.story_sets.get(master)
+        if not stories:
+            return None
+        return stories[game_index % len(stories)]
+
+    def _hosts_for(self, match: Match) -> set:
+        # Un mismo host cuenta una vez: dentro de una partida las llamadas son secuenciales
+        return {self._host_resolver(match.master.provider), self._host_resolver(match.detective.provider)}
+
+    def _limit_for(self, host: str) -> int:
+        # Un grupo de servidores Ollama (OLLAMA_BASE_URL con varias URLs) admite host_limit por servidor
+        return self.host_limits.get(host, self.host_limit * len(parse_hosts(host) or [host]))
+
+    def run(self) -> List[MatchResult]:
+        """
+        Lanza todas las partidas y devuelve sus resultados en orden de finalización.
+        Cada resultado se añade al fichero JSONL del torneo en cuanto termina.
+        """
+        pending = deque(self.matches())
+        host_load: Counter = Counter()
+        in_flight: Dict[Future, Match] = {}
+        results: List[MatchResult] = []
+
+        logging.info(f"Starting tournament: {len(pending)} games, {self.workers} workers, results in {self.results_path}")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor, \
+                open(self.results_path, 'a', encoding='utf-8') as results_file:
+            while pending or in_flight:
+                # Lanzar todas las partidas cuyos hosts tengan hueco libre
+                for _ in range(len(pending)):
+                    if len(in_flight) >= self.workers:
+                        break
+                    match = pending.popleft()
+                    hosts = self._hosts_for(match)
+                    if any(host_load[h] >= self._limit_for(h) for h in hosts):
+                        pending.append(match)
+                        continue
+                    host_load.update(hosts)
+                    future = executor.submit(_play_match, match, self.max_questions, self.output_dir,
+                                             self.save_format, self.game_options)
+                    in_flight[future] = match
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    match = in_flight.pop(future)
+                    host_load.subtract(self._hosts_for(match))
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # El worker murió (ej. proceso abortado); la partida se da por perdida
+                        logging.error(f"Worker failed for {match}: {e}")
+                        result = MatchResult(match, None, GameState.ERROR.name, 0, self.max_questions, 0.0, error=str(e))
+
+                    results.append(result)
+                    results_file.write(json.dumps(result.to_record(), ensure_ascii=False) + "\n")
+                    results_file.flush()
+                    if self.on_result:
+                        self.on_result(result)
+
+        return results
+
+
+def build_story_sets(masters: List[Participant], count: int, max_questions: int, pool_path: str) -> Dict[Participant, List[Story]]:
+    """
+    Prepara un conjunto fijo de `count` historias por Story Master, reutilizando las ya
+    guardadas en la reserva y generando solo las que falten. Así todos los detectives
+    se enfrentan exactamente a las mismas historias.
+    """
+    from .providers_factory import get_shared_provider
+
+    story_sets = {}
+    for master in masters:
+        pool = StoryPool(get_shared_provider(master.provider, master.model), max_questions, pool_path, reuse=True, dedupe=True)
+        available = pool.fill(count)
+        if available == 0:
+            raise ValueError(f"Could not generate any story with {master}")
+        if available < count:
+            logging.warning(f"Only {available}/{count} stories available for {master}; they will be repeated")
+        story_sets[master] = [pool.get(i) for i in range(min(available, count))]
+    return story_sets
+
+
+def summarize(results: List[MatchResult]) -> List[Dict]:
+    """
+    Agrega los resultados por pareja (Story Master, Detective).
+    """
+    table: Dict[Tuple[str, str], Dict] = {}
+    for r in results:
+        key = (str(r.match.master), str(r.match.detective))
+        row = table.setdefault(key, {"master": key[0], "detective": key[1], "games": 0, "wins": 0, "errors": 0, "questions": 0,
+                                     "duration": 0.0, "tokens": 0, "cache_hits": 0, "cache_lookups": 0})
+        row["games"] += 1
+        row["wins"] += 1 if r.result == "Victoria" else 0
+        row["errors"] += 1 if r.error or r.state == GameState.ERROR.name else 0
+        row["questions"] += r.questions_used
+        row["duration"] += r.duration
+        row["tokens"] += r.prompt_tokens + r.completion_tokens
+        row["cache_hits"] += r.answer_cache_hits
+        row["cache_lookups"] += r.answer_cache_hits + r.answer_cache_misses
+    return list(table.values())
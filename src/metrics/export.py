@@ -0,0 +1,111 @@
+import os
+import logging
+import threading
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from .registry import MetricsRegistry, get_registry
+
+PREFIX = "blackstory_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HELP = {
+    "phase_duration_seconds": "Duration of each game phase (model calls, parsing, notification, saving).",
+    "time_to_first_token_seconds": "Time until the first streamed chunk of a model call.",
+    "prompt_tokens": "Prompt tokens per model call.",
+    "completion_tokens": "Completion tokens per model call.",
+    "completion_tokens_per_second": "Generation throughput per model call, as reported by the backend.",
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    merged = {**labels, **(extra or {})}
+    if not merged:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in merged.items()) + "}"
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """
+    Renders the registry in the Prometheus text exposition format.
+    Each histogram is exposed as a summary: p50/p95/p99 quantiles plus _sum and _count.
+    """
+    registry = registry or get_registry()
+    lines = []
+    declared = set()
+    for name, labels, histogram in registry.series():
+        metric = PREFIX + name
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} summary")
+        for q, value in histogram.quantiles().items():
+            lines.append(f"{metric}{_labels(labels, {'quantile': str(q)})} {value:.6f}")
+        lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str, registry: Optional[MetricsRegistry] = None):
+    """
+    Writes the metrics to `path` atomically (for the node_exporter textfile collector).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics_", suffix=".prom")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(registry))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"Error writing metrics to {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class MetricsServer:
+    """
+    Serves the registry on http://<host>:<port>/metrics from a daemon thread.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            port (int): Port to listen on (0 picks a free one).
+            host (str): Interface to bind. Local only by default.
+            registry (Optional[MetricsRegistry]): Registry to expose. Defaults to the process-wide one.
+        """
+        registry = registry or get_registry()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(registry).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"metrics: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        logging.info(f"Metrics available at http://{self._server.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
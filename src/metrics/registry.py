@@ -0,0 +1,176 @@
+import time
+import math
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+# Phases instrumented by the orchestrator
+WARMUP = "warmup"
+STORY_GENERATION = "story_generation"
+STORY_PARSING = "story_parsing"
+DETECTIVE_CALL = "detective_call"
+DETECTIVE_SPECULATION = "detective_speculation"
+MASTER_ANSWER = "master_answer"
+EVALUATION = "evaluation"
+HINT_GENERATION = "hint_generation"
+HISTORY_SUMMARY = "history_summary"
+NOTIFY = "notify"
+SAVE = "save"
+
+PHASE_DURATION = "phase_duration_seconds"
+TIME_TO_FIRST_TOKEN = "time_to_first_token_seconds"
+PROMPT_TOKENS = "prompt_tokens"
+COMPLETION_TOKENS = "completion_tokens"
+TOKENS_PER_SECOND = "completion_tokens_per_second"
+MODEL_LOAD = "model_load_seconds"  # Time the backend spent loading weights, apart from inference
+QUEUE_WAIT = "provider_queue_wait_seconds"  # Time a call waited for its rate/concurrency limits
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Latency distribution of one labelled series.
+
+    Keeps the exact count and sum plus a bounded window of the most recent samples,
+    from which the quantiles are computed.
+    """
+
+    def __init__(self, window: int = 4096):
+        """
+        Args:
+            window (int): Number of recent samples kept for the quantiles.
+        """
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        """
+        Nearest-rank p50/p95/p99 over the sample window (0.0 if empty).
+        """
+        if not self._samples:
+            return {q: 0.0 for q in QUANTILES}
+        ordered = sorted(self._samples)
+        return {q: ordered[max(0, math.ceil(q * len(ordered)) - 1)] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of histograms keyed by metric name and labels.
+
+    A registry may have a parent: every observation is forwarded to it, so a game can
+    keep its own metrics (for its end-of-game summary) while also feeding the
+    process-wide registry that is exported.
+    """
+
+    def __init__(self, parent: Optional["MetricsRegistry"] = None):
+        """
+        Args:
+            parent (Optional[MetricsRegistry]): Registry that also receives every observation.
+        """
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def observe(self, name: str, value: float, **labels: str):
+        """
+        Records one observation of `name` (seconds, or tokens for the token series) for the given labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        if self.parent is not None:
+            self.parent.observe(name, value, **labels)
+
+    @contextmanager
+    def span(self, phase: str, model: str = "") -> Iterator[None]:
+        """
+        Times the enclosed block as one observation of `phase` for `model`.
+
+        Failed blocks are recorded too (a timeout is exactly the latency to find), but
+        cancelled ones are not: they were abandoned, not slow.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.observe(PHASE_DURATION, time.perf_counter() - start, phase=phase, model=model)
+            raise
+        self.observe(PHASE_DURATION, time.perf_counter() - start, phase=phase, model=model)
+
+    def series(self) -> List[Tuple[str, Dict[str, str], Histogram]]:
+        """
+        Snapshot of every (name, labels, histogram), sorted by name and labels.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return [(name, dict(labels), histogram) for (name, labels), histogram in items]
+
+    def summary(self, name: str = PHASE_DURATION) -> List[Dict]:
+        """
+        One row per labelled series of `name`, slowest p95 first.
+        """
+        rows = []
+        for series_name, labels, histogram in self.series():
+            if series_name != name:
+                continue
+            quantiles = histogram.quantiles()
+            rows.append({
+                **labels,
+                "count": histogram.count,
+                "total": histogram.sum,
+                "p50": quantiles[0.5],
+                "p95": quantiles[0.95],
+                "p99": quantiles[0.99],
+                "max": histogram.max,
+            })
+        rows.sort(key=lambda row: row["p95"], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Returns the process-wide registry (the one exported to Prometheus).
+    """
+    return _registry
+
+
+def format_summary(rows: List[Dict]) -> str:
+    """
+    Renders summary rows as a fixed-width text table (for logs).
+    """
+    lines = [f"{'phase':<22} {'model':<28} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'total':>9}"]
+    for row in rows:
+        lines.append(
+            f"{row.get('phase', ''):<22} {row.get('model', '') or '-':<28} {row['count']:>5} "
+            f"{row['p50']:>7.3f}s {row['p95']:>7.3f}s {row['p99']:>7.3f}s {row['total']:>8.2f}s"
+        )
+    return "\n".join(lines)
+
+
+def log_summary(registry: MetricsRegistry, title: str = "Latency by phase"):
+    rows = registry.summary()
+    if rows:
+        logging.info(f"{title}:\n{format_summary(rows)}")
@@ -1,11 +1,86 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set, Union
+from .session import ChatSession
+from .limits import Permit, ProviderLimiter, get_limiter, estimate_prompt_tokens
+
+
+@dataclass
+class Usage:
+    """
+    Token counts and timings reported by the backend for one call.
+    Fields the backend does not report are left as None.
+    """
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    eval_duration: Optional[float] = None  # Seconds spent generating the completion
+    load_duration: Optional[float] = None  # Seconds spent loading the model
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """
+        Generation throughput, when both the completion size and its duration are known.
+        """
+        if self.completion_tokens and self.eval_duration:
+            return self.completion_tokens / self.eval_duration
+        return None
+
+
+@dataclass
+class ProviderResponse:
+    """
+    Structured result of a model call: the text plus its usage, if reported.
+    """
+    text: str
+    usage: Optional[Usage] = None
+
+
+class ResponseStream:
+    """
+    Async iterator over the text chunks of a streamed call.
+
+    Providers feed it a generator that yields text chunks and, at most once, a Usage
+    (usually after the last chunk). Iterating yields only the text; the usage is kept
+    in `.usage` and is None if the stream was closed before the backend reported it.
+    """
+
+    def __init__(self, events: AsyncIterator[Union[str, Usage]]):
+        self._events = events
+        self.usage: Optional[Usage] = None
+
+    def __aiter__(self) -> "ResponseStream":
+        return self
+
+    async def __anext__(self) -> str:
+        while True:
+            item = await self._events.__anext__()
+            if isinstance(item, Usage):
+                self.usage = item
+                continue
+            return item
+
+    async def aclose(self):
+        """
+        Closes the underlying stream (aborting the generation if still running).
+        """
+        await self._events.aclose()
+
 
 class BaseProvider(ABC):
     """
     Abstract base class for AI model providers.
     """
 
+    # Whether the provider accepts the 'system' and 'history' keyword arguments
+    # natively (see ChatSession). Otherwise sessions flatten them into the prompt.
+    supports_chat = False
+
+    # Key of the client-side rate and concurrency limits (see limits.get_limiter).
+    # Empty for providers that do not call a backend themselves (replay, wrappers)
+    provider_name = ""
+
     def __init__(self, model_name: str):
         """
         Initializes the provider with a specific model name.
@@ -15,6 +90,81 @@ class BaseProvider(ABC):
         """
         self.model_name = model_name
 
+    def close(self):
+        """
+        Releases the provider's connections. The default implementation holds none.
+        """
+
+    async def awarm_up(self) -> Optional[float]:
+        """
+        Loads the model on the backend ahead of the first real call.
+
+        Returns:
+            Optional[float]: Seconds the backend spent loading it, or None if the
+            provider has nothing to load (remote APIs, replays).
+        """
+        return None
+
+    @property
+    def resident_name(self) -> str:
+        """
+        Name under which the backend lists this model as loaded (see aresident_models).
+        """
+        return self.model_name
+
+    async def aresident_models(self) -> Optional[Dict[str, Set[str]]]:
+        """
+        Models currently loaded in memory, per backend host. None if the backend does not report it.
+        """
+        return None
+
+    @property
+    def limiter(self) -> Optional[ProviderLimiter]:
+        """
+        The limits shared by every provider of this (provider, model), or None if unlimited.
+        """
+        if not self.provider_name:
+            return None
+        return get_limiter(self.provider_name, self.model_name)
+
+    @contextmanager
+    def _limited(self, prompt: str, **kwargs: Any) -> Iterator[Permit]:
+        """
+        Admits a backend call under the provider's limits, blocking while over budget.
+        Subclasses wrap each call in it and settle() the permit with the real usage.
+        """
+        limiter = self.limiter
+        if limiter is None:
+            yield Permit()
+            return
+        with limiter.slot(estimate_prompt_tokens(prompt, **kwargs)) as permit:
+            yield permit
+
+    @asynccontextmanager
+    async def _alimited(self, prompt: str, **kwargs: Any) -> AsyncIterator[Permit]:
+        """
+        Asynchronous counterpart of _limited.
+        """
+        limiter = self.limiter
+        if limiter is None:
+            yield Permit()
+            return
+        async with limiter.aslot(estimate_prompt_tokens(prompt, **kwargs)) as permit:
+            yield permit
+
+    def start_session(self, system_prompt: Optional[str] = None, keep_history: bool = True) -> ChatSession:
+        """
+        Opens a stateful chat session with this provider.
+
+        Args:
+            system_prompt (Optional[str]): Fixed instructions sent before every turn.
+            keep_history (bool): Whether previous turns are sent back as context.
+
+        Returns:
+            ChatSession: The new session.
+        """
+        return ChatSession(self, system_prompt, keep_history)
+
     @abstractmethod
     def generate_response(self, prompt: str, **kwargs: Any) -> str:
         """
@@ -28,3 +178,71 @@ class BaseProvider(ABC):
             str: The generated text response from the model.
         """
         pass
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Asynchronously generates a response from the AI model.
+
+        The default implementation runs generate_response in a worker thread so
+        that any provider can be awaited; subclasses with a native async client
+        should override it to avoid holding a thread per call.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            **kwargs: Additional provider-specific arguments.
+
+        Returns:
+            str: The generated text response from the model.
+        """
+        return await asyncio.to_thread(self.generate_response, prompt, **kwargs)
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        """
+        Generates a response from the AI model, yielding text chunks as they arrive.
+
+        The default implementation yields the whole response as a single chunk;
+        subclasses whose backend supports streaming should override it.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            **kwargs: Additional provider-specific arguments.
+
+        Yields:
+            str: Consecutive fragments of the generated text.
+        """
+        yield self.generate_response(prompt, **kwargs)
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Asynchronous counterpart of stream_response.
+
+        Args:
+            prompt (str): The prompt to send to the model.
+            **kwargs: Additional provider-specific arguments.
+
+        Yields:
+            str: Consecutive fragments of the generated text.
+        """
+        yield await self.agenerate_response(prompt, **kwargs)
+
+    # --- Structured calls (text + usage) ---
+    # Providers that report token usage override these; the defaults wrap the
+    # text-only methods and report no usage.
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Like generate_response, but also returns the token usage of the call.
+        """
+        return ProviderResponse(self.generate_response(prompt, **kwargs))
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Asynchronous counterpart of generate.
+        """
+        return ProviderResponse(await self.agenerate_response(prompt, **kwargs))
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        """
+        Like astream_response, but the returned stream exposes the usage once consumed.
+        """
+        return ResponseStream(self.astream_response(prompt, **kwargs))
@@ -0,0 +1,314 @@
+import os
+import gzip
+import zlib
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict, deque
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, IO, Iterator, List, Optional, Set, Union
+from .base import BaseProvider, ProviderResponse, ResponseStream, Usage
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(LookupError):
+    """
+    Raised when a replayed prompt was never recorded in the cassette.
+    """
+
+
+def prompt_key(model_name: str, prompt: str, **kwargs: Any) -> str:
+    """
+    Stable hash of a call: model, prompt and the chat context (system prompt and history).
+    """
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "system": kwargs.get("system"), "history": kwargs.get("history")},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _open_cassette(path: str, mode: str) -> IO[str]:
+    """
+    Opens a cassette as text; paths ending in .gz are gzip-compressed.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordingProvider(BaseProvider):
+    """
+    Wraps a provider and records every prompt -> response pair, with timings, to a cassette.
+
+    The cassette is a JSON Lines file (optionally gzip-compressed) whose entries store the
+    prompt hash instead of the prompt, keeping it compact. Entries are appended as soon as
+    each call completes, so a partial run still yields a usable cassette.
+    """
+
+    def __init__(self, inner: BaseProvider, path: str):
+        """
+        Initializes the recorder.
+
+        Args:
+            inner (BaseProvider): The provider that actually answers the calls.
+            path (str): The cassette file. New entries are appended to it.
+        """
+        super().__init__(inner.model_name)
+        self.inner = inner
+        self.path = path
+        self.supports_chat = inner.supports_chat
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = _open_cassette(path, "a")
+        if is_new:
+            self._write({"cassette": CASSETTE_VERSION, "created": datetime.now().isoformat(timespec="seconds")})
+        logging.info(f"Recording {inner.__class__.__name__}({inner.model_name}) to cassette {path}")
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def _record(self, prompt: str, kwargs: Dict[str, Any], response: str, elapsed: float,
+                first_token: Optional[float] = None, usage: Optional[Usage] = None):
+        entry = {
+            "k": prompt_key(self.model_name, prompt, **kwargs),
+            "m": self.model_name,
+            "p": self.inner.__class__.__name__,
+            "r": response,
+            "t": round(elapsed, 4),
+        }
+        if first_token is not None:
+            entry["f"] = round(first_token, 4)
+        if usage is not None:
+            entry["u"] = {k: v for k, v in asdict(usage).items() if v is not None}
+        self._write(entry)
+
+    def close(self):
+        """
+        Closes the cassette file and the wrapped provider.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        self.inner.close()
+
+    async def awarm_up(self) -> Optional[float]:
+        # Warm-ups are not recorded: a replay has nothing to load
+        return await self.inner.awarm_up()
+
+    @property
+    def resident_name(self) -> str:
+        return self.inner.resident_name
+
+    async def aresident_models(self) -> Optional[Dict[str, Set[str]]]:
+        return await self.inner.aresident_models()
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        start = time.time()
+        response = self.inner.generate(prompt, **kwargs)
+        self._record(prompt, kwargs, response.text, time.time() - start, usage=response.usage)
+        return response
+
+    def generate_response(self, prompt: str, **kwargs: Any) -> str:
+        return self.generate(prompt, **kwargs).text
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        start = time.time()
+        response = await self.inner.agenerate(prompt, **kwargs)
+        self._record(prompt, kwargs, response.text, time.time() - start, usage=response.usage)
+        return response
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        return (await self.agenerate(prompt, **kwargs)).text
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        start = time.time()
+        first_token = None
+        chunks = []
+        try:
+            for chunk in self.inner.stream_response(prompt, **kwargs):
+                if first_token is None:
+                    first_token = time.time() - start
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # Cut short by the caller (early stop): the prefix it consumed is what a replay
+            # must reproduce, so it is recorded as well
+            self._record(prompt, kwargs, "".join(chunks), time.time() - start, first_token)
+            raise
+        self._record(prompt, kwargs, "".join(chunks), time.time() - start, first_token)
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        return ResponseStream(self._astream_events(prompt, **kwargs))
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        stream = self.astream(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_events(self, prompt: str, **kwargs: Any) -> AsyncIterator[Union[str, Usage]]:
+        start = time.time()
+        first_token = None
+        chunks = []
+        stream = self.inner.astream(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                if first_token is None:
+                    first_token = time.time() - start
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            self._record(prompt, kwargs, "".join(chunks), time.time() - start, first_token)
+            raise
+        finally:
+            await stream.aclose()
+        self._record(prompt, kwargs, "".join(chunks), time.time() - start, first_token, stream.usage)
+        if stream.usage is not None:
+            yield stream.usage
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Serves responses recorded by RecordingProvider, keyed by prompt hash.
+
+    Repeated prompts are answered in the order they were recorded; once exhausted the
+    last response is repeated. With realtime=True each call waits the recorded latency,
+    otherwise responses are returned instantly.
+    """
+
+    supports_chat = True
+
+    def __init__(self, path: str, model_name: Optional[str] = None, realtime: bool = False):
+        """
+        Loads a cassette.
+
+        Args:
+            path (str): The cassette file.
+            model_name (Optional[str]): Model whose entries are replayed. Defaults to the
+                first model found in the cassette.
+            realtime (bool): Whether to reproduce the recorded latencies.
+        """
+        entries = self._load(path)
+        models = list(dict.fromkeys(e["m"] for e in entries))
+        if not model_name:
+            if not models:
+                raise ValueError(f"Cassette {path} is empty")
+            model_name = models[0]
+        elif model_name not in models:
+            raise ValueError(f"Model '{model_name}' not found in cassette {path} (available: {', '.join(models) or 'none'})")
+
+        super().__init__(model_name)
+        self.path = path
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in entries:
+            if entry["m"] == model_name:
+                self._entries[entry["k"]].append(entry)
+        logging.info(f"Replaying {sum(len(v) for v in self._entries.values())} responses of {model_name} from {path}")
+
+    @staticmethod
+    def _load(path: str) -> List[Dict[str, Any]]:
+        entries = []
+        with _open_cassette(path, "r") as f:
+            try:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Skipping corrupt line {line_number} in cassette {path}")
+                        continue
+                    if "k" in entry:
+                        entries.append(entry)
+            except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+                # A .gz cassette whose recording died before close() has no gzip trailer:
+                # keep what was read, as with a truncated last line of a plain cassette
+                logging.warning(f"Cassette {path} is truncated ({e}); using its first {len(entries)} responses")
+        return entries
+
+    def _next(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        key = prompt_key(self.model_name, prompt, **kwargs)
+        with self._lock:
+            queue = self._entries.get(key)
+            if not queue:
+                raise CassetteMissError(f"Prompt {key} was not recorded in cassette {self.path}")
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    @staticmethod
+    def _chunks(text: str) -> List[str]:
+        # The recording keeps the full text; replayed streams are split on word boundaries
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + [words[-1]]
+
+    @staticmethod
+    def _usage(entry: Dict[str, Any]) -> Optional[Usage]:
+        return Usage(**entry["u"]) if "u" in entry else None
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        entry = self._next(prompt, kwargs)
+        if self.realtime:
+            time.sleep(entry["t"])
+        return ProviderResponse(entry["r"], self._usage(entry))
+
+    def generate_response(self, prompt: str, **kwargs: Any) -> str:
+        return self.generate(prompt, **kwargs).text
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        entry = self._next(prompt, kwargs)
+        if self.realtime:
+            await asyncio.sleep(entry["t"])
+        return ProviderResponse(entry["r"], self._usage(entry))
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        return (await self.agenerate(prompt, **kwargs)).text
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        entry = self._next(prompt, kwargs)
+        chunks = self._chunks(entry["r"])
+        first_token = entry.get("f", entry["t"])
+        step = max(0.0, entry["t"] - first_token) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if self.realtime:
+                time.sleep(first_token if i == 0 else step)
+            yield chunk
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        return ResponseStream(self._astream_events(prompt, **kwargs))
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        stream = self.astream(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_events(self, prompt: str, **kwargs: Any) -> AsyncIterator[Union[str, Usage]]:
+        entry = self._next(prompt, kwargs)
+        chunks = self._chunks(entry["r"])
+        first_token = entry.get("f", entry["t"])
+        step = max(0.0, entry["t"] - first_token) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if self.realtime:
+                await asyncio.sleep(first_token if i == 0 else step)
+            yield chunk
+        usage = self._usage(entry)
+        if usage is not None:
+            yield usage
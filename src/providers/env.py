@@ -0,0 +1,21 @@
+import threading
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """
+    Loads the .env file once per process.
+
+    Called by the providers when they are first built rather than at import time,
+    so importing a provider module has no side effects and the file is read once.
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,110 @@
+import re
+import asyncio
+from typing import Optional
+
+
+class ProviderError(Exception):
+    """
+    Base class of the errors raised by providers.
+
+    Attributes:
+        provider (str): Provider class name.
+        model (str): Model that was called.
+        retryable (bool): Whether the same call may succeed if repeated.
+        retry_after (Optional[float]): Seconds the backend asked us to wait, if any.
+    """
+
+    retryable = False
+
+    def __init__(self, message: str, provider: str = "", model: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.model = model
+        self.retry_after = retry_after
+
+
+class ProviderTimeoutError(ProviderError):
+    """
+    The call (or the wait for the next streamed chunk) exceeded its timeout.
+    """
+    retryable = True
+
+
+class ProviderUnavailableError(ProviderError):
+    """
+    The backend could not be reached or failed on its side (connection errors, 5xx).
+    """
+    retryable = True
+
+
+class RateLimitError(ProviderError):
+    """
+    The backend rejected the call for exceeding a quota (HTTP 429 / RESOURCE_EXHAUSTED).
+    """
+    retryable = True
+
+
+class CircuitOpenError(ProviderError):
+    """
+    The host's circuit breaker is open: the call was not attempted.
+    """
+
+
+class ProviderResponseError(ProviderError):
+    """
+    The backend answered with an error that repeating the call will not fix (bad request, unknown model, blocked content).
+    """
+
+
+_RETRY_DELAY = re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+_RETRY_IN = re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attribute in ("status_code", "code"):
+        value = getattr(exc, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Reads the wait requested by the backend: a Retry-After header (HTTP) or the
+    retry_delay that Gemini puts in its 429 errors.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            if value is not None:
+                return float(value)
+        except ValueError:
+            pass
+    text = str(exc)
+    match = _RETRY_DELAY.search(text) or _RETRY_IN.search(text)
+    return float(match.group(1)) if match else None
+
+
+def classify(exc: BaseException, provider: str = "", model: str = "") -> ProviderError:
+    """
+    Maps a backend exception (httpx, ollama, google.api_core, builtins) to a typed ProviderError.
+    """
+    if isinstance(exc, ProviderError):
+        return exc
+    message = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+    name = type(exc).__name__
+    status = _status_code(exc)
+
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in name or name == "DeadlineExceeded" or status == 504:
+        return ProviderTimeoutError(message, provider, model)
+    if status == 429 or name in ("ResourceExhausted", "TooManyRequests"):
+        return RateLimitError(message, provider, model, retry_after=_retry_after(exc))
+    if status is not None and status >= 500 or name in ("ServiceUnavailable", "InternalServerError"):
+        return ProviderUnavailableError(message, provider, model)
+    if isinstance(exc, (ConnectionError, OSError)) or "Connect" in name or name in ("NetworkError", "RemoteProtocolError"):
+        return ProviderUnavailableError(message, provider, model)
+    return ProviderResponseError(message, provider, model)
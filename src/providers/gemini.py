@@ -1,12 +1,28 @@
 import os
 import logging
-from typing import Any
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 import google.generativeai as genai
-from dotenv import load_dotenv
-from .base import BaseProvider
+from .base import BaseProvider, ProviderResponse, ResponseStream, Usage
+from .env import load_env
+from .errors import ProviderResponseError
+from .resilience import Resilience
+
+GEMINI_HOST = "generativelanguage.googleapis.com"
+
+# genai.configure() replaces the global client (and its gRPC channel); doing it only
+# when the key changes lets every provider share one channel
+_configured_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def _configure(api_key: str):
+    global _configured_key
+    with _configure_lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
 
-# Load environment variables
-load_dotenv()
 
 class GeminiProvider(BaseProvider):
     """
@@ -18,21 +34,160 @@ class GeminiProvider(BaseProvider):
         Initializes the Gemini provider.
         """
         super().__init__(model_name)
+        load_env()
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in .env file")
         
-        genai.configure(api_key=self.api_key)
+        _configure(self.api_key)
+        # Quota errors (429) carry a retry_delay that the retry policy honours
+        self.resilience = Resilience(self.__class__.__name__, model_name, GEMINI_HOST)
+        timeout = self.resilience.policy.timeout
+        self._request_options = {'timeout': timeout} if timeout else {}
         self.model = genai.GenerativeModel(self.model_name)
+        # One model per system instruction (e.g. the secret solution of a game)
+        self._system_models: Dict[str, genai.GenerativeModel] = {}
         logging.info(f"Gemini provider initialized with model: {self.model_name}")
 
+    supports_chat = True
+    provider_name = "gemini"
+    _MAX_SYSTEM_MODELS = 32
+
+    def _model_for(self, system: Optional[str]) -> genai.GenerativeModel:
+        """
+        Returns a model configured with the given system instruction, reusing it across turns.
+        """
+        if not system:
+            return self.model
+        model = self._system_models.get(system)
+        if model is None:
+            if len(self._system_models) >= self._MAX_SYSTEM_MODELS:
+                self._system_models.pop(next(iter(self._system_models)))
+            model = genai.GenerativeModel(self.model_name, system_instruction=system)
+            self._system_models[system] = model
+        return model
+
+    def close(self):
+        """
+        Drops the cached per-system-instruction models. The shared channel stays with genai.
+        """
+        self._system_models.clear()
+
+    def _start_chat(self, system: Optional[str] = None,
+                    history: Optional[List[Dict[str, str]]] = None, **kwargs: Any) -> genai.ChatSession:
+        """
+        Opens a ChatSession holding the previous turns, so only the new message is added.
+        """
+        contents = [
+            {'role': 'model' if m['role'] == 'assistant' else 'user', 'parts': [m['content']]}
+            for m in history or []
+        ]
+        return self._model_for(system).start_chat(history=contents)
+
+    def _text(self, response: Any) -> str:
+        """
+        The text of a response or chunk. Blocked or empty candidates make .text raise ValueError.
+        """
+        try:
+            return response.text
+        except ValueError as e:
+            raise ProviderResponseError(f"Gemini returned no text: {e}", self.__class__.__name__, self.model_name) from e
+
+    @staticmethod
+    def _usage(response: Any) -> Optional[Usage]:
+        """
+        Extracts the token counts from a response's usage_metadata (Gemini reports no timings).
+        """
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is None:
+            return None
+        return Usage(
+            prompt_tokens=getattr(metadata, 'prompt_token_count', None),
+            completion_tokens=getattr(metadata, 'candidates_token_count', None)
+        )
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Generates a response from the Gemini model, with its token usage.
+
+        Raises:
+            ProviderError: If the call fails after the retries.
+        """
+        # Every attempt opens its own chat: a failed send must not leave turns behind
+        with self._limited(prompt, **kwargs) as permit:
+            response = self.resilience.call(
+                lambda: self._start_chat(**kwargs).send_message(prompt, request_options=self._request_options))
+            usage = self._usage(response)
+            permit.settle(usage)
+        return ProviderResponse(self._text(response), usage)
+
     def generate_response(self, prompt: str, **kwargs: Any) -> str:
         """
         Generates a response from the Gemini model.
         """
+        return self.generate(prompt, **kwargs).text
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Generates a response from the Gemini model without blocking the event loop, with its token usage.
+        """
+        async with self._alimited(prompt, **kwargs) as permit:
+            response = await self.resilience.acall(
+                lambda: self._start_chat(**kwargs).send_message_async(prompt, request_options=self._request_options))
+            usage = self._usage(response)
+            permit.settle(usage)
+        return ProviderResponse(self._text(response), usage)
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Generates a response from the Gemini model without blocking the event loop.
+        """
+        return (await self.agenerate(prompt, **kwargs)).text
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        """
+        Streams the response from the Gemini model chunk by chunk.
+        """
+        with self._limited(prompt, **kwargs) as permit:
+            last, stream = self.resilience.open_stream(
+                lambda: self._start_chat(**kwargs).send_message(prompt, stream=True, request_options=self._request_options))
+            if last is None:
+                return
+            yield self._text(last)
+            for chunk in self.resilience.iterate(stream):
+                last = chunk
+                yield self._text(chunk)
+            permit.settle(self._usage(last))
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        """
+        Streams the response from the Gemini model; the usage is reported once the stream ends.
+        """
+        return ResponseStream(self._astream_events(prompt, **kwargs))
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Streams the response from the Gemini model without blocking the event loop.
+        """
+        stream = self.astream(prompt, **kwargs)
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logging.error(f"Error generating response from Gemini: {e}")
-            return "Error: Could not get a response from the model."
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_events(self, prompt: str, **kwargs: Any) -> AsyncIterator[Union[str, Usage]]:
+        async with self._alimited(prompt, **kwargs) as permit:
+            last, stream = await self.resilience.aopen_stream(
+                lambda: self._start_chat(**kwargs).send_message_async(prompt, stream=True, request_options=self._request_options))
+            if last is None:
+                return
+            yield self._text(last)
+            async for chunk in self.resilience.aiterate(stream):
+                last = chunk
+                yield self._text(chunk)
+            # Every chunk carries the cumulative usage; the last one has the final counts
+            usage = self._usage(last)
+            permit.settle(usage)
+            if usage is not None:
+                yield usage
@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from .env import load_env
+from ..metrics.registry import get_registry, QUEUE_WAIT
+
+if TYPE_CHECKING:
+    from .base import Usage
+
+# Completion size assumed when reserving tokens/min budget; corrected with the real usage afterwards
+DEFAULT_COMPLETION_ESTIMATE = 256
+LIMIT_FIELDS = ("rpm", "tpm", "max_in_flight")
+
+
+@dataclass
+class LimitConfig:
+    """
+    Client-side limits of one (provider, model). None means unlimited.
+    """
+    rpm: Optional[float] = None  # Requests per minute
+    tpm: Optional[float] = None  # Tokens (prompt + completion) per minute
+    max_in_flight: Optional[int] = None  # Concurrent calls
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rpm is None and self.tpm is None and self.max_in_flight is None
+
+
+def _load_file(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.error(f"Error loading provider limits from {path}: {e}")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def load_limits(provider: str, model: str) -> LimitConfig:
+    """
+    Resolves the limits of a (provider, model). Later sources override earlier ones:
+
+    1. The JSON file in PROVIDER_LIMITS_FILE (default provider_limits.json), with entries
+       keyed by "provider" and then by "provider:model":
+           {"gemini": {"rpm": 15, "tpm": 1000000}, "ollama:gemma3:12b": {"max_in_flight": 2}}
+    2. Environment: <PROVIDER>_RPM, <PROVIDER>_TPM, <PROVIDER>_MAX_IN_FLIGHT (e.g. GEMINI_RPM=15).
+    """
+    load_env()
+    limits = _load_file(os.getenv("PROVIDER_LIMITS_FILE", "provider_limits.json"))
+    values: Dict[str, Any] = {}
+    for key in (provider, f"{provider}:{model}"):
+        values.update({k: v for k, v in limits.get(key, {}).items() if k in LIMIT_FIELDS})
+    for field_name in LIMIT_FIELDS:
+        value = os.getenv(f"{provider.upper()}_{field_name.upper()}")
+        if value:
+            values[field_name] = float(value)
+    if values.get("max_in_flight") is not None:
+        values["max_in_flight"] = int(values["max_in_flight"])
+    return LimitConfig(**{k: (v or None) for k, v in values.items()})
+
+
+def estimate_prompt_tokens(prompt: str, system: Optional[str] = None,
+                           history: Optional[List[Dict[str, str]]] = None, **kwargs: Any) -> int:
+    """
+    Rough size of a call's input (~4 characters per token), used to reserve tokens/min budget.
+    """
+    chars = len(prompt) + len(system or "") + sum(len(m.get("content", "")) for m in history or [])
+    return (chars + 3) // 4
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute` units per minute, holding at most a minute's worth.
+
+    reserve() never blocks: it takes the units (the level may go negative) and returns
+    how long the caller must wait for them. Callers are thereby served in arrival order,
+    whichever thread or event loop they run on.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self._level = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes `amount` units and returns the seconds until they are actually available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            # A single request larger than the bucket would otherwise never fit
+            self._level -= min(amount, self.capacity)
+            return -self._level / self.rate if self._level < 0 else 0.0
+
+    def refund(self, amount: float):
+        """
+        Returns units taken in excess (or takes more, if `amount` is negative).
+        """
+        with self._lock:
+            self._level = min(self.capacity, self._level + amount)
+
+
+class InFlightLimiter:
+    """
+    Semaphore usable from threads and from any event loop at once.
+
+    asyncio.Semaphore is bound to one loop and threading.Semaphore blocks it, while the
+    same provider is called from the shared runtime loop, from worker threads and from
+    the GUI. Waiters are woken in FIFO order.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Union[threading.Event, Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self):
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()  # The releasing call hands its slot over
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over just as we were cancelled: pass it on. If the
+            # hand-over is still pending, _hand_over sees the cancelled future and does it
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_hand_over, future, self)
+                    return
+            self._in_flight -= 1
+
+
+def _hand_over(future: asyncio.Future, limiter: InFlightLimiter):
+    # Runs on the waiter's loop; a waiter cancelled in the meantime passes the slot on
+    if future.cancelled():
+        limiter.release()
+    else:
+        future.set_result(None)
+
+
+class Permit:
+    """
+    Admission of one call. settle() corrects the reserved tokens with the real usage.
+    """
+
+    def __init__(self, limiter: Optional["ProviderLimiter"] = None, reserved_tokens: int = 0):
+        self._limiter = limiter
+        self._reserved = reserved_tokens
+
+    def settle(self, usage: Optional["Usage"]):
+        bucket = self._limiter.tokens if self._limiter is not None else None
+        if bucket is None or usage is None or usage.prompt_tokens is None or usage.completion_tokens is None:
+            return
+        bucket.refund(self._reserved - (usage.prompt_tokens + usage.completion_tokens))
+        self._reserved = 0
+
+
+class ProviderLimiter:
+    """
+    Shared budget of one (provider, model): requests/min, tokens/min and concurrent calls.
+
+    Every provider instance of the same (provider, model) in the process uses the same
+    limiter (see get_limiter), so the CLI, the GUI and tournament workers queue together
+    instead of overrunning the backend. The time spent queued is recorded as QUEUE_WAIT.
+    """
+
+    def __init__(self, provider: str, model: str, config: LimitConfig):
+        self.provider = provider
+        self.model = model
+        self.config = config
+        self.requests = TokenBucket(config.rpm) if config.rpm else None
+        self.tokens = TokenBucket(config.tpm) if config.tpm else None
+        self.in_flight = InFlightLimiter(config.max_in_flight) if config.max_in_flight else None
+
+    def _reserve(self, prompt_tokens: int) -> Tuple[float, int]:
+        delay, reserved = 0.0, 0
+        if self.requests is not None:
+            delay = self.requests.reserve(1)
+        if self.tokens is not None:
+            reserved = prompt_tokens + DEFAULT_COMPLETION_ESTIMATE
+            delay = max(delay, self.tokens.reserve(reserved))
+        return delay, reserved
+
+    def _observe(self, start: float):
+        get_registry().observe(QUEUE_WAIT, time.perf_counter() - start, provider=self.provider, model=self.model)
+
+    @contextmanager
+    def slot(self, prompt_tokens: int = 0) -> Iterator[Permit]:
+        """
+        Blocks until the call is admitted and holds its concurrency slot while the block runs.
+        """
+        start = time.perf_counter()
+        if self.in_flight is not None:
+            self.in_flight.acquire()
+        try:
+            delay, reserved = self._reserve(prompt_tokens)
+            if delay:
+                time.sleep(delay)
+            self._observe(start)
+            yield Permit(self, reserved)
+        finally:
+            if self.in_flight is not None:
+                self.in_flight.release()
+
+    @asynccontextmanager
+    async def aslot(self, prompt_tokens: int = 0) -> AsyncIterator[Permit]:
+        """
+        Asynchronous counterpart of slot(): waits without blocking the event loop.
+        """
+        start = time.perf_counter()
+        if self.in_flight is not None:
+            await self.in_flight.aacquire()
+        try:
+            delay, reserved = self._reserve(prompt_tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            self._observe(start)
+            yield Permit(self, reserved)
+        finally:
+            if self.in_flight is not None:
+                self.in_flight.release()
+
+
+_limiters: Dict[Tuple[str, str], Optional[ProviderLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str) -> Optional[ProviderLimiter]:
+    """
+    Returns the process-wide limiter of a (provider, model), or None if it has no limits configured.
+    """
+    key = (provider, model)
+    with _limiters_lock:
+        if key not in _limiters:
+            config = load_limits(provider, model)
+            _limiters[key] = None if config.unlimited else ProviderLimiter(provider, model, config)
+            if _limiters[key] is not None:
+                logging.info(f"Limits for {provider}:{model}: {config}")
+        return _limiters[key]
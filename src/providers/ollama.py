@@ -1,38 +1,365 @@
 import os
+import time
+import asyncio
 import logging
-from typing import Any
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar, Union
+import httpx
 import ollama
-from dotenv import load_dotenv
-from .base import BaseProvider
+from .base import BaseProvider, ProviderResponse, ResponseStream, Usage
+from .env import load_env
+from .errors import ProviderError, CircuitOpenError
+from .resilience import Resilience
+from .routing import HostRouter, parse_hosts
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+T = TypeVar("T")
+
+
+def _parse_keep_alive(value: Optional[str]) -> Optional[Union[float, str]]:
+    """
+    OLLAMA_KEEP_ALIVE as the API expects it: a duration ("30m") or seconds (-1 keeps the model loaded forever).
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _model_tag(name: str) -> str:
+    # Ollama lists models with their tag; a bare name means ':latest'
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaHost:
+    """
+    Clients of one Ollama server: a sync client, one async client per event loop (httpx
+    async clients are bound to the loop that created them) and the server's Resilience.
+    """
+
+    def __init__(self, url: str, model_name: str, client_options: Dict[str, Any]):
+        self.url = url
+        self.resilience = Resilience(OllamaProvider.__name__, model_name, url)
+        self._client_options = client_options
+        self.client = ollama.Client(host=url, **client_options)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    def async_client(self) -> ollama.AsyncClient:
+        """
+        Returns the async client for the running event loop, creating it on first use.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = ollama.AsyncClient(host=self.url, **self._client_options)
+            self._async_clients[loop] = client
+        return client
+
+    def close(self):
+        """
+        Closes the pooled HTTP connections of the sync client and of every async client.
+        Async clients are closed on their own event loop when it is still running.
+        """
+        http_client = getattr(self.client, '_client', None)
+        if http_client is not None and hasattr(http_client, 'close'):
+            http_client.close()
+        for loop, client in list(self._async_clients.items()):
+            http_client = getattr(client, '_client', None)
+            if http_client is None or not hasattr(http_client, 'aclose') or loop.is_closed():
+                continue
+            try:
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(http_client.aclose(), loop).result(timeout=5)
+                else:
+                    loop.run_until_complete(http_client.aclose())
+            except Exception as e:
+                logging.debug(f"Error closing Ollama async client: {e}")
+        self._async_clients.clear()
 
-# Load environment variables
-load_dotenv()
 
 class OllamaProvider(BaseProvider):
     """
-    Provider for Ollama models.
+    Provider for Ollama models, served by one or several equivalent Ollama servers.
     """
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, pool_size: Optional[int] = None):
         """
         Initializes the Ollama provider.
+
+        OLLAMA_BASE_URL may list several servers separated by commas. Each call then goes
+        to the server with the lowest live latency and fewest calls in flight, and moves
+        on to another one if its server is down. With OLLAMA_HEDGE=1, async calls slower
+        than their server's p95 are duplicated on a second server; the first reply wins.
+
+        Args:
+            model_name (str): The name of the model to use.
+            pool_size (Optional[int]): Maximum pooled HTTP connections per client.
+                Defaults to OLLAMA_POOL_SIZE or 10. Idle connections are kept alive
+                for OLLAMA_KEEPALIVE_EXPIRY seconds (60 by default).
+
+        Calls are bounded by PROVIDER_TIMEOUT and retried on connection errors and
+        timeouts; see Resilience.
         """
         super().__init__(model_name)
+        load_env()
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        self.client = ollama.Client(host=self.base_url)
-        logging.info(f"Ollama provider initialized with model: {self.model_name} at {self.base_url}")
+        # How long the server keeps the model loaded after each call (server default: 5 minutes)
+        self.keep_alive = _parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE"))
+        self.pool_size = pool_size or int(os.getenv("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE))
+        urls = parse_hosts(self.base_url) or ["http://localhost:11434"]
+        timeout = Resilience(self.__class__.__name__, model_name, urls[0]).policy.timeout
+        client_options = {
+            # Bounds connecting and each read, i.e. the wait for every streamed chunk
+            'timeout': httpx.Timeout(timeout),
+            'limits': httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY))
+            )
+        }
+        self.hosts = {url: OllamaHost(url, model_name, client_options) for url in urls}
+        self.router = HostRouter(urls, hedge=os.getenv("OLLAMA_HEDGE", "").lower() in ("1", "true", "yes"))
+        logging.info(f"Ollama provider initialized with model: {self.model_name} at {', '.join(urls)}")
+
+    supports_chat = True
+    provider_name = "ollama"
+
+    def _chat_args(self, prompt: str, system: Optional[str] = None,
+                   history: Optional[List[Dict[str, str]]] = None, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Builds the arguments of a chat call.
+
+        The system prompt and the previous turns always come first and in the same
+        order, so the server can reuse its prompt (KV) cache and only evaluate the
+        new message. keep_alive keeps the model loaded between turns.
+        """
+        messages = []
+        if system:
+            messages.append({'role': 'system', 'content': system})
+        messages.extend(history or [])
+        messages.append({'role': 'user', 'content': prompt})
+        args = {'model': self.model_name, 'messages': messages}
+        if self.keep_alive is not None:
+            args['keep_alive'] = self.keep_alive
+        return args
+
+    @staticmethod
+    def _usage(response: Any) -> Usage:
+        """
+        Extracts the token counts and timings of a final chat response (durations come in nanoseconds).
+        """
+        def seconds(key: str) -> Optional[float]:
+            value = response.get(key)
+            return value / 1e9 if value is not None else None
+        return Usage(
+            prompt_tokens=response.get('prompt_eval_count'),
+            completion_tokens=response.get('eval_count'),
+            eval_duration=seconds('eval_duration'),
+            load_duration=seconds('load_duration')
+        )
+
+    def _fails_over(self, error: ProviderError, tried: List[str]) -> bool:
+        """
+        Whether a call that failed on its host should be moved to one not yet tried.
+        """
+        return (error.retryable or isinstance(error, CircuitOpenError)) and self.router.pick(exclude=tried) is not None
+
+    def _routed(self, call: Callable[[OllamaHost], T]) -> T:
+        """
+        Runs a blocking call on the best host, moving on to the next one while hosts are down.
+        """
+        tried: List[str] = []
+        while True:
+            url = self.router.pick(exclude=tried)
+            tried.append(url)
+            self.router.started(url)
+            start = time.perf_counter()
+            try:
+                result = call(self.hosts[url])
+            except ProviderError as e:
+                self.router.failed(url)
+                if not self._fails_over(e, tried):
+                    raise
+                logging.warning(f"Ollama host {url} failed, trying another one: {e}")
+                continue
+            finally:
+                self.router.finished(url)
+            self.router.observe(url, time.perf_counter() - start)
+            return result
+
+    async def _arouted(self, call: Callable[[OllamaHost], Awaitable[T]],
+                       discard: Optional[Callable[[T], Awaitable[None]]] = None) -> T:
+        """
+        Asynchronous counterpart of _routed, hedged when OLLAMA_HEDGE is enabled (see HostRouter.race).
+        """
+        async def attempt(url: str) -> T:
+            self.router.started(url)
+            start = time.perf_counter()
+            try:
+                result = await call(self.hosts[url])
+            except ProviderError:
+                self.router.failed(url)
+                raise
+            finally:
+                self.router.finished(url)
+            self.router.observe(url, time.perf_counter() - start)
+            return result
+
+        tried: List[str] = []
+        while True:
+            try:
+                return await self.router.race(attempt, tried, discard)
+            except ProviderError as e:
+                if not self._fails_over(e, tried):
+                    raise
+                logging.warning(f"Ollama host {tried[-1]} failed, trying another one: {e}")
+
+    async def awarm_up(self) -> Optional[float]:
+        """
+        Loads the model on every host (an empty generate request only loads it) and
+        returns the longest load time in seconds: 0 if it was already resident.
+        """
+        async def load(host: OllamaHost) -> float:
+            args = {'model': self.model_name, 'prompt': ''}
+            if self.keep_alive is not None:
+                args['keep_alive'] = self.keep_alive
+            response = await host.resilience.acall(lambda: host.async_client().generate(**args))
+            return (response.get('load_duration') or 0) / 1e9
+
+        loads = await asyncio.gather(*(load(host) for host in self.hosts.values()))
+        return max(loads)
+
+    @property
+    def resident_name(self) -> str:
+        return _model_tag(self.model_name)
+
+    async def aresident_models(self) -> Optional[Dict[str, Set[str]]]:
+        """
+        Models loaded on each host, as reported by its /api/ps endpoint.
+        """
+        async def loaded(host: OllamaHost) -> Set[str]:
+            response = await host.resilience.acall(lambda: host.async_client().ps())
+            return {_model_tag(m.get('model') or m.get('name') or '') for m in response.get('models') or []}
+
+        hosts = list(self.hosts.values())
+        models = await asyncio.gather(*(loaded(host) for host in hosts))
+        return {host.url: names for host, names in zip(hosts, models)}
+
+    def generate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Generates a response from the Ollama model, with its token usage.
+
+        Raises:
+            ProviderError: If the call fails after the retries.
+        """
+        args = self._chat_args(prompt, **kwargs)
+        with self._limited(prompt, **kwargs) as permit:
+            response = self._routed(lambda host: host.resilience.call(lambda: host.client.chat(**args)))
+            usage = self._usage(response)
+            permit.settle(usage)
+        return ProviderResponse(response['message']['content'], usage)
 
     def generate_response(self, prompt: str, **kwargs: Any) -> str:
         """
         Generates a response from the Ollama model.
         """
+        return self.generate(prompt, **kwargs).text
+
+    def close(self):
+        """
+        Closes the pooled HTTP connections to every host.
+        """
+        for host in self.hosts.values():
+            host.close()
+
+    async def agenerate(self, prompt: str, **kwargs: Any) -> ProviderResponse:
+        """
+        Generates a response from the Ollama model without blocking the event loop, with its token usage.
+        """
+        args = self._chat_args(prompt, **kwargs)
+        async with self._alimited(prompt, **kwargs) as permit:
+            response = await self._arouted(lambda host: host.resilience.acall(lambda: host.async_client().chat(**args)))
+            usage = self._usage(response)
+            permit.settle(usage)
+        return ProviderResponse(response['message']['content'], usage)
+
+    async def agenerate_response(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Generates a response from the Ollama model without blocking the event loop.
+        """
+        return (await self.agenerate(prompt, **kwargs)).text
+
+    def stream_response(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        """
+        Streams the response from the Ollama model chunk by chunk.
+        """
+        args = self._chat_args(prompt, **kwargs)
+
+        def open_stream(host: OllamaHost) -> Tuple[OllamaHost, Any, Iterator[Any]]:
+            return (host, *host.resilience.open_stream(lambda: host.client.chat(**args, stream=True)))
+
+        with self._limited(prompt, **kwargs) as permit:
+            host, chunk, stream = self._routed(open_stream)
+            self.router.started(host.url)
+            try:
+                chunks = host.resilience.iterate(stream)
+                while chunk is not None:
+                    yield chunk['message']['content']
+                    if chunk.get('done'):
+                        permit.settle(self._usage(chunk))
+                    chunk = next(chunks, None)
+            finally:
+                self.router.finished(host.url)
+                # Closing the HTTP stream early makes the server abort the generation
+                if hasattr(stream, 'close'):
+                    stream.close()
+
+    def astream(self, prompt: str, **kwargs: Any) -> ResponseStream:
+        """
+        Streams the response from the Ollama model; the usage arrives with the final chunk.
+        """
+        return ResponseStream(self._astream_events(prompt, **kwargs))
+
+    async def astream_response(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Streams the response from the Ollama model without blocking the event loop.
+        """
+        stream = self.astream(prompt, **kwargs)
         try:
-            response = self.client.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            return response['message']['content']
-        except Exception as e:
-            logging.error(f"Error generating response from Ollama: {e}")
-            logging.error("Is Ollama running? You can start it with 'ollama serve'")
-            return "Error: Could not get a response from the model."
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _astream_events(self, prompt: str, **kwargs: Any) -> AsyncIterator[Union[str, Usage]]:
+        args = self._chat_args(prompt, **kwargs)
+
+        async def open_stream(host: OllamaHost) -> Tuple[OllamaHost, Any, AsyncIterator[Any]]:
+            return (host, *await host.resilience.aopen_stream(lambda: host.async_client().chat(**args, stream=True)))
+
+        async def discard(opened: Tuple[OllamaHost, Any, AsyncIterator[Any]]):
+            if hasattr(opened[2], 'aclose'):
+                await opened[2].aclose()
+
+        async with self._alimited(prompt, **kwargs) as permit:
+            # Hedging races the wait for the first chunk; the losing stream is closed
+            host, chunk, stream = await self._arouted(open_stream, discard)
+            self.router.started(host.url)
+            try:
+                chunks = host.resilience.aiterate(stream)
+                while chunk is not None:
+                    yield chunk['message']['content']
+                    if chunk.get('done'):
+                        usage = self._usage(chunk)
+                        permit.settle(usage)
+                        yield usage
+                    chunk = await anext(chunks, None)
+            finally:
+                self.router.finished(host.url)
+                # Closing the HTTP stream early makes the server abort the generation
+                if hasattr(stream, 'aclose'):
+                    await stream.aclose()
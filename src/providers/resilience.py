@@ -0,0 +1,270 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+from .errors import ProviderError, CircuitOpenError, ProviderTimeoutError, ProviderUnavailableError, classify
+
+T = TypeVar("T")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Timeout and retry settings of a provider.
+
+    Retries use exponential backoff with full jitter, so that many workers failing at
+    once do not retry in lockstep. When the backend says how long to wait (429 with
+    Retry-After / retry_delay) that wait is honoured instead.
+    """
+    timeout: Optional[float] = 120.0  # Per call, and per chunk when streaming
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    max_retry_after: float = 120.0  # Longer requested waits fail instead of blocking the game
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """
+        Reads PROVIDER_TIMEOUT (0 disables it), PROVIDER_MAX_ATTEMPTS and PROVIDER_RETRY_BASE_DELAY.
+        """
+        timeout = _env_float("PROVIDER_TIMEOUT", 120.0)
+        return cls(
+            timeout=timeout or None,
+            max_attempts=max(1, int(_env_float("PROVIDER_MAX_ATTEMPTS", 3))),
+            base_delay=_env_float("PROVIDER_RETRY_BASE_DELAY", 0.5),
+        )
+
+    def delay(self, attempt: int, error: ProviderError) -> Optional[float]:
+        """
+        Seconds to wait before retry number `attempt` (1-based), or None to give up.
+        """
+        if not error.retryable or attempt >= self.max_attempts:
+            return None
+        if error.retry_after is not None:
+            if error.retry_after > self.max_retry_after:
+                return None
+            return error.retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `failure_threshold` consecutive connection failures or timeouts the circuit
+    opens and calls fail immediately with CircuitOpenError. Every `reset_timeout`
+    seconds one probe call is let through (half-open): success closes the circuit,
+    another failure keeps it open.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError unless the call may go ahead.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open for {self.host} after {self._failures} consecutive failures")
+            # Half-open: this call is the probe. Re-arming the timer keeps other calls out
+            # until it reports, or until the next probe if it never does (e.g. cancelled)
+            self._opened_at = now
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info(f"Circuit closed for {self.host}")
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self, error: ProviderError):
+        """
+        Counts the failure if it says something about the host's health (unreachable or too slow).
+        """
+        if not isinstance(error, (ProviderUnavailableError, ProviderTimeoutError)):
+            return
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(f"Circuit opened for {self.host} after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """
+    Returns the process-wide circuit breaker of a host.
+    Thresholds come from CIRCUIT_FAILURE_THRESHOLD and CIRCUIT_RESET_TIMEOUT.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, int(_env_float("CIRCUIT_FAILURE_THRESHOLD", 5)),
+                                     _env_float("CIRCUIT_RESET_TIMEOUT", 30.0))
+            _breakers[host] = breaker
+        return breaker
+
+
+@dataclass
+class Resilience:
+    """
+    Wraps the backend calls of one provider with its host's breaker, the timeout and the
+    retry policy, and turns backend exceptions into typed ProviderErrors.
+    """
+    provider: str
+    model: str
+    host: str
+    policy: RetryPolicy = field(default_factory=RetryPolicy.from_env)
+
+    def __post_init__(self):
+        self.breaker = get_breaker(self.host)
+
+    def _error(self, exc: BaseException) -> ProviderError:
+        error = classify(exc, self.provider, self.model)
+        error.provider, error.model = self.provider, self.model
+        return error
+
+    def _admit(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            e.provider, e.model = self.provider, self.model
+            raise
+
+    def _failed(self, exc: BaseException, attempt: int) -> Tuple[ProviderError, Optional[float]]:
+        """
+        Records a failed attempt. Returns the typed error and the wait before the next
+        attempt, or None when the error must be raised.
+        """
+        error = self._error(exc)
+        self.breaker.record_failure(error)
+        delay = self.policy.delay(attempt, error)
+        if delay is None:
+            logging.error(f"{self.provider}({self.model}) failed after {attempt} attempt(s): {error}")
+        else:
+            logging.warning(f"{self.provider}({self.model}) attempt {attempt}/{self.policy.max_attempts} failed: "
+                            f"{error}. Retrying in {delay:.1f}s")
+        return error, delay
+
+    def call(self, func: Callable[[], T]) -> T:
+        """
+        Runs a blocking call with retries. The timeout must be enforced by the client itself.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            try:
+                result = func()
+            except Exception as e:
+                error, delay = self._failed(e, attempt)
+                if delay is None:
+                    raise error from e
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaits a call with the timeout and retries.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            try:
+                result = await asyncio.wait_for(func(), self.policy.timeout)
+            except Exception as e:
+                error, delay = self._failed(e, attempt)
+                if delay is None:
+                    raise error from e
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    # Streams are retried only until their first chunk: once text has been handed to the
+    # caller the call can no longer be repeated transparently, so later failures are raised.
+
+    def open_stream(self, func: Callable[[], Iterable[Any]]) -> Tuple[Any, Iterator[Any]]:
+        """
+        Opens a blocking stream and reads its first chunk (None if empty), with retries.
+        """
+        def first_chunk():
+            stream = iter(func())
+            try:
+                return next(stream, None), stream
+            except BaseException:
+                if hasattr(stream, "close"):
+                    stream.close()
+                raise
+        return self.call(first_chunk)
+
+    def iterate(self, stream: Iterator[Any]) -> Iterator[Any]:
+        """
+        The remaining chunks of a stream opened with open_stream, with typed errors.
+        """
+        try:
+            yield from stream
+        except Exception as e:
+            error = self._error(e)
+            self.breaker.record_failure(error)
+            raise error from e
+
+    async def aopen_stream(self, func: Callable[[], Awaitable[AsyncIterable[Any]]]) -> Tuple[Any, AsyncIterator[Any]]:
+        """
+        Opens an async stream and waits for its first chunk (None if empty), with the timeout and retries.
+        """
+        async def first_chunk():
+            stream = aiter(await func())
+            try:
+                return await anext(stream, None), stream
+            except BaseException:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+                raise
+        return await self.acall(first_chunk)
+
+    async def aiterate(self, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        The remaining chunks of a stream opened with aopen_stream. The timeout bounds the
+        wait for each chunk, so a server that stalls mid-answer is detected too.
+        """
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(stream), self.policy.timeout)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                error = self._error(e)
+                self.breaker.record_failure(error)
+                raise error from e
+            yield chunk
@@ -0,0 +1,170 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Iterable, List, Optional, Sequence, TypeVar
+from ..metrics.registry import Histogram
+from .resilience import get_breaker
+
+T = TypeVar("T")
+
+# Samples a host needs before its p95 is trusted as a hedging delay
+MIN_HEDGE_SAMPLES = 20
+EWMA_ALPHA = 0.2
+# A failed host is avoided for 2**consecutive_failures seconds, up to this long
+MAX_FAILURE_BACKOFF = 60.0
+
+
+def parse_hosts(value: str) -> List[str]:
+    """
+    Splits a comma-separated host list (e.g. OLLAMA_BASE_URL), dropping blanks and duplicates.
+    """
+    return list(dict.fromkeys(h.strip().rstrip("/") for h in value.split(",") if h.strip()))
+
+
+class HostStats:
+    """
+    Live load and latency of one host: calls in flight, an exponentially weighted
+    moving average of the call latency, a histogram for its p95 and recent failures.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.ewma: Optional[float] = None
+        self.latency = Histogram(window=512)
+        self.failures = 0
+        self.avoid_until = 0.0
+
+    def score(self) -> float:
+        """
+        Expected wait for a new call: the typical latency scaled by the queue ahead of it.
+        Hosts without samples score 0 so that they get tried; hosts that just failed
+        score infinity until their backoff expires.
+        """
+        if self.failures and time.monotonic() < self.avoid_until:
+            return float("inf")
+        return (self.ewma or 0.0) * (self.in_flight + 1)
+
+    def p95(self) -> Optional[float]:
+        if self.latency.count < MIN_HEDGE_SAMPLES:
+            return None
+        return self.latency.quantiles()[0.95]
+
+
+class HostRouter:
+    """
+    Chooses which of several equivalent hosts serves each call.
+
+    Calls go to the host with the lowest score (see HostStats.score), skipping hosts
+    whose circuit breaker is open. With hedging enabled, a call that has not answered
+    within its host's p95 latency is duplicated on the next best host; the first
+    answer wins and the other call is cancelled.
+    """
+
+    def __init__(self, hosts: Sequence[str], hedge: bool = False):
+        if not hosts:
+            raise ValueError("At least one host is required")
+        self.hosts = {url: HostStats(url) for url in hosts}
+        self.hedge = hedge and len(hosts) > 1
+        self._lock = threading.Lock()
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        The best host not in `exclude`, or None if there is none left. When every
+        circuit is open the least loaded host is returned anyway, so that the call
+        fails fast with CircuitOpenError instead of having nowhere to go.
+        """
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [s for url, s in self.hosts.items() if url not in excluded]
+        if not candidates:
+            return None
+        healthy = [s for s in candidates if not get_breaker(s.url).is_open] or candidates
+        return min(healthy, key=HostStats.score).url
+
+    def started(self, url: str):
+        with self._lock:
+            self.hosts[url].in_flight += 1
+
+    def observe(self, url: str, latency: float):
+        """
+        Records the latency of a successful call (time to first chunk for streams).
+        """
+        with self._lock:
+            stats = self.hosts[url]
+            stats.failures = 0
+            stats.ewma = latency if stats.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats.ewma
+            stats.latency.observe(latency)
+
+    def failed(self, url: str):
+        """
+        Records a failed call; the host is avoided for a while if others are available.
+        """
+        with self._lock:
+            stats = self.hosts[url]
+            stats.failures += 1
+            stats.avoid_until = time.monotonic() + min(MAX_FAILURE_BACKOFF, 2.0 ** stats.failures)
+
+    def finished(self, url: str):
+        with self._lock:
+            self.hosts[url].in_flight -= 1
+
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """
+        How long to wait for `url` before hedging, or None to not hedge.
+        """
+        if not self.hedge:
+            return None
+        with self._lock:
+            return self.hosts[url].p95()
+
+    async def race(self, call: Callable[[str], Awaitable[T]], tried: List[str],
+                   discard: Optional[Callable[[T], Awaitable[None]]] = None) -> T:
+        """
+        Runs `call(host)` on the best host not yet in `tried` and, if it is slower than its
+        p95, also on the next best one. Returns the first successful result and cancels
+        the other attempt; raises the first error only if every attempt failed.
+
+        The hosts used are appended to `tried`. `discard` releases a second result that
+        completed at the same time as the winner (e.g. closes its stream).
+        """
+        primary = self.pick(exclude=tried)
+        tried.append(primary)
+        tasks = [asyncio.ensure_future(call(primary))]
+        winner: List[T] = []
+        try:
+            delay = self.hedge_delay(primary)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                secondary = None if done else self.pick(exclude=tried)
+                if secondary is not None:
+                    logging.debug(f"Hedging call to {primary} on {secondary} after {delay:.2f}s")
+                    tried.append(secondary)
+                    tasks.append(asyncio.ensure_future(call(secondary)))
+
+            first_error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending and not winner:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task not in done:
+                        continue
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                    elif not winner:
+                        winner.append(task.result())
+            if winner:
+                return winner[0]
+            raise first_error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+            # A loser may have succeeded before it could be cancelled
+            if discard is not None:
+                for task in tasks:
+                    if not task.cancelled() and task.exception() is None and (not winner or task.result() is not winner[0]):
+                        await discard(task.result())
@@ -0,0 +1,86 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .base import BaseProvider
+
+
+class ChatSession:
+    """
+    Stateful conversation with a provider.
+
+    The system prompt is sent as a fixed prefix and, when keep_history is enabled,
+    previous turns are kept as chat messages. Callers only pass the new message of
+    each turn, and since the prefix never changes the backend can reuse its prompt
+    cache instead of re-evaluating the whole transcript.
+    """
+
+    def __init__(self, provider: "BaseProvider", system_prompt: Optional[str] = None, keep_history: bool = True):
+        """
+        Initializes the session.
+
+        Args:
+            provider (BaseProvider): The provider that answers the turns.
+            system_prompt (Optional[str]): Fixed instructions sent before every turn.
+            keep_history (bool): Whether previous turns are sent back as context.
+                When False every turn only sees the system prompt and the new message.
+        """
+        self.provider = provider
+        self.system_prompt = system_prompt
+        self.keep_history = keep_history
+        self.history: List[Dict[str, str]] = []
+
+    def prepare(self, prompt: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Returns the (prompt, kwargs) pair to pass to the provider for a new turn.
+
+        Providers without native chat support receive a single flattened prompt.
+        """
+        if getattr(self.provider, "supports_chat", False):
+            return prompt, {"system": self.system_prompt, "history": list(self.history)}
+
+        parts = [self.system_prompt] if self.system_prompt else []
+        for message in self.history:
+            parts.append(f"{message['role'].upper()}: {message['content']}")
+        parts.append(prompt)
+        return "\n\n".join(parts), {}
+
+    def record(self, prompt: str, reply: str):
+        """
+        Stores a completed turn in the history.
+        """
+        if self.keep_history:
+            self.history.append({"role": "user", "content": prompt})
+            self.history.append({"role": "assistant", "content": reply})
+
+    def undo(self):
+        """
+        Removes the last recorded turn (e.g. a reply that was discarded).
+        """
+        if self.keep_history:
+            del self.history[-2:]
+
+    def send(self, prompt: str) -> str:
+        """
+        Sends a new message and records the reply.
+        """
+        full_prompt, kwargs = self.prepare(prompt)
+        reply = self.provider.generate_response(full_prompt, **kwargs)
+        self.record(prompt, reply)
+        return reply
+
+    async def asend(self, prompt: str) -> str:
+        """
+        Asynchronous counterpart of send.
+        """
+        full_prompt, kwargs = self.prepare(prompt)
+        reply = await self.provider.agenerate_response(full_prompt, **kwargs)
+        self.record(prompt, reply)
+        return reply
+
+    def fork(self) -> "ChatSession":
+        """
+        Returns an independent copy of the session (same prefix, copied history).
+        """
+        clone = ChatSession(self.provider, self.system_prompt, self.keep_history)
+        clone.history = list(self.history)
+        return clone
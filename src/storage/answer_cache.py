@@ -0,0 +1,147 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from ..game.rules import normalize_question
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def answer_key(model: str, solution: str, question: str) -> str:
+    """
+    Cache key of a Story Master answer: the answer only depends on the model, the secret
+    solution and the question, so near-identical questions ("¿Murió de forma violenta?",
+    "murio de forma VIOLENTA") share an entry.
+    """
+    raw = "\x1f".join((model, " ".join(solution.split()), normalize_question(question)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of Story Master answers, with an optional SQLite tier.
+
+    The in-memory tier holds up to `max_entries` answers. With a `path`, every answer
+    is also written to a SQLite database (WAL mode, so several processes of a tournament
+    can share it) and a memory miss falls back to it, promoting the entry on a hit.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries (int): Entries kept in memory before the least recently used is evicted.
+            path (Optional[str]): SQLite file of the on-disk tier, or None for memory only.
+        """
+        self.max_entries = max(1, max_entries)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = self._open(path)
+
+    @staticmethod
+    def _open(path: str) -> Optional[sqlite3.Connection]:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)")
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            logging.error(f"Answer cache database {path} unavailable, using memory only: {e}")
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached answer for `key`, or None (counting the hit or miss).
+        """
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                answer = self._load(key)
+                if answer is not None:
+                    self._remember(key, answer)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, key: str, answer: str):
+        """
+        Stores an answer in memory and, if configured, on disk.
+        """
+        with self._lock:
+            self._remember(key, answer)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO answers (key, answer, created) VALUES (?, ?, ?)",
+                                     (key, answer, time.time()))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not persist cached answer: {e}")
+
+    def _remember(self, key: str, answer: str):
+        self._entries[key] = answer
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[str]:
+        try:
+            row = self._db.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not read cached answer: {e}")
+            return None
+        return row[0] if row else None
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """
+        Fraction of lookups answered from the cache, or None before the first lookup.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        """
+        Closes the on-disk tier; the in-memory entries stay usable.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_caches: Dict[Tuple[Optional[str], int], AnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> AnswerCache:
+    """
+    Returns the process-wide cache for `path` (None for memory only), so that the games
+    of a session or of a tournament worker share their answers.
+    """
+    key = (os.path.abspath(path) if path else None, max_entries)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = AnswerCache(max_entries, key[0])
+        return _caches[key]
@@ -0,0 +1,410 @@
+import os
+import gzip
+import json
+import struct
+import logging
+from dataclasses import fields
+from datetime import datetime, timedelta
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+from .models import Conversation, Message
+from .database import conversation_files, read_conversation
+from .journal import JOURNAL_EXTENSION
+from .saver import ConversationSaver
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional: archives default to gzip
+    zstandard = None
+
+ARCHIVE_EXTENSION = "bsa"
+ARCHIVE_VERSION = 1
+CODECS = ("gzip", "zstd")
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 9}
+
+# File layout: header | frame per game ... | index frame | footer
+#   header: MAGIC + codec id (1 byte)
+#   frame:  one compressed, self-contained JSON record (so a game can be read alone)
+#   index:  compressed JSON {"version", "strings", "games": [[game_id, offset, length], ...]}
+#   footer: index offset, index length, FOOTER_MAGIC
+# Appending adds frames, a new index and a new footer after the previous footer, so the
+# latest complete footer (see _find_footers) always describes every game.
+MAGIC = b"BSARCH\x00\n"
+FOOTER_MAGIC = b"BSAINDEX"
+_HEADER = struct.Struct("<8sB")
+_FOOTER = struct.Struct("<QQ8s")
+_SCAN_CHUNK = 1 << 20
+
+# Message fields stored as an index into the archive's string table
+_INTERNED = ("model_name", "provider", "role")
+_MESSAGE_FIELDS = [f.name for f in fields(Message)]
+
+
+def _codec_available(codec: str) -> bool:
+    return codec == "gzip" or (codec == "zstd" and zstandard is not None)
+
+
+def _compress(codec: str, data: bytes, level: int) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _StringTable:
+    """
+    Interned strings of an archive (model names, providers, roles): each is stored once
+    in the index and referenced by position from every game.
+    """
+
+    def __init__(self, strings: Optional[List[str]] = None):
+        self.strings: List[str] = list(strings or [])
+        self._ids = {s: i for i, s in enumerate(self.strings)}
+
+    def intern(self, value: str) -> int:
+        if value not in self._ids:
+            self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return self._ids[value]
+
+
+def encode_conversation(conversation: Conversation, strings: _StringTable) -> Dict[str, Any]:
+    """
+    Compact record of a game: interned strings, messages as positional rows and
+    timestamps as seconds since the start of the game.
+    """
+    start = conversation.start_time
+    messages = []
+    for message in conversation.messages:
+        row = []
+        for name in _MESSAGE_FIELDS:
+            value = getattr(message, name)
+            if name in _INTERNED:
+                value = strings.intern(value)
+            elif name == "timestamp":
+                value = round((value - start).total_seconds(), 6)
+            row.append(value)
+        messages.append(row)
+    return {
+        "id": conversation.game_id,
+        "models": [strings.intern(conversation.model1_name), strings.intern(conversation.model1_provider),
+                   strings.intern(conversation.model2_name), strings.intern(conversation.model2_provider)],
+        "start": start.isoformat(),
+        "max_questions": conversation.max_questions,
+        "questions_used": conversation.questions_used,
+        "result": conversation.result,
+        "tokens": [conversation.prompt_tokens, conversation.completion_tokens],
+        "solution": conversation.full_solution,
+        "stats": conversation.stats,
+        "fields": _MESSAGE_FIELDS,
+        "messages": messages,
+    }
+
+
+def decode_conversation(record: Dict[str, Any], strings: List[str]) -> Conversation:
+    """
+    Rebuilds the Conversation of a record written by encode_conversation.
+    """
+    model1, provider1, model2, provider2 = (strings[i] for i in record["models"])
+    start = datetime.fromisoformat(record["start"])
+    conversation = Conversation(model1_name=model1, model1_provider=provider1, model2_name=model2,
+                                model2_provider=provider2, max_questions=record["max_questions"],
+                                full_solution=record.get("solution", ""), start_time=start,
+                                game_id=record.get("id", ""))
+    conversation.questions_used = record.get("questions_used", 0)
+    conversation.result = record.get("result")
+    conversation.prompt_tokens, conversation.completion_tokens = record.get("tokens", (0, 0))
+    conversation.stats = record.get("stats") or {}
+    # Field names are stored per record so that archives survive new Message fields
+    names = record.get("fields", _MESSAGE_FIELDS)
+    for row in record["messages"]:
+        data = {}
+        for name, value in zip(names, row):
+            if name not in _MESSAGE_FIELDS:
+                continue
+            if name in _INTERNED:
+                value = strings[value]
+            elif name == "timestamp":
+                value = start + timedelta(seconds=value)
+            data[name] = value
+        conversation.messages.append(Message(**data))
+    return conversation
+
+
+def _read_footer(f: IO[bytes], end: int) -> Optional[Tuple[int, int]]:
+    """
+    The (index offset, index length) of a footer ending at `end`, or None if there is
+    no valid footer there (the index must end right where the footer starts).
+    """
+    if end < _HEADER.size + _FOOTER.size:
+        return None
+    f.seek(end - _FOOTER.size)
+    offset, length, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+    if magic != FOOTER_MAGIC or offset < _HEADER.size or offset + length != end - _FOOTER.size:
+        return None
+    return offset, length
+
+
+def _find_footers(f: IO[bytes]) -> Iterator[Tuple[int, int]]:
+    """
+    Yields the footers of an archive, last first. Normally the last one is at the end
+    of the file; if an append was interrupted before close(), the end holds orphan
+    frames and the archive is still readable through the footer written before them.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    footer = _read_footer(f, size)
+    if footer is not None:
+        yield footer
+    # Scan backwards for earlier footers, in chunks that overlap by the magic's length
+    position = size
+    while position > _HEADER.size:
+        start = max(_HEADER.size, position - _SCAN_CHUNK)
+        f.seek(start)
+        chunk = f.read(position - start + len(FOOTER_MAGIC) - 1)
+        found = chunk.rfind(FOOTER_MAGIC)
+        while found != -1:
+            end = start + found + len(FOOTER_MAGIC)
+            footer = _read_footer(f, end) if end < size else None
+            if footer is not None:
+                yield footer
+            found = chunk.rfind(FOOTER_MAGIC, 0, found + len(FOOTER_MAGIC) - 1)
+        position = start
+
+
+def _read_index(f: IO[bytes], path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Reads the header and the latest complete index of an archive: (codec, index).
+
+    Raises:
+        ValueError: If the file is not an archive or has no complete index.
+    """
+    f.seek(0)
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a conversation archive")
+    codec_id = _HEADER.unpack(header)[1]
+    codec = CODECS[codec_id] if codec_id < len(CODECS) else None
+    if codec is None or not _codec_available(codec):
+        raise ValueError(f"Archive {path} uses an unavailable codec ({codec or 'unknown'}); install 'zstandard'")
+    size = f.seek(0, os.SEEK_END)
+    for offset, length in _find_footers(f):
+        f.seek(offset)
+        try:
+            index = json.loads(_decompress(codec, f.read(length)))
+        except (OSError, EOFError, ValueError) as e:  # A corrupt index: try the previous one
+            logging.warning(f"Skipping corrupt index of archive {path}: {e}")
+            continue
+        if offset + length + _FOOTER.size != size:
+            logging.warning(f"Archive {path} has games written after its last index (an append was interrupted); "
+                            "they are ignored")
+        return codec, index
+    raise ValueError(f"Archive {path} has no index (it was not closed)")
+
+
+class ArchiveWriter:
+    """
+    Packs many games into one archive file.
+
+    Every game is compressed on its own (gzip, or zstd if the 'zstandard' package is
+    installed) so a reader can seek to it and decompress only that game; the offset
+    index and the interned string table are written at the end on close(). Opening an
+    existing archive appends to it: its index is read back and a new one is written
+    after the new games, leaving the old one in place until then. A game added twice
+    (same game_id) keeps its last version.
+    """
+
+    def __init__(self, path: str, codec: str = "gzip", level: Optional[int] = None):
+        """
+        Args:
+            path (str): Archive file; created if missing, appended to otherwise.
+            codec (str): 'gzip' or 'zstd' for new archives (existing ones keep theirs).
+            level (Optional[int]): Compression level (default: DEFAULT_LEVELS[codec]).
+
+        Raises:
+            ValueError: If the codec is unknown or unavailable, or `path` is not an archive.
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown archive codec: {codec}")
+        self.path = path
+        self._games: Dict[str, Tuple[int, int]] = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            try:
+                self.codec, index = _read_index(self._file, path)
+            except ValueError:
+                self._file.close()
+                raise
+            self._strings = _StringTable(index["strings"])
+            self._games = {game_id: (start, length) for game_id, start, length in index["games"]}
+            # The old index and footer stay in place until close() writes the new ones after
+            # the new games, so an append that dies half way leaves the archive readable
+            self._file.seek(0, os.SEEK_END)
+        else:
+            if not _codec_available(codec):
+                raise ValueError("The zstd codec needs the 'zstandard' package")
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.codec = codec
+            self._strings = _StringTable()
+            self._file = open(path, 'wb')
+            self._file.write(_HEADER.pack(MAGIC, CODECS.index(codec)))
+        self.level = level if level is not None else DEFAULT_LEVELS[self.codec]
+
+    def add(self, conversation: Conversation):
+        """
+        Appends one game. Games without a game_id get one from their start time.
+        """
+        if not conversation.game_id:
+            conversation.game_id = conversation.start_time.strftime("%Y%m%d_%H%M%S")
+        frame = _compress(self.codec, _dumps(encode_conversation(conversation, self._strings)), self.level)
+        self._games[conversation.game_id] = (self._file.tell(), len(frame))
+        self._file.write(frame)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def add_many(self, conversations: Iterable[Conversation]) -> int:
+        count = 0
+        for conversation in conversations:
+            self.add(conversation)
+            count += 1
+        return count
+
+    def close(self):
+        """
+        Writes the index and the footer. Until then the archive cannot be read.
+        """
+        if self._file.closed:
+            return
+        index = {"version": ARCHIVE_VERSION, "strings": self._strings.strings,
+                 "games": [[game_id, offset, length] for game_id, (offset, length) in self._games.items()]}
+        frame = _compress(self.codec, _dumps(index), self.level)
+        offset = self._file.tell()
+        self._file.write(frame)
+        self._file.write(_FOOTER.pack(offset, len(frame), FOOTER_MAGIC))
+        self._file.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Reads an archive written by ArchiveWriter. Opening it only reads the index; load()
+    seeks to and decompresses a single game, and iterating decompresses one game at a
+    time, in the order they were written.
+    """
+
+    def __init__(self, path: str):
+        """
+        Raises:
+            ValueError: If `path` is not a complete archive or its codec is unavailable.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self.codec, index = _read_index(self._file, path)
+        except ValueError:
+            self._file.close()
+            raise
+        self._strings: List[str] = index["strings"]
+        self._games: Dict[str, Tuple[int, int]] = {game_id: (offset, length)
+                                                   for game_id, offset, length in index["games"]}
+
+    def game_ids(self) -> List[str]:
+        return list(self._games)
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def load(self, game_id: str) -> Conversation:
+        """
+        Loads one game.
+
+        Raises:
+            KeyError: If the archive does not contain `game_id`.
+        """
+        offset, length = self._games[game_id]
+        self._file.seek(offset)
+        record = json.loads(_decompress(self.codec, self._file.read(length)))
+        return decode_conversation(record, self._strings)
+
+    def __iter__(self) -> Iterator[Conversation]:
+        for game_id, _ in sorted(self._games.items(), key=lambda item: item[1][0]):
+            yield self.load(game_id)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# When a game is saved in several formats, the most complete one is archived
+_PREFERENCE = (JOURNAL_EXTENSION, "json", "txt", "md")
+
+
+def pack(paths: Iterable[str], archive_path: str, codec: str = "gzip") -> Tuple[int, int]:
+    """
+    Packs saved games (md, json, txt, .jsonl journals, or folders containing them) into
+    an archive, appending to it if it exists. A game saved in several formats is taken
+    from the most complete one (journal, then json, txt, md); games already in the
+    archive and files that are not games are skipped.
+
+    Returns:
+        Tuple[int, int]: (games archived, files skipped).
+    """
+    files = sorted(conversation_files(paths, _PREFERENCE),
+                   key=lambda path: (os.path.splitext(path)[0], _PREFERENCE.index(path.rsplit(".", 1)[-1])))
+    archived = skipped = 0
+    with ArchiveWriter(archive_path, codec) as writer:
+        for path in files:
+            try:
+                conversation = read_conversation(path)
+            except (OSError, ValueError) as e:
+                logging.debug(f"Skipping {path}: {e}")
+                skipped += 1
+                continue
+            if conversation.game_id in writer:
+                skipped += 1
+                continue
+            writer.add(conversation)
+            archived += 1
+    return archived, skipped
+
+
+def unpack(archive_path: str, output_dir: str, file_format: str, game_ids: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Writes games of an archive (all, or `game_ids`) as md, json or txt files.
+
+    Returns:
+        List[str]: The paths written.
+    """
+    saver = ConversationSaver(output_dir)
+    written = []
+    with ArchiveReader(archive_path) as reader:
+        games = (reader.load(game_id) for game_id in game_ids) if game_ids else iter(reader)
+        for conversation in games:
+            path = saver.save(conversation, file_format)
+            if path:
+                written.append(path)
+    return written
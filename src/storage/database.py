@@ -0,0 +1,294 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .models import Conversation
+from .journal import JOURNAL_EXTENSION, load_conversation
+from .formats.json import JsonFormatter
+from .formats.markdown import MarkdownFormatter
+from .formats.txt import TxtFormatter
+from .ratings import RatingEngine
+
+DEFAULT_DB_FILE = "blackstory.db"
+# Games per transaction when importing or saving in bulk
+BATCH_SIZE = 500
+
+# Outcome of a game for the detective; the Story Master "wins" when the detective loses
+WIN_RESULT = "Victoria"
+ROLES = ("detective", "master")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    model1_name TEXT NOT NULL,
+    model1_provider TEXT NOT NULL,
+    model2_name TEXT NOT NULL,
+    model2_provider TEXT NOT NULL,
+    result TEXT,
+    questions_used INTEGER NOT NULL,
+    max_questions INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    duration REAL,
+    full_solution TEXT,
+    stats TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    game_id TEXT NOT NULL REFERENCES games(game_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    model_name TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT,
+    response_time REAL,
+    time_to_first_token REAL,
+    tokens INTEGER,
+    tokens_saved INTEGER,
+    prompt_tokens INTEGER,
+    eval_duration REAL,
+    load_duration REAL,
+    PRIMARY KEY (game_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_games_master ON games(model1_name, date);
+CREATE INDEX IF NOT EXISTS idx_games_detective ON games(model2_name, date);
+CREATE INDEX IF NOT EXISTS idx_games_result ON games(result);
+CREATE INDEX IF NOT EXISTS idx_games_date ON games(date);
+CREATE INDEX IF NOT EXISTS idx_games_questions ON games(questions_used);
+"""
+
+_MESSAGE_COLUMNS = ("model_name", "provider", "role", "content", "timestamp", "response_time", "time_to_first_token",
+                    "tokens", "tokens_saved", "prompt_tokens", "eval_duration", "load_duration")
+
+
+def _duration(conversation: Conversation) -> Optional[float]:
+    if not conversation.messages:
+        return None
+    return max(0.0, (conversation.messages[-1].timestamp - conversation.start_time).total_seconds())
+
+
+def _game_row(conversation: Conversation) -> Tuple:
+    game_id = conversation.game_id or conversation.start_time.strftime("%Y%m%d_%H%M%S")
+    return (game_id, conversation.start_time.isoformat(timespec="seconds"), conversation.model1_name,
+            conversation.model1_provider, conversation.model2_name, conversation.model2_provider, conversation.result,
+            conversation.questions_used, conversation.max_questions, conversation.prompt_tokens,
+            conversation.completion_tokens, _duration(conversation), conversation.full_solution,
+            json.dumps(conversation.stats, ensure_ascii=False))
+
+
+def _message_rows(game_id: str, conversation: Conversation) -> List[Tuple]:
+    rows = []
+    for seq, message in enumerate(conversation.messages):
+        data = asdict(message)
+        data["timestamp"] = message.timestamp.isoformat()
+        rows.append((game_id, seq) + tuple(data[c] for c in _MESSAGE_COLUMNS))
+    return rows
+
+
+class ConversationStore:
+    """
+    SQLite store of finished games, their messages and per-turn metrics.
+
+    The database runs in WAL mode so that tournament workers can write while other
+    processes query it. Games are indexed by model (per role and date), result, date
+    and questions used, so aggregate queries over tens of thousands of games stay in
+    the milliseconds. Each new finished game also updates the Elo leaderboard (see
+    RatingEngine) in the same transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        self.ratings = RatingEngine(self._db)
+        self._lock = threading.Lock()
+
+    def save(self, conversation: Conversation):
+        """
+        Stores (or replaces) one game with all its messages in a single transaction.
+        """
+        self.save_many([conversation])
+
+    def save_many(self, conversations: Iterable[Conversation]) -> int:
+        """
+        Stores games in batches of BATCH_SIZE per transaction. Returns how many were stored.
+        """
+        count = 0
+        batch: List[Conversation] = []
+        for conversation in conversations:
+            batch.append(conversation)
+            if len(batch) >= BATCH_SIZE:
+                count += self._write(batch)
+                batch = []
+        if batch:
+            count += self._write(batch)
+        return count
+
+    def _write(self, conversations: List[Conversation]) -> int:
+        # The same game twice in one batch (its journal and its JSON file) is stored once: the last one wins
+        latest = {_game_row(c)[0]: c for c in conversations}
+        games = [_game_row(c) for c in latest.values()]
+        messages = [row for game, c in zip(games, latest.values()) for row in _message_rows(game[0], c)]
+        placeholders = ", ".join("?" * (2 + len(_MESSAGE_COLUMNS)))
+        with self._lock, self._db:
+            # A game saved again (e.g. resumed after an error) replaces its previous version
+            self._db.executemany("DELETE FROM messages WHERE game_id = ?", [(g[0],) for g in games])
+            self._db.executemany(f"INSERT OR REPLACE INTO games VALUES ({', '.join('?' * len(games[0]))})", games)
+            self._db.executemany(
+                f"INSERT INTO messages (game_id, seq, {', '.join(_MESSAGE_COLUMNS)}) VALUES ({placeholders})", messages)
+            self.ratings.record_many(zip((g[0] for g in games), latest.values()))
+        return len(games)
+
+    def stats(self, role: Optional[str] = None, model: Optional[str] = None,
+              since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregates games per model and role: games played, wins, win rate, mean questions
+        used, mean tokens and mean duration.
+
+        Args:
+            role (Optional[str]): 'detective' or 'master'; both when None.
+            model (Optional[str]): Only this model.
+            since (Optional[datetime]): Only games started at or after this time.
+        """
+        if role is not None and role not in ROLES:
+            raise ValueError(f"Unknown role: {role}")
+        rows: List[Dict[str, Any]] = []
+        for current in (role,) if role else ROLES:
+            column = "model2_name" if current == "detective" else "model1_name"
+            # The master wins every game the detective does not solve (errors excluded)
+            win = "result = ?" if current == "detective" else "result IS NOT NULL AND result NOT IN (?, 'Error')"
+            conditions, params = [], [WIN_RESULT]
+            if model is not None:
+                conditions.append(f"{column} = ?")
+                params.append(model)
+            if since is not None:
+                conditions.append("date >= ?")
+                params.append(since.isoformat(timespec="seconds"))
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            query = (f"SELECT {column}, COUNT(*), SUM({win}), AVG(questions_used), "
+                     f"AVG(prompt_tokens + completion_tokens), AVG(duration) FROM games {where} GROUP BY {column}")
+            with self._lock:
+                result = self._db.execute(query, params).fetchall()
+            for name, games, wins, questions, tokens, duration in result:
+                rows.append({"model": name, "role": current, "games": games, "wins": wins or 0,
+                             "win_rate": (wins or 0) / games, "questions": questions or 0.0,
+                             "tokens": tokens or 0.0, "duration": duration})
+        return sorted(rows, key=lambda r: (-r["win_rate"], -r["games"]))
+
+    def leaderboard(self, role: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Elo leaderboard, best first (see RatingEngine.leaderboard).
+        """
+        if role is not None and role not in ROLES:
+            raise ValueError(f"Unknown role: {role}")
+        with self._lock:
+            return self.ratings.leaderboard(role, limit)
+
+    def pairings(self, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Stats per Story Master / detective pairing (see RatingEngine.pairings).
+        """
+        with self._lock:
+            return self.ratings.pairings(model)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def conversation_files(paths: Iterable[str], extensions: Tuple[str, ...] = ("json", JOURNAL_EXTENSION)) -> Iterator[str]:
+    """
+    The files given in `paths`, with folders replaced by the files with one of
+    `extensions` found in them (recursively, sorted by name).
+    """
+    suffixes = tuple(f".{e}" for e in extensions)
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(suffixes):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+# Formats that can be read back into a Conversation, by file extension
+PARSERS = {"json": JsonFormatter, "md": MarkdownFormatter, "txt": TxtFormatter}
+
+
+def read_conversation(path: str) -> Conversation:
+    """
+    Loads a saved game: a game journal (.jsonl) or a conversation saved as json, md or
+    txt (md and txt lose providers and per-message tokens). Files without a game_id get
+    the id from their file name.
+
+    Raises:
+        ValueError: If the file is not a saved game.
+        OSError: If it cannot be read.
+    """
+    if path.endswith(f".{JOURNAL_EXTENSION}"):
+        return load_conversation(path)
+    stem, extension = os.path.splitext(os.path.basename(path))
+    parser = PARSERS.get(extension[1:])
+    if parser is None:
+        raise ValueError(f"Unsupported file format: {extension}")
+    with open(path, 'r', encoding='utf-8') as f:
+        conversation = parser().parse(f.read())
+    if not conversation.game_id:
+        conversation.game_id = stem[len("blackstory_"):] if stem.startswith("blackstory_") else stem
+    return conversation
+
+
+def import_conversations(store: ConversationStore, paths: Iterable[str]) -> Tuple[int, int]:
+    """
+    Imports saved games (files, or folders searched recursively for .json and .jsonl files)
+    into the store, in batches. Files that are not games (e.g. story_pool.json) are skipped.
+    A game that has both a journal and a rendered JSON file is stored once, keyed by its game_id.
+
+    Returns:
+        Tuple[int, int]: (games imported, files skipped).
+    """
+    skipped = 0
+
+    def conversations() -> Iterator[Conversation]:
+        nonlocal skipped
+        for path in conversation_files(paths):
+            try:
+                yield read_conversation(path)
+            except (OSError, ValueError) as e:
+                logging.debug(f"Skipping {path}: {e}")
+                skipped += 1
+
+    imported = store.save_many(conversations())
+    return imported, skipped
+
+
+_stores: Dict[str, ConversationStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> ConversationStore:
+    """
+    Returns the process-wide store for `path`, so that every game of a session shares one connection.
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ConversationStore(key)
+            logging.info(f"Conversation store: {key}")
+        return _stores[key]
@@ -0,0 +1,21 @@
+from typing import Tuple
+
+# Prefijos con los que el orquestador escribe las intervenciones del moderador
+HINT_PREFIX = "💡 Moderador"
+WARNING_PREFIX = "⚠️ Moderador"
+
+
+def speaker_fields(speaker: str, content: str, model1_name: str, model2_name: str) -> Tuple[str, str, str]:
+    """
+    (model_name, provider, role) of a message read back from md or txt, as the
+    orchestrator builds them. `speaker` is "1", "2" or "moderator". Files written
+    before moderator messages had their own heading show them as Modelo 2: they are
+    recognised by their prefix.
+    """
+    if speaker == "moderator" or content.startswith((HINT_PREFIX, WARNING_PREFIX)):
+        if content.startswith(WARNING_PREFIX):
+            return "human_mod", "Human", "Moderator"
+        return "ai_hint", model1_name, "Moderator"
+    if speaker == "1":
+        return "model1", model1_name, "Story Master"
+    return "model2", model2_name, "Detective"
@@ -1,6 +1,9 @@
 import json
-from dataclasses import asdict
-from ...storage.models import Conversation
+from dataclasses import asdict, fields
+from datetime import datetime
+from ...storage.models import Conversation, Message
+
+_MESSAGE_FIELDS = {f.name for f in fields(Message)}
 
 class JsonFormatter:
     def format(self, conversation: Conversation) -> str:
@@ -17,14 +20,52 @@ class JsonFormatter:
         # Prepare the data structure
         data = {
             "metadata": {
+                "game_id": conversation.game_id,
                 "date": conversation.start_time,
                 "model1": {"name": conversation.model1_name, "provider": conversation.model1_provider, "role": "Story Master"},
                 "model2": {"name": conversation.model2_name, "provider": conversation.model2_provider, "role": "Detective"},
                 "result": conversation.result,
                 "questions_used": conversation.questions_used,
-                "max_questions": conversation.max_questions
+                "max_questions": conversation.max_questions,
+                "prompt_tokens": conversation.prompt_tokens,
+                "completion_tokens": conversation.completion_tokens,
+                "stats": conversation.stats
             },
             "messages": [asdict(msg) for msg in conversation.messages]
         }
         
         return json.dumps(data, cls=DateTimeEncoder, indent=2)
+
+    def parse(self, text: str) -> Conversation:
+        """
+        Rebuilds a Conversation from the output of format(). Files written before a field
+        existed (game_id, tokens, stats) get its default.
+
+        Raises:
+            ValueError: If the text is not a saved conversation.
+        """
+        data = json.loads(text)
+        try:
+            metadata = data["metadata"]
+            conversation = Conversation(
+                model1_name=metadata["model1"]["name"],
+                model1_provider=metadata["model1"]["provider"],
+                model2_name=metadata["model2"]["name"],
+                model2_provider=metadata["model2"]["provider"],
+                max_questions=metadata["max_questions"],
+                start_time=datetime.fromisoformat(metadata["date"]),
+                game_id=metadata.get("game_id") or ""
+            )
+            for raw in data["messages"]:
+                message = {k: v for k, v in raw.items() if k in _MESSAGE_FIELDS}
+                message["timestamp"] = datetime.fromisoformat(message["timestamp"])
+                conversation.add_message(Message(**message))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Not a saved conversation: missing {e}") from e
+        conversation.result = metadata.get("result")
+        conversation.questions_used = metadata.get("questions_used", 0)
+        conversation.stats = metadata.get("stats") or {}
+        if "prompt_tokens" in metadata:
+            conversation.prompt_tokens = metadata["prompt_tokens"]
+            conversation.completion_tokens = metadata.get("completion_tokens", 0)
+        return conversation
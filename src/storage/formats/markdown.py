@@ -1,4 +1,11 @@
-from ...storage.models import Conversation
+import re
+from datetime import datetime, timedelta
+from ...storage.models import Conversation, Message
+from . import speaker_fields
+
+_HEADING = re.compile(r"^## (?:🎭 Modelo (1)|🔍 Modelo (2)|🧑‍⚖️ (Moderador)) \[(\d\d:\d\d:\d\d)\](?: ⚡([\d.]+)s)?$", re.MULTILINE)
+_FIELD = re.compile(r"^\*\*(.+?):\*\* (.*)$", re.MULTILINE)
+_MODEL = re.compile(r"^(.*) \((?:Story Master|Detective)\)$")
 
 class MarkdownFormatter:
     def format(self, conversation: Conversation) -> str:
@@ -10,13 +17,59 @@ class MarkdownFormatter:
         content += f"**Modelo 1:** {conversation.model1_name} (Story Master)\n"
         content += f"**Modelo 2:** {conversation.model2_name} (Detective)\n"
         content += f"**Resultado:** {conversation.result}\n"
-        content += f"**Preguntas usadas:** {conversation.questions_used}/{conversation.max_questions}\n\n---\n\n"
+        content += f"**Preguntas usadas:** {conversation.questions_used}/{conversation.max_questions}\n"
+        content += f"**Tokens:** {conversation.prompt_tokens} prompt / {conversation.completion_tokens} respuesta\n\n---\n\n"
 
         for msg in conversation.messages:
+            # Los mensajes del moderador humano no tienen tiempo de respuesta
+            timing = f" ⚡{msg.response_time:.2f}s" if msg.response_time is not None else ""
             if msg.role == "Story Master":
-                content += f"## 🎭 Modelo 1 [{msg.timestamp.strftime('%H:%M:%S')}] ⚡{msg.response_time:.2f}s\n"
+                content += f"## 🎭 Modelo 1 [{msg.timestamp.strftime('%H:%M:%S')}]{timing}\n"
+            elif msg.role == "Moderator":
+                content += f"## 🧑‍⚖️ Moderador [{msg.timestamp.strftime('%H:%M:%S')}]{timing}\n"
             else:
-                content += f"## 🔍 Modelo 2 [{msg.timestamp.strftime('%H:%M:%S')}] ⚡{msg.response_time:.2f}s\n"
+                content += f"## 🔍 Modelo 2 [{msg.timestamp.strftime('%H:%M:%S')}]{timing}\n"
             content += f"{msg.content}\n\n"
         
         return content
+
+    def parse(self, text: str) -> Conversation:
+        """
+        Rebuilds a Conversation from the output of format(). Markdown keeps less than JSON:
+        providers, per-message tokens and the game id are lost, and timestamps only have
+        second precision.
+
+        Raises:
+            ValueError: If the text is not a saved conversation.
+        """
+        header, _, body = text.partition("\n---\n\n")
+        fields = dict(_FIELD.findall(header))
+        try:
+            start = datetime.strptime(fields["Fecha"], "%Y-%m-%d %H:%M:%S")
+            model1 = _MODEL.match(fields["Modelo 1"]).group(1)
+            model2 = _MODEL.match(fields["Modelo 2"]).group(1)
+            used, max_questions = (int(n) for n in fields["Preguntas usadas"].split("/"))
+        except (KeyError, AttributeError, ValueError) as e:
+            raise ValueError(f"Not a saved conversation: {e}") from e
+        conversation = Conversation(model1_name=model1, model1_provider="", model2_name=model2, model2_provider="",
+                                    max_questions=max_questions, start_time=start)
+        conversation.result = None if fields.get("Resultado") in (None, "None") else fields["Resultado"]
+        conversation.questions_used = used
+        if "Tokens" in fields:
+            prompt, completion = re.findall(r"\d+", fields["Tokens"])[:2]
+            conversation.prompt_tokens, conversation.completion_tokens = int(prompt), int(completion)
+
+        headings = list(_HEADING.finditer(body))
+        day, last = start.date(), start.time()
+        for i, heading in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(body)
+            clock = datetime.strptime(heading.group(4), "%H:%M:%S").time()
+            if clock < last:  # The game went past midnight
+                day += timedelta(days=1)
+            last = clock
+            text = body[heading.end() + 1:end].removesuffix("\n\n")
+            speaker = "moderator" if heading.group(3) else heading.group(1) or heading.group(2)
+            message = Message(*speaker_fields(speaker, text, model1, model2), text, timestamp=datetime.combine(day, clock),
+                              response_time=float(heading.group(5)) if heading.group(5) else None)
+            conversation.messages.append(message)
+        return conversation
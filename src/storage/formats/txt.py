@@ -1,4 +1,11 @@
-from ...storage.models import Conversation
+import re
+from datetime import datetime, timedelta
+from ...storage.models import Conversation, Message
+from . import speaker_fields
+
+_HEADING = re.compile(r"^\[(\d\d:\d\d:\d\d)\] (?:MODELO ([12])|(MODERADOR)) (?:\((.*)\))?:$", re.MULTILINE)
+_FIELD = re.compile(r"^(Fecha|Modelo 1|Modelo 2|Resultado|Preguntas|Tokens): (.*)$", re.MULTILINE)
+_MODEL = re.compile(r"^(.*) \((?:Story Master|Detective)\)$")
 
 class TxtFormatter:
     def format(self, conversation: Conversation) -> str:
@@ -10,19 +17,76 @@ class TxtFormatter:
         content += f"Modelo 1: {conversation.model1_name} (Story Master)\n"
         content += f"Modelo 2: {conversation.model2_name} (Detective)\n"
         content += f"Resultado: {conversation.result}\n"
-        content += f"Preguntas: {conversation.questions_used}/{conversation.max_questions}\n\n---\n\n"
+        content += f"Preguntas: {conversation.questions_used}/{conversation.max_questions}\n"
+        content += f"Tokens: {conversation.prompt_tokens} prompt / {conversation.completion_tokens} respuesta\n\n---\n\n"
 
         for msg in conversation.messages:
-            meta = f"({msg.response_time:.2f}s"
+            # Los mensajes del moderador humano no tienen tiempo de respuesta
+            parts = []
+            if msg.response_time is not None:
+                parts.append(f"{msg.response_time:.2f}s")
+            if msg.time_to_first_token:
+                parts.append(f"TTFT {msg.time_to_first_token:.2f}s")
             if msg.tokens:
-                meta += f", {msg.tokens} tokens"
-            meta += ")"
+                parts.append(f"{msg.tokens} tokens")
+            meta = f"({', '.join(parts)})" if parts else ""
             
             if msg.role == "Story Master":
                 content += f"[{msg.timestamp.strftime('%H:%M:%S')}] MODELO 1 {meta}:\n"
+            elif msg.role == "Moderator":
+                content += f"[{msg.timestamp.strftime('%H:%M:%S')}] MODERADOR {meta}:\n"
             else:
                 content += f"[{msg.timestamp.strftime('%H:%M:%S')}] MODELO 2 {meta}:\n"
             
             content += f"{msg.content}\n\n"
         
         return content
+
+    def parse(self, text: str) -> Conversation:
+        """
+        Rebuilds a Conversation from the output of format(). Plain text keeps less than JSON:
+        providers, the game id and the per-message prompt tokens are lost, and
+        timestamps only have second precision.
+
+        Raises:
+            ValueError: If the text is not a saved conversation.
+        """
+        header, _, body = text.partition("\n---\n\n")
+        fields = dict(_FIELD.findall(header))
+        try:
+            start = datetime.strptime(fields["Fecha"], "%Y-%m-%d %H:%M:%S")
+            model1 = _MODEL.match(fields["Modelo 1"]).group(1)
+            model2 = _MODEL.match(fields["Modelo 2"]).group(1)
+            used, max_questions = (int(n) for n in fields["Preguntas"].split("/"))
+        except (KeyError, AttributeError, ValueError) as e:
+            raise ValueError(f"Not a saved conversation: {e}") from e
+        conversation = Conversation(model1_name=model1, model1_provider="", model2_name=model2, model2_provider="",
+                                    max_questions=max_questions, start_time=start)
+        conversation.result = None if fields.get("Resultado") in (None, "None") else fields["Resultado"]
+        conversation.questions_used = used
+        if "Tokens" in fields:
+            prompt, completion = re.findall(r"\d+", fields["Tokens"])[:2]
+            conversation.prompt_tokens, conversation.completion_tokens = int(prompt), int(completion)
+
+        headings = list(_HEADING.finditer(body))
+        day, last = start.date(), start.time()
+        for i, heading in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(body)
+            clock = datetime.strptime(heading.group(1), "%H:%M:%S").time()
+            if clock < last:  # The game went past midnight
+                day += timedelta(days=1)
+            last = clock
+            meta = dict.fromkeys(("response_time", "time_to_first_token", "tokens"))
+            for part in (heading.group(4) or "").split(", "):
+                if part.startswith("TTFT "):
+                    meta["time_to_first_token"] = float(part[5:-1])
+                elif part.endswith(" tokens"):
+                    meta["tokens"] = int(part[:-7])
+                elif part.endswith("s"):
+                    meta["response_time"] = float(part[:-1])
+            text = body[heading.end() + 1:end].removesuffix("\n\n")
+            speaker = "moderator" if heading.group(3) else heading.group(2)
+            message = Message(*speaker_fields(speaker, text, model1, model2), text, timestamp=datetime.combine(day, clock),
+                              **meta)
+            conversation.messages.append(message)
+        return conversation
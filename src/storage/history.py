@@ -0,0 +1,90 @@
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from .models import Message
+
+EMPTY_HISTORY = "Aún no hay preguntas."
+SUMMARY_PREFIX = "- Resumen de lo anterior: "
+
+
+class HistoryBuffer:
+    """
+    Append-only, pre-rendered question/answer transcript of a game.
+
+    Each message is rendered once when it is added, so building a prompt reads the
+    transcript in O(1) instead of re-formatting every previous message. An optional
+    token budget marks when the oldest lines should be folded into a summary.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        """
+        Initializes an empty buffer.
+
+        Args:
+            token_budget (Optional[int]): Approximate size (in tokens) above which
+                the buffer reports that it should be compacted. None disables the cap.
+        """
+        self.token_budget = token_budget
+        self.lines: List[str] = []
+        self._text = ""
+        self._chars = 0
+
+    @staticmethod
+    def render_line(message: "Message") -> str:
+        """
+        Renders a message as a transcript line.
+        """
+        role = "Detective" if message.role == "Detective" else "Respuesta"
+        return f"- {role}: {message.content.strip()}"
+
+    def append(self, message: "Message"):
+        """
+        Renders and appends a message to the transcript.
+        """
+        line = self.render_line(message)
+        self.lines.append(line)
+        self._text = f"{self._text}\n{line}" if self._text else line
+        self._chars += len(line) + 1
+
+    @property
+    def text(self) -> str:
+        """
+        The rendered transcript, or a placeholder when it is still empty.
+        """
+        return self._text or EMPTY_HISTORY
+
+    @property
+    def token_estimate(self) -> int:
+        """
+        Approximate number of tokens of the transcript (~4 characters per token).
+        """
+        return self._chars // 4
+
+    def over_budget(self) -> bool:
+        """
+        Whether the transcript exceeds the configured token budget.
+        """
+        return self.token_budget is not None and self.token_estimate > self.token_budget
+
+    def compact(self, count: int, summary: str):
+        """
+        Replaces the oldest `count` lines with a single summary line.
+
+        Args:
+            count (int): Number of leading lines covered by the summary.
+            summary (str): Summary of those lines.
+        """
+        count = max(0, min(count, len(self.lines)))
+        summary_line = f"{SUMMARY_PREFIX}{' '.join(summary.split())}"
+        self.lines = [summary_line] + self.lines[count:]
+        self._text = "\n".join(self.lines)
+        self._chars = len(self._text) + 1
+
+    @property
+    def summary(self) -> Optional[str]:
+        """
+        The summary that replaced the oldest lines, or None if the buffer was never compacted.
+        """
+        if self.lines and self.lines[0].startswith(SUMMARY_PREFIX):
+            return self.lines[0][len(SUMMARY_PREFIX):]
+        return None
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+from .models import Conversation, Message
+
+JOURNAL_EXTENSION = "jsonl"
+# A journal is fsynced after this many records or this many seconds, whichever comes first
+DEFAULT_SYNC_EVERY = 32
+DEFAULT_SYNC_INTERVAL = 1.0
+
+_MESSAGE_FIELDS = {f.name for f in fields(Message)}
+
+
+def new_game_id() -> str:
+    """
+    A unique, sortable game id: the start time plus a random suffix, so that games
+    started within the same second (e.g. by tournament workers) never collide.
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def journal_path(output_dir: str, game_id: str) -> str:
+    return os.path.join(output_dir, f"blackstory_{game_id}.{JOURNAL_EXTENSION}")
+
+
+def _json_default(o: Any) -> Any:
+    if hasattr(o, 'isoformat'):
+        return o.isoformat()
+    if hasattr(o, 'name'):  # Enums (GameState, EventType)
+        return o.name
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class ConversationJournal:
+    """
+    Append-only JSON Lines journal of one game.
+
+    Every message and event is appended as one record as soon as it happens, so a crash
+    loses at most the records not yet fsynced, and other tools can follow a game live
+    (e.g. `tail -f`). Each record is flushed to the OS immediately; fsync is batched
+    every `sync_every` records or `sync_interval` seconds, and forced on close.
+
+    Record types ("type" field): "header" (models and limits), "solution", "message",
+    "event", "checkpoint" (state after a completed turn, see load_checkpoint), "resume"
+    (the game was resumed from its last checkpoint) and "end" (result, counters and token totals).
+    """
+
+    def __init__(self, path: str, sync_every: int = DEFAULT_SYNC_EVERY, sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.sync_interval = sync_interval
+        self._file: Optional[IO[str]] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def write(self, record_type: str, durable: bool = False, **data: Any):
+        """
+        Appends one record; with `durable` it is fsynced before returning.
+        Errors are logged, not raised: the game must go on.
+        """
+        record = {"type": record_type, "ts": time.time(), **data}
+        try:
+            line = json.dumps(record, default=_json_default, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logging.error(f"Could not serialize journal record {record_type}: {e}")
+            return
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line + "\n")
+                self._file.flush()
+                self._unsynced += 1
+                if durable or self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                    self._sync()
+            except OSError as e:
+                logging.error(f"Error writing journal {self.path}: {e}")
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def write_header(self, conversation: Conversation, game_id: str, **extra: Any):
+        self.write("header", game_id=game_id, model1_name=conversation.model1_name,
+                   model1_provider=conversation.model1_provider, model2_name=conversation.model2_name,
+                   model2_provider=conversation.model2_provider, max_questions=conversation.max_questions,
+                   start_time=conversation.start_time, **extra)
+
+    def write_message(self, message: Message):
+        self.write("message", **asdict(message))
+
+    def write_end(self, conversation: Conversation):
+        self.write("end", result=conversation.result, questions_used=conversation.questions_used,
+                   prompt_tokens=conversation.prompt_tokens, completion_tokens=conversation.completion_tokens,
+                   stats=conversation.stats)
+
+    def close(self):
+        """
+        Fsyncs and closes the journal. Further writes are ignored.
+        """
+        with self._lock:
+            self.closed = True
+            if self._file is None:
+                return
+            try:
+                self._file.flush()
+                self._sync()
+                self._file.close()
+            except OSError as e:
+                logging.error(f"Error closing journal {self.path}: {e}")
+            self._file = None
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of a journal in order. A truncated last line (the process died
+    mid-write) is skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping corrupt record {number} of journal {path}")
+
+
+def _parse_time(value: Optional[str]) -> datetime:
+    return datetime.fromisoformat(value) if value else datetime.now()
+
+
+@dataclass
+class JournalState:
+    """
+    What a journal says about its game: the records that matter to rebuild it.
+    """
+    header: Dict[str, Any]
+    solution: Dict[str, Any] = field(default_factory=dict)
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    checkpoint: Optional[Dict[str, Any]] = None
+    end: Optional[Dict[str, Any]] = None
+
+    def conversation(self, message_count: Optional[int] = None) -> Conversation:
+        """
+        Builds the Conversation with the first `message_count` messages (all by default).
+        """
+        header = self.header
+        conversation = Conversation(
+            model1_name=header["model1_name"], model1_provider=header["model1_provider"],
+            model2_name=header["model2_name"], model2_provider=header["model2_provider"],
+            max_questions=header["max_questions"], start_time=_parse_time(header.get("start_time")),
+            full_solution=self.solution.get("full_solution", ""), game_id=header.get("game_id", "")
+        )
+        for record in self.messages[:message_count]:
+            data = {k: v for k, v in record.items() if k in _MESSAGE_FIELDS}
+            data["timestamp"] = _parse_time(data.get("timestamp"))
+            conversation.add_message(Message(**data))
+        return conversation
+
+
+def replay_journal(path: str) -> JournalState:
+    """
+    Reads a journal into a JournalState. Messages written after the last checkpoint of
+    a game that was later resumed are dropped: the resumed game replayed that turn.
+    """
+    state: Optional[JournalState] = None
+    for record in read_journal(path):
+        kind = record.get("type")
+        if kind == "header":
+            state = JournalState(header=record)
+        elif state is None:
+            continue
+        elif kind == "solution":
+            state.solution = record
+        elif kind == "message":
+            state.messages.append(record)
+        elif kind == "checkpoint":
+            state.checkpoint = record
+        elif kind == "resume":
+            del state.messages[record.get("messages", len(state.messages)):]
+            state.end = None
+        elif kind == "end":
+            state.end = record
+    if state is None:
+        raise ValueError(f"Journal {path} has no header")
+    return state
+
+
+def load_conversation(path: str) -> Conversation:
+    """
+    Rebuilds a Conversation from its journal; works on the journal of an unfinished game too.
+    """
+    state = replay_journal(path)
+    conversation = state.conversation()
+    totals = state.end or state.checkpoint
+    if totals is not None:
+        conversation.stats = totals.get("stats") or {}
+        conversation.prompt_tokens = max(conversation.prompt_tokens, totals.get("prompt_tokens", 0))
+        conversation.completion_tokens = max(conversation.completion_tokens, totals.get("completion_tokens", 0))
+    if state.end is not None:
+        conversation.result = state.end.get("result")
+        conversation.questions_used = state.end.get("questions_used", 0)
+    else:
+        conversation.questions_used = sum(1 for m in conversation.messages if m.role == "Detective")
+    return conversation
+
+
+def load_checkpoint(path: str) -> Tuple[Conversation, JournalState]:
+    """
+    Rebuilds an unfinished game as of its last checkpoint: the conversation up to the
+    last completed turn, with its counters and token totals. The checkpoint record
+    itself (question counter, feedback, sessions...) is in the returned state.
+
+    Games that ended because a provider failed (result "Error") can be resumed too.
+
+    Raises:
+        ValueError: If the game already ended or never completed a turn.
+    """
+    state = replay_journal(path)
+    if state.end is not None and state.end.get("result") != "Error":
+        raise ValueError(f"Game {state.header.get('game_id')} already ended ({state.end.get('result')})")
+    checkpoint = state.checkpoint
+    if checkpoint is None:
+        raise ValueError(f"Game {state.header.get('game_id')} has no checkpoint to resume from")
+    conversation = state.conversation(checkpoint["messages"])
+    conversation.stats = checkpoint.get("stats") or {}
+    conversation.prompt_tokens = checkpoint.get("prompt_tokens", conversation.prompt_tokens)
+    conversation.completion_tokens = checkpoint.get("completion_tokens", conversation.completion_tokens)
+    return conversation, state
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from .history import HistoryBuffer
 
 @dataclass
 class Message:
@@ -13,7 +14,12 @@ class Message:
     content: str
     timestamp: datetime = field(default_factory=datetime.now)
     response_time: Optional[float] = None
-    tokens: Optional[int] = None
+    time_to_first_token: Optional[float] = None
+    tokens: Optional[int] = None # Tokens de la respuesta (completion), según el proveedor
+    tokens_saved: Optional[int] = None # Tokens estimados que no se generaron por el corte anticipado
+    prompt_tokens: Optional[int] = None # Tokens del prompt evaluados por el proveedor
+    eval_duration: Optional[float] = None # Segundos generando la respuesta (Ollama)
+    load_duration: Optional[float] = None # Segundos cargando el modelo (Ollama)
 
 @dataclass
 class Conversation:
@@ -30,9 +36,34 @@ class Conversation:
     messages: List[Message] = field(default_factory=list)
     result: Optional[str] = None
     questions_used: int = 0
+    stats: Dict[str, Any] = field(default_factory=dict) # Contadores de la partida (especulación, caché, ...)
+    prompt_tokens: int = 0 # Suma de tokens de prompt de todas las llamadas de la partida
+    completion_tokens: int = 0 # Suma de tokens generados de todas las llamadas de la partida
+    game_id: str = "" # Identificador único de la partida (nombre del diario y de los ficheros guardados)
+    history: HistoryBuffer = field(default_factory=HistoryBuffer, init=False, repr=False, compare=False)
+    # Diario en el que se apunta cada mensaje en cuanto se añade (ver storage.journal)
+    journal: Optional[Any] = field(default=None, init=False, repr=False, compare=False)
 
     def add_message(self, message: Message):
         """
         Adds a message to the conversation.
+        Every message after the opening story is also appended to the pre-rendered history.
         """
         self.messages.append(message)
+        if len(self.messages) > 1:
+            self.history.append(message)
+        self.add_usage(message.prompt_tokens, message.tokens)
+        if self.journal is not None:
+            self.journal.write_message(message)
+
+    def add_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        """
+        Adds the tokens of a call to the game totals.
+        Also used for calls that do not produce a message (history summaries, discarded speculation).
+        """
+        self.prompt_tokens += prompt_tokens or 0
+        self.completion_tokens += completion_tokens or 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
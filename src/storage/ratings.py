@@ -0,0 +1,164 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .models import Conversation
+
+# Elo ratings: every model starts at DEFAULT_RATING in each role and moves at most
+# K_FACTOR points per game
+DEFAULT_RATING = 1500.0
+K_FACTOR = 32.0
+# Only games that ended with a verdict move the ratings ("Error" games do not)
+RATED_RESULTS = ("Victoria", "Derrota")
+DETECTIVE_WIN = "Victoria"
+
+RATINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    model TEXT NOT NULL,
+    role TEXT NOT NULL,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    PRIMARY KEY (model, role)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pairings (
+    master TEXT NOT NULL,
+    detective TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    questions INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    latency_count INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (master, detective)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rated_games (
+    game_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_ratings_role ON ratings(role, rating);
+"""
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    """
+    Probability that a player rated `rating` beats one rated `opponent` under the Elo model.
+    """
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+
+@dataclass
+class _Pairing:
+    games: int = 0
+    wins: int = 0
+    questions: int = 0
+    latency: float = 0.0
+    latency_count: int = 0
+    tokens: int = 0
+
+
+class RatingEngine:
+    """
+    Incremental Elo ratings of detectives and Story Masters, plus per-pairing stats.
+
+    Each rated game is a match between its detective (who wins on "Victoria") and its
+    Story Master (who wins on "Derrota"); detective and master ratings are separate
+    pools, so a model has one rating per role. Ratings and pairing totals are updated
+    as each game is recorded, never recomputed from the full history, and every game
+    is counted once (a game saved again after being resumed is not rated twice).
+
+    The engine works on a connection owned by the caller (see ConversationStore),
+    inside the caller's transaction, so a game and its rating are stored atomically.
+    """
+
+    def __init__(self, db: sqlite3.Connection, k_factor: float = K_FACTOR):
+        self._db = db
+        self.k_factor = k_factor
+        self._db.executescript(RATINGS_SCHEMA)
+
+    def record_many(self, games: Iterable[Tuple[str, Conversation]]) -> int:
+        """
+        Applies a batch of (game_id, conversation) in order. Returns how many games were rated.
+        Must be called inside a transaction.
+        """
+        pending = [(game_id, c) for game_id, c in games if c.result in RATED_RESULTS]
+        if not pending:
+            return 0
+        ids = [game_id for game_id, _ in pending]
+        marks = ", ".join("?" * len(ids))
+        seen = {row[0] for row in self._db.execute(f"SELECT game_id FROM rated_games WHERE game_id IN ({marks})", ids)}
+        ratings: Dict[Tuple[str, str], List[Any]] = {}
+        pairings: Dict[Tuple[str, str], _Pairing] = {}
+        rated = []
+        for game_id, conversation in pending:
+            if game_id in seen:
+                continue
+            seen.add(game_id)
+            rated.append((game_id,))
+            detective = self._rating(ratings, conversation.model2_name, "detective")
+            master = self._rating(ratings, conversation.model1_name, "master")
+            score = 1.0 if conversation.result == DETECTIVE_WIN else 0.0
+            delta = self.k_factor * (score - expected_score(detective[0], master[0]))
+            detective[0] += delta
+            master[0] -= delta
+            detective[1] += 1
+            master[1] += 1
+            detective[2] += int(score)
+            master[2] += 1 - int(score)
+
+            pairing = pairings.setdefault((conversation.model1_name, conversation.model2_name), _Pairing())
+            latencies = [m.response_time for m in conversation.messages if m.response_time is not None]
+            pairing.games += 1
+            pairing.wins += int(score)
+            pairing.questions += conversation.questions_used
+            pairing.latency += sum(latencies)
+            pairing.latency_count += len(latencies)
+            pairing.tokens += conversation.prompt_tokens + conversation.completion_tokens
+
+        self._db.executemany("INSERT INTO rated_games (game_id) VALUES (?)", rated)
+        self._db.executemany("INSERT OR REPLACE INTO ratings (model, role, rating, games, wins) VALUES (?, ?, ?, ?, ?)",
+                             [(model, role, *values) for (model, role), values in ratings.items()])
+        self._db.executemany(
+            "INSERT INTO pairings (master, detective, games, wins, questions, latency, latency_count, tokens) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (master, detective) DO UPDATE SET "
+            "games = games + excluded.games, wins = wins + excluded.wins, questions = questions + excluded.questions, "
+            "latency = latency + excluded.latency, latency_count = latency_count + excluded.latency_count, "
+            "tokens = tokens + excluded.tokens",
+            [(master, detective, p.games, p.wins, p.questions, p.latency, p.latency_count, p.tokens)
+             for (master, detective), p in pairings.items()])
+        return len(rated)
+
+    def _rating(self, cache: Dict[Tuple[str, str], List[Any]], model: str, role: str) -> List[Any]:
+        key = (model, role)
+        if key not in cache:
+            row = self._db.execute("SELECT rating, games, wins FROM ratings WHERE model = ? AND role = ?", key).fetchone()
+            cache[key] = list(row) if row else [DEFAULT_RATING, 0, 0]
+        return cache[key]
+
+    def leaderboard(self, role: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Models by rating, best first: model, role, rating, games, wins and win_rate.
+        """
+        where, params = ("WHERE role = ?", [role]) if role else ("", [])
+        query = f"SELECT model, role, rating, games, wins FROM ratings {where} ORDER BY rating DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [{"model": model, "role": role, "rating": rating, "games": games, "wins": wins,
+                 "win_rate": wins / games if games else 0.0}
+                for model, role, rating, games, wins in self._db.execute(query, params)]
+
+    def pairings(self, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Stats per Story Master / detective pairing: games, detective wins and win rate,
+        mean questions used, mean response time per message and tokens per detective win
+        (None before the first win).
+        """
+        where, params = ("WHERE master = ? OR detective = ?", [model, model]) if model else ("", [])
+        rows = []
+        for master, detective, games, wins, questions, latency, latency_count, tokens in self._db.execute(
+                "SELECT master, detective, games, wins, questions, latency, latency_count, tokens "
+                f"FROM pairings {where} ORDER BY games DESC, master, detective", params):
+            rows.append({"master": master, "detective": detective, "games": games, "wins": wins,
+                         "win_rate": wins / games, "questions": questions / games,
+                         "latency": latency / latency_count if latency_count else None,
+                         "tokens_per_win": tokens / wins if wins else None})
+        return rows
@@ -1,14 +1,24 @@
 import os
 import logging
+import sqlite3
 from datetime import datetime
+from typing import Optional, TextIO, Tuple
 from .models import Conversation
+from .journal import load_conversation
+from .database import ConversationStore
 from .formats.markdown import MarkdownFormatter
 from .formats.json import JsonFormatter
 from .formats.txt import TxtFormatter
 
 class ConversationSaver:
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, store: Optional[ConversationStore] = None):
+        """
+        Args:
+            output_dir (str): Folder where the conversation files are written.
+            store (Optional[ConversationStore]): Database where every saved game is also recorded.
+        """
         self.output_dir = output_dir
+        self.store = store
         self.formatters = {
             'md': MarkdownFormatter(),
             'json': JsonFormatter(),
@@ -25,24 +35,66 @@ class ConversationSaver:
         except OSError as e:
             logging.error(f"Error creating output directory {self.output_dir}: {e}")
 
-    def save(self, conversation: Conversation, file_format: str):
+    def save(self, conversation: Conversation, file_format: str) -> Optional[str]:
         """
         Saves the conversation to a file in the specified format.
+
+        Returns:
+            Optional[str]: The path of the written file, or None if it could not be saved.
         """
         if file_format not in self.formatters:
             logging.error(f"Unsupported file format: {file_format}")
-            return
+            return None
+
+        if self.store is not None:
+            try:
+                self.store.save(conversation)
+            except sqlite3.Error as e:
+                logging.error(f"Error storing the conversation in {self.store.path}: {e}")
 
         formatter = self.formatters[file_format]
         content = formatter.format(conversation)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"blackstory_{timestamp}.{file_format}"
-        filepath = os.path.join(self.output_dir, filename)
+        stem = conversation.game_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = None
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
+            f, filepath = self._open_unique(f"blackstory_{stem}", file_format)
+            with f:
                 f.write(content)
             logging.info(f"Conversation saved to {filepath}")
+            return filepath
         except IOError as e:
             logging.error(f"Error writing to file {filepath}: {e}")
+            return None
+
+    def render(self, journal_file: str, file_format: str) -> Optional[str]:
+        """
+        Renders a game journal (see storage.journal) in the specified format.
+
+        Returns:
+            Optional[str]: The path of the written file, or None if it could not be rendered.
+        """
+        try:
+            conversation = load_conversation(journal_file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading journal {journal_file}: {e}")
+            return None
+        return self.save(conversation, file_format)
+
+    def _open_unique(self, stem: str, extension: str) -> Tuple[TextIO, str]:
+        """
+        Opens a new file for writing without overwriting existing ones.
+
+        Several games (e.g. tournament workers) can finish within the same second,
+        so a numeric suffix is added until an unused name is found. The exclusive
+        'x' mode makes the check atomic across processes.
+        """
+        suffix = 0
+        while True:
+            name = f"{stem}.{extension}" if suffix == 0 else f"{stem}_{suffix}.{extension}"
+            filepath = os.path.join(self.output_dir, name)
+            try:
+                return open(filepath, 'x', encoding='utf-8'), filepath
+            except FileExistsError:
+                suffix += 1